@@ -1,151 +1,421 @@
-import random
+import atexit
+import os
+import queue
+import threading
 
 # Импорт эффектов так, чтобы модуль можно было запускать и как скрипт, и как часть пакета bd_curs
 try:
-    from effects import PoisonEffect, ShieldEffect, StrengthBuffEffect
+    from effects import ShieldEffect, StrengthBuffEffect
+    from rng import BattleRNG
+    from initiative import Timeline, TICKS
+    from roster import AliveSet
+    from content import SKILLS, SKILLS_BY_ROLE
+    from snapshot import take_snapshot, restore_snapshot, clone_character
+    from events import (
+        EventBus, RoundStarted, TurnStarted, TurnSkipped, DamageDealt, Healed, SkillUsed, Notice, StatusReport,
+    )
 except ImportError:
-    from .effects import PoisonEffect, ShieldEffect, StrengthBuffEffect
-
-
-class TurnOrder:
-    """Итератор для определения порядка ходов на основе ловкости"""
-
-    def __init__(self, participants):
-        self.participants = sorted(
-            participants,
-            key=lambda x: getattr(x, 'agility', 10),
-            reverse=True
-        )
-        self.index = 0
-
-    def __iter__(self):
-        return self
+    from .effects import ShieldEffect, StrengthBuffEffect
+    from .rng import BattleRNG
+    from .initiative import Timeline, TICKS
+    from .roster import AliveSet
+    from .content import SKILLS, SKILLS_BY_ROLE
+    from .snapshot import take_snapshot, restore_snapshot, clone_character
+    from .events import (
+        EventBus, RoundStarted, TurnStarted, TurnSkipped, DamageDealt, Healed, SkillUsed, Notice, StatusReport,
+    )
+
+
+# Уровни подробности лога: сообщение пишется, если его уровень >= уровня логгера
+DEBUG = 10     # всё, включая начало каждого хода и статус после раунда
+INFO = 20      # игровые сообщения (урон, лечение, эффекты, умения)
+SUMMARY = 30   # только итоги: начало раундов и сводка в конце раунда
+
+# Уровень события шины; события, которых здесь нет, считаются INFO
+EVENT_LEVELS = {
+    TurnStarted: DEBUG,
+    RoundStarted: SUMMARY,
+    StatusReport: SUMMARY,
+}
+
+
+class _LogWriter(threading.Thread):
+    """
+    Фоновый поток записи лога.
+
+    Получает готовые куски текста через очередь ограниченного размера (если
+    диск не успевает, log() блокируется, а не копит память) и ротирует файл:
+    когда он превышает max_bytes, файл становится <имя>.1, <имя>.1 — <имя>.2
+    и т.д., хранится не больше backup_count старых файлов.
+    """
+
+    def __init__(self, filename, max_bytes, backup_count, queue_size):
+        super().__init__(name="battle-log-writer", daemon=True)
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self._file = None
+        self._size = 0
+
+    def _open(self):
+        self._file = open(self.filename, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        if self._size == 0:
+            self._write("=== ЛОГ БОЯ ===\n")
+
+    def _write(self, text):
+        self._file.write(text)
+        self._size += len(text.encode("utf-8"))
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = f"{self.filename}.{index}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.filename}.{index + 1}")
+            os.replace(self.filename, f"{self.filename}.1")
+        else:
+            os.remove(self.filename)
+        self._open()
 
-    def __next__(self):
-        if self.index < len(self.participants):
-            participant = self.participants[self.index]
-            self.index += 1
-            return participant
-        raise StopIteration
+    def run(self):
+        try:
+            self._open()
+        except OSError as e:
+            self.error = e
+        while True:
+            chunk = self.queue.get()
+            try:
+                if chunk is None:
+                    return
+                if self._file is None:
+                    continue
+                if chunk:
+                    self._write(chunk)
+                    if self.max_bytes and self._size >= self.max_bytes:
+                        self._rotate()
+                self._file.flush()
+            except OSError as e:
+                # Ошибка диска не должна ронять бой: запоминаем и дальше не пишем
+                self.error = e
+                self._file = None
+            finally:
+                if chunk is None and self._file is not None:
+                    self._file.close()
+                self.queue.task_done()
 
 
 class BattleLogger:
-    """Контекстный менеджер для логирования боя"""
-
-    def __init__(self, filename="battle_log.txt"):
+    """Логгер боя: консоль и файл с буферизацией, фоновой записью и ротацией.
+
+    filename=None — не писать файл; echo=False — не дублировать в консоль
+    (так логгер используется в безголовой симуляции).
+    level — минимальный уровень сообщений (DEBUG, INFO, SUMMARY): на больших
+    прогонах SUMMARY оставляет в логе только раунды и сводки.
+
+    Файл открывается один раз (в режиме дозаписи) при первом сообщении и
+    остаётся открытым до close(). Строки копятся в буфере по buffer_lines
+    штук и уходят в фоновый поток записи; queue_size ограничивает, сколько
+    таких пачек может ждать записи. Файл ротируется по размеру max_bytes
+    (0 — без ротации), старых файлов хранится backup_count.
+
+    Как контекстный менеджер логгер можно вкладывать (Battle.play оборачивает
+    весь бой, start_round — раунд): на выходе из внешнего with буфер
+    сбрасывается на диск, но файл не закрывается.
+    """
+
+    def __init__(self, filename="battle_log.txt", echo=True, level=INFO,
+                 max_bytes=5 * 2 ** 20, backup_count=3, buffer_lines=256, queue_size=64):
         self.filename = filename
-        self.log_file = None
+        self.echo = echo
+        self.level = level
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.buffer_lines = buffer_lines
+        self.queue_size = queue_size
+        self._buffer = []
+        self._writer = None
+        self._depth = 0
 
     def __enter__(self):
-        self.log_file = open(self.filename, 'w', encoding='utf-8')
-        self.log_file.write("=== ЛОГ БОЯ ===\n")
+        self._depth += 1
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.log_file:
-            self.log_file.close()
-
-    def log(self, message):
+        self._depth -= 1
+        if self._depth == 0:
+            self.flush(wait=False)
+
+    def _start_writer(self):
+        self._writer = _LogWriter(self.filename, self.max_bytes, self.backup_count, self.queue_size)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _submit(self):
+        if self._buffer:
+            chunk = "\n".join(self._buffer) + "\n"
+            self._buffer = []
+            self._writer.queue.put(chunk)
+
+    def log(self, message, level=INFO):
         """Записать сообщение в лог"""
-        print(message)
-        if self.log_file:
-            self.log_file.write(message + "\n")
+        if level < self.level:
+            return
+        if self.echo:
+            print(message)
+        if self.filename:
+            if self._writer is None:
+                self._start_writer()
+            self._buffer.append(message)
+            if len(self._buffer) >= self.buffer_lines:
+                self._submit()
+
+    def on_event(self, event):
+        """Подписчик шины событий: пишет текст события в лог (текст строится, только если уровень проходит)."""
+        level = EVENT_LEVELS.get(type(event), INFO)
+        if level >= self.level:
+            self.log(event.format(), level)
+
+    def flush(self, wait=True):
+        """Отдать буфер потоку записи; wait=True — дождаться, пока всё окажется в файле."""
+        if self._writer is None:
+            return
+        self._submit()
+        if wait:
+            self._writer.queue.join()
+
+    def close(self):
+        """Записать всё, что осталось, и закрыть файл. Логгер можно использовать снова."""
+        writer = self._writer
+        if writer is None:
+            return
+        self._submit()
+        writer.queue.put(None)
+        writer.join()
+        self._writer = None
+        atexit.unregister(self.close)
+        if writer.error is not None:
+            raise writer.error
+
+
+# Коды действий героя: совпадают с пунктами меню в hero_turn
+ACTION_ATTACK = "1"
+ACTION_ITEM = "2"
+ACTION_SKILL = "3"
+ACTION_SKIP = "4"
 
 
 class Battle:
-    def __init__(self, heroes, boss):
+    """
+    Бой пати против босса — или рейд: boss может быть списком боссов.
+
+    policy — объект с методом choose(hero, battle) -> (действие, имя_предмета).
+    Если policy задана, ходы героев выбираются ею без input() (безголовый режим),
+    иначе — через консольное меню.
+    rng — BattleRNG боя; все броски героев, босса и боя идут через него.
+    bus — EventBus боя: игровые сообщения публикуются в неё событиями.
+    По умолчанию создаётся шина, на которую подписан logger; переданная
+    шина используется как есть (без подписчиков текст не строится вовсе).
+    recorder — replay.ReplayRecorder: в него записывается каждый потраченный
+    ход героя (действие и предмет), чтобы бой можно было повторить.
+    timeline — initiative.Timeline, очередь ходов. По умолчанию — раунды
+    (каждый ходит раз в раунд по убыванию ловкости); Timeline(round_based=False)
+    включает active-time battle, где быстрые ходят чаще.
+
+    Живые герои и боссы хранятся в alive_heroes / alive_bosses (roster.AliveSet):
+    выбор цели и проверка конца боя стоят O(1), а не проход по всей пати.
+    В рейде self.boss — первый из боссов, герои бьют случайного живого.
+    """
+
+    def __init__(self, heroes, boss, policy=None, logger=None, rng=None, bus=None, recorder=None, timeline=None):
+        bosses = list(boss) if isinstance(boss, (list, tuple)) else [boss]
         self.heroes = heroes
-        self.boss = boss
+        self.bosses = bosses
+        self.boss = bosses[0]
         self.round = 0
-        self.logger = BattleLogger()
+        self.policy = policy
+        self.logger = logger if logger is not None else BattleLogger()
+        self.rng = rng if rng is not None else BattleRNG()
+        self.recorder = recorder
+        if bus is None:
+            bus = EventBus()
+            bus.subscribe(self.logger.on_event)
+        self.bus = bus
+
+        # Живые каждой стороны; персонаж сам убирает себя из team при смерти.
+        # hero.heroes — тоже набор живых: умения, бьющие или лечащие всех,
+        # проходят только по живым
+        self.alive_heroes = AliveSet(heroes)
+        self.alive_bosses = AliveSet(bosses)
 
         # Добавляем ссылки на бой для всех персонажей
         for hero in heroes:
-            hero.heroes = heroes
-            hero.boss = boss
+            hero.heroes = self.alive_heroes
+            hero.team = self.alive_heroes
+            hero.boss = self.boss
+            hero.rng = self.rng
+            hero.bus = bus
             if not hasattr(hero, 'agility'):
-                hero.agility = random.randint(10, 20)
-        boss.heroes = heroes
-        if not hasattr(boss, 'agility'):
-            boss.agility = 15
+                hero.agility = self.rng.randint(10, 20)
+        for enemy in bosses:
+            enemy.heroes = self.alive_heroes
+            enemy.team = self.alive_bosses
+            enemy.rng = self.rng
+            enemy.bus = bus
+            if not hasattr(enemy, 'agility'):
+                enemy.agility = 15
+        self._boss_set = set(bosses)
+
+        # Все участники встают на шкалу к первому раунду; индекс в participants
+        # задаёт порядок при равной ловкости и адресует участника в снимке
+        self.participants = list(heroes) + bosses
+        self.timeline = timeline if timeline is not None else Timeline()
+        for participant in self.participants:
+            participant.timeline = self.timeline
+            self.timeline.add(participant, delay=0)
 
     def is_battle_over(self):
-        heroes_alive = any(hero.is_alive for hero in self.heroes)
-        boss_alive = self.boss.is_alive
-        return not heroes_alive or not boss_alive
+        return not self.alive_bosses or not self.alive_heroes
 
     def get_winner(self):
         """Определить победителя боя"""
-        if not self.boss.is_alive:
+        if not self.alive_bosses:
             return "Герои"
-        elif not any(hero.is_alive for hero in self.heroes):
+        elif not self.alive_heroes:
             return "Босс"
         return None
 
+    def revive(self, unit, hp):
+        """Вернуть погибшего участника в бой с hp здоровья (ходить он начнёт со следующего раунда)."""
+        unit.hp = min(unit.max_hp, hp)
+        if unit.is_alive:
+            unit.team.add(unit)
+            self.timeline.add(unit)
+
+    def boss_target(self):
+        """Цель атаки героя: единственный босс или случайный живой в рейде."""
+        if len(self.bosses) == 1:
+            return self.boss
+        return self.alive_bosses.choice(self.rng) or self.boss
+
     def get_battle_stats(self):
         """Получить статистику боя"""
         return {
             "rounds": self.round,
-            "boss_hp": self.boss.hp,
-            "heroes_alive": sum(1 for hero in self.heroes if hero.is_alive),
+            "boss_hp": sum(boss.hp for boss in self.bosses),
+            "heroes_alive": len(self.alive_heroes) if self.alive_heroes else 0,
             "winner": self.get_winner()
         }
 
     def start_round(self):
         self.round += 1
 
+        bus = self.bus
+
         with self.logger as log:
-            log.log(f"\n" + "=" * 60)
-            log.log(f"РАУНД {self.round}")
-            log.log("=" * 60)
+            if bus.active:
+                bus.publish(RoundStarted(self.round))
 
             # Обновляем эффекты в начале раунда
-            for hero in self.heroes:
+            for hero in self.alive_heroes:
                 if hero.is_alive:
                     hero.update_effects()
-            if self.boss.is_alive:
-                self.boss.update_effects()
-
-            # Определяем порядок ходов
-            all_participants = [h for h in self.heroes if h.is_alive]
-            if self.boss.is_alive:
-                all_participants.append(self.boss)
-
-            turn_order = TurnOrder(all_participants)
+            for boss in self.alive_bosses:
+                if boss.is_alive:
+                    boss.update_effects()
 
             # Выполняем ходы в порядке инициативы
-            for participant in turn_order:
-                if not self.is_battle_over():
-                    if participant == self.boss:
-                        self.boss_turn(log)
-                    else:
-                        self.hero_turn(participant, log)
-
+            boss_set = self._boss_set
+            for participant in self._turns(self.round * TICKS):
                 if self.is_battle_over():
                     break
+                if participant in boss_set:
+                    self.boss_turn(log, participant)
+                else:
+                    self.hero_turn(participant, log)
 
             # Показать статус
-            self.show_status(log)
+            if bus.active:
+                bus.publish(StatusReport(self))
+
+    def _turns(self, end):
+        """Ходящие до времени end (конец текущего раунда на шкале инициативы)."""
+        timeline = self.timeline
+        if timeline.round_based:
+            # Состав ходящих фиксируется в начале раунда: погибший в этом
+            # раунде всё равно делает свой ход, как и раньше
+            yield from timeline.pop_until(end)
+            return
+        while True:
+            time = timeline.next_time()
+            if time is None or time >= end:
+                return
+            yield timeline.pop()
+
+    def snapshot(self):
+        """Неизменяемый снимок состояния боя (раунд, поток случайности, персонажи)."""
+        return take_snapshot(self)
+
+    def restore(self, state):
+        """
+        Вернуть бой к снимку. Персонажи меняются на месте, ссылки на них остаются
+        верными; наборы живых получают порядок из снимка.
+        """
+        restore_snapshot(self, state)
+
+    def fork(self, policy=None):
+        """
+        Независимая копия боя в текущем состоянии — для перебора ходов и «что если».
+        Копия тихая (без лога и подписчиков) и продолжает тот же поток случайности.
+        """
+        state = self.snapshot()
+        heroes = [clone_character(hero) for hero in self.heroes]
+        bosses = [clone_character(boss) for boss in self.bosses]
+        fork = Battle(heroes, bosses, policy=policy if policy is not None else self.policy,
+                      logger=BattleLogger(filename=None, echo=False), rng=self.rng.clone(), bus=EventBus(),
+                      timeline=Timeline(self.timeline.round_based, self.timeline.base_agility))
+        fork.restore(state)
+        return fork
+
+    def play(self, max_rounds=200):
+        """Провести бой до конца (или до max_rounds раундов) и вернуть статистику."""
+        with self.logger:
+            while not self.is_battle_over() and self.round < max_rounds:
+                self.start_round()
+        return self.get_battle_stats()
 
     def hero_turn(self, hero, log):
-        log.log(f"\n--- Ход {hero.name} (Ловкость: {hero.agility}) ---")
+        bus = self.bus
+        if bus.active:
+            bus.publish(TurnStarted(hero))
 
         # Проверяем, не оглушен ли герой
-        stun_effects = [eff for eff in hero.effects if eff.name == "Оглушение"]
-        if stun_effects:
-            log.log(f"{hero.name} оглушен и пропускает ход!")
+        if hero.effects.stunned:
+            if bus.active:
+                bus.publish(TurnSkipped(hero, "stunned"))
+            return
+
+        # Безголовый режим: действие выбирает скриптовая политика
+        if self.policy is not None:
+            choice, item_name = self.policy.choose(hero, self)
+            if not self.perform_action(hero, choice, log, item_name):
+                # Недоступное действие — ход пропущен, в реплее это пропуск
+                self._record(ACTION_SKIP)
+                if bus.active:
+                    bus.publish(TurnSkipped(hero))
             return
 
         log.log("Доступные действия:")
         log.log("1. Атаковать")
         log.log("2. Использовать предмет")
 
-        # Показываем особые возможности классов
-        if hasattr(hero, 'mp') and hero.mp >= 20:
-            if hero.role == "Маг":
-                log.log("3. Использовать магию яда (20 MP)")
-            elif hero.role == "Лекарь":
-                log.log("3. Исцелить союзника (25 MP)")
+        # Показываем особую возможность класса (умения — в content.json)
+        skill = SKILLS_BY_ROLE.get(hero.role)
+        if skill is not None and getattr(hero, 'mp', 0) >= skill.min_mp:
+            log.log(f"3. {skill.label}")
 
         log.log("4. Пропустить ход")
 
@@ -157,68 +427,116 @@ class Battle:
         while True:
             try:
                 choice = input("Выберите действие: ").strip()
-
-                if choice == "1":
-                    damage = hero.attack(self.boss)
-                    log.log(f"{hero.name} атакует {self.boss.name} и наносит {damage} урона!")
-                    break
-
-                elif choice == "2":
-                    self.use_item_menu(hero, log)
-                    break
-
-                elif choice == "3":
-                    if hasattr(hero, 'mp') and hero.mp >= 20:
-                        if hero.role == "Маг":
-                            try:
-                                from effects import PoisonEffect
-                            except ImportError:
-                                from .effects import PoisonEffect
-                            poison = PoisonEffect(duration=2, damage_per_turn=10)
-                            self.boss.add_effect(poison)
-                            hero.mp -= 20
-                            damage = random.randint(25, 35)
-                            actual_damage = self.boss.take_damage(damage)
-                            log.log(
-                                f"{hero.name} использует магию яда! Наносит {actual_damage} урона и отравляет {self.boss.name}!")
-                            break
-                        elif hero.role == "Лекарь":
-                            self.heal_ally(hero, log)
-                            break
-                    log.log("Недостаточно маны или недоступно!")
-
-                elif choice == "4":
-                    log.log(f"{hero.name} пропускает ход")
+                if self.perform_action(hero, choice, log):
                     break
-
-                else:
-                    log.log("Неверный выбор. Попробуйте снова.")
             except Exception as e:
                 log.log(f"Ошибка: {e}")
 
-    def heal_ally(self, healer, log):
-        if healer.mp >= 25:
-            healer.mp -= 25
-            alive_allies = [h for h in self.heroes if h.is_alive and h != healer]
-            if alive_allies:
-                target = random.choice(alive_allies)
-                heal_amount = random.randint(30, 45)
+    def perform_action(self, hero, choice, log, item_name=None):
+        """
+        Выполнить действие героя.
+        Возвращает True, если ход потрачен, и False, если действие недоступно.
+        Для предмета без item_name открывается интерактивное меню.
+        """
+        action = self.ACTIONS.get(choice)
+        if action is None:
+            if self.bus.active:
+                self.bus.publish(Notice("Неверный выбор. Попробуйте снова."))
+            return False
+        return action(self, hero, choice, log, item_name)
+
+    def _act_attack(self, hero, choice, log, item_name):
+        self._record(choice)
+        target = self.boss_target()
+        damage = hero.attack(target)
+        if self.bus.active:
+            self.bus.publish(DamageDealt(hero, target, damage))
+        return True
+
+    def _act_item(self, hero, choice, log, item_name):
+        if item_name is None:
+            item_name = self.use_item_menu(hero, log)
+            # Если предмет так и не выбран, ход всё равно потрачен впустую
+            self._record(choice if item_name else ACTION_SKIP, item_name)
+        else:
+            self._record(choice, item_name)
+            result = hero.use_item(item_name)
+            if self.bus.active:
+                self.bus.publish(Notice("{}", result))
+        return True
+
+    def _act_skill(self, hero, choice, log, item_name):
+        # Умение класса — один поиск по роли и обработчик по виду умения
+        skill = SKILLS_BY_ROLE.get(hero.role)
+        if skill is not None and getattr(hero, 'mp', 0) >= skill.min_mp:
+            self._record(choice)
+            self.SKILL_HANDLERS[skill.kind](self, hero, skill, log)
+            return True
+        if self.bus.active:
+            self.bus.publish(Notice("Недостаточно маны или недоступно!"))
+        return False
+
+    def _act_skip(self, hero, choice, log, item_name):
+        self._record(choice)
+        if self.bus.active:
+            self.bus.publish(TurnSkipped(hero))
+        return True
+
+    def _record(self, choice, item_name=None):
+        if self.recorder is not None:
+            self.recorder.record(choice, item_name)
+
+    def _skill_strike(self, hero, skill, log):
+        """Удар по боссу с эффектом (магия яда мага)."""
+        target = self.boss_target()
+        if skill.effect is not None:
+            target.add_effect(skill.effect())
+        hero.mp -= skill.mp_cost
+        damage = self.rng.randint(skill.low, skill.high)
+        actual_damage = target.take_damage(damage)
+        if self.bus.active:
+            self.bus.publish(SkillUsed(hero, skill.key, target, actual_damage))
+
+    def _skill_heal_ally(self, healer, skill, log):
+        """Лечение случайного живого союзника, кроме себя."""
+        if healer.mp >= skill.mp_cost:
+            healer.mp -= skill.mp_cost
+            target = self.alive_heroes.choice(self.rng, exclude=healer)
+            if target is not None:
+                heal_amount = self.rng.randint(skill.low, skill.high)
                 old_hp = target.hp
                 target.hp = min(target.max_hp, target.hp + heal_amount)
                 actual_heal = target.hp - old_hp
-                log.log(f"{healer.name} исцеляет {target.name} на {actual_heal} HP!")
-            else:
-                log.log("Нет живых союзников для лечения!")
-        else:
-            log.log("Недостаточно маны для исцеления!")
+                if self.bus.active:
+                    self.bus.publish(Healed(healer, target, actual_heal, "heal_ally"))
+            elif self.bus.active:
+                self.bus.publish(Notice("Нет живых союзников для лечения!"))
+        elif self.bus.active:
+            self.bus.publish(Notice("Недостаточно маны для исцеления!"))
+
+    def heal_ally(self, healer, log):
+        self._skill_heal_ally(healer, SKILLS["heal_ally"], log)
+
+    # Код действия героя -> обработчик; вид умения (content.SKILL_KINDS) -> обработчик
+    ACTIONS = {
+        ACTION_ATTACK: _act_attack,
+        ACTION_ITEM: _act_item,
+        ACTION_SKILL: _act_skill,
+        ACTION_SKIP: _act_skip,
+    }
+    SKILL_HANDLERS = {
+        "strike": _skill_strike,
+        "heal_ally": _skill_heal_ally,
+    }
 
     def use_item_menu(self, hero, log):
+        """Интерактивный выбор предмета. Возвращает имя использованного предмета или None."""
         log.log("\nИнвентарь:")
         hero.inventory.show()
 
         if not hero.inventory.items:
             log.log("Инвентарь пуст!")
-            return
+            return None
 
         item_names = list(hero.inventory.items.keys())
         for i, item_name in enumerate(item_names, 1):
@@ -230,13 +548,18 @@ class Battle:
                 item_name = item_names[choice]
                 result = hero.use_item(item_name)
                 log.log(result)
-            else:
-                log.log("Неверный выбор")
+                return item_name
+            log.log("Неверный выбор")
         except ValueError:
             log.log("Введите число")
+        return None
 
-    def boss_turn(self, log):
-        log.log(f"\n--- Ход {self.boss.name} (Ловкость: {self.boss.agility}) ---")
+    def boss_turn(self, log, boss=None):
+        if boss is None:
+            boss = self.boss
+        bus = self.bus
+        if bus.active:
+            bus.publish(TurnStarted(boss))
 
         # Босс выбирает действие
         action_weights = {
@@ -248,7 +571,7 @@ class Battle:
         actions = []
         weights = []
         for action, weight in action_weights.items():
-            if action == "item" and not self.boss.inventory.items:
+            if action == "item" and not boss.inventory.items:
                 continue
             actions.append(action)
             weights.append(weight)
@@ -257,50 +580,57 @@ class Battle:
             actions = ["attack"]
             weights = [1.0]
 
-        action = random.choices(actions, weights=weights)[0]
+        action = self.rng.choices(actions, weights=weights)[0]
 
         if action == "attack":
-            alive_heroes = [hero for hero in self.heroes if hero.is_alive]
-            if alive_heroes:
-                target = random.choice(alive_heroes)
-                damage = self.boss.attack(target)
-                log.log(f"{self.boss.name} атакует {target.name} и наносит {damage} урона!")
+            target = self.alive_heroes.choice(self.rng)
+            if target is not None:
+                damage = boss.attack(target)
+                if bus.active:
+                    bus.publish(DamageDealt(boss, target, damage))
 
         elif action == "skill":
-            result = self.boss.use_skill()
-            log.log(result)
+            result = boss.use_skill()
+            if bus.active:
+                bus.publish(Notice("{}", result))
 
         elif action == "item":
-            item_names = list(self.boss.inventory.items.keys())
+            item_names = list(boss.inventory.items.keys())
             if item_names:
-                item_name = random.choice(item_names)
-                result = self.boss.use_item(item_name)
-                log.log(result)
-
-    def show_status(self, log):
-        log.log(f"\n--- Статус боя ---")
-        log.log("Герои:")
+                item_name = self.rng.choice(item_names)
+                result = boss.use_item(item_name)
+                if bus.active:
+                    bus.publish(Notice("{}", result))
+
+    def status_lines(self):
+        """Строки статуса боя (для события StatusReport)."""
+        lines = [f"\n--- Статус боя ---", "Герои:"]
         for hero in self.heroes:
             status = "ЖИВ" if hero.is_alive else "МЕРТВ"
             mp_info = f" MP: {hero.mp}/{hero.max_mp}" if hasattr(hero, 'mp') else ""
             effects_info = f" | Эффекты: {', '.join([f'{eff.name}({eff.duration})' for eff in hero.effects])}" if hero.effects else ""
-            log.log(f"  {hero.role} {hero.name}: {status} HP: {hero.hp}/{hero.max_hp}{mp_info}{effects_info}")
+            lines.append(f"  {hero.role} {hero.name}: {status} HP: {hero.hp}/{hero.max_hp}{mp_info}{effects_info}")
 
         boss_mp_info = f" MP: {self.boss.mp}/{self.boss.max_mp}" if hasattr(self.boss, 'mp') else ""
         boss_effects_info = f" | Эффекты: {', '.join([f'{eff.name}({eff.duration})' for eff in self.boss.effects])}" if self.boss.effects else ""
-        log.log(
+        lines.append(
             f"Босс {self.boss.name}: {'ЖИВ' if self.boss.is_alive else 'МЕРТВ'} HP: {self.boss.hp}/{self.boss.max_hp}{boss_mp_info}{boss_effects_info}")
 
         # Прогресс боя
         if self.boss.is_alive:
             boss_hp_percent = (self.boss.hp / self.boss.max_hp) * 100
-            log.log(f"Оставшееся HP босса: {boss_hp_percent:.1f}%")
+            lines.append(f"Оставшееся HP босса: {boss_hp_percent:.1f}%")
+        return lines
+
+    def show_status(self, log):
+        for line in self.status_lines():
+            log.log(line)
 
     def get_battle_stats(self):
         """Получить статистику боя"""
         return {
             "rounds": self.round,
-            "boss_hp": self.boss.hp,
-            "heroes_alive": sum(1 for hero in self.heroes if hero.is_alive),
+            "boss_hp": sum(boss.hp for boss in self.bosses),
+            "heroes_alive": len(self.alive_heroes) if self.alive_heroes else 0,
             "winner": self.get_winner()
         }
\ No newline at end of file
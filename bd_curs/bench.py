@@ -0,0 +1,425 @@
+"""
+Микробенчмарки игровой модели.
+
+Запуск:
+    python -m bd_curs.bench objects --count 1000000
+    python -m bd_curs.bench logger --lines 200000
+    python -m bd_curs.bench snapshot --count 20000
+    python -m bd_curs.bench initiative --units 500
+    python -m bd_curs.bench raid --heroes 300 --bosses 10
+    python -m bd_curs.bench imports
+    python -m bd_curs.bench storage --battles 100000
+    python -m bd_curs.bench events --battles 2000
+"""
+
+import argparse
+import copy
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from characters import Warrior
+    from effects import PoisonEffect
+    from items import HealthPotion
+    from battle import Battle, BattleLogger, INFO, SUMMARY
+    from events import EventBus
+    from initiative import Timeline, TICKS
+    from rng import BattleRNG
+    from roster import AliveSet
+    from sim import make_party, make_raid, PotionPolicy, SkillPolicy
+    from results import EventRecorder, make_record
+    from db_sqlite import SQLiteBackend
+except ImportError:
+    from .characters import Warrior
+    from .effects import PoisonEffect
+    from .items import HealthPotion
+    from .battle import Battle, BattleLogger, INFO, SUMMARY
+    from .events import EventBus
+    from .initiative import Timeline, TICKS
+    from .rng import BattleRNG
+    from .roster import AliveSet
+    from .sim import make_party, make_raid, PotionPolicy, SkillPolicy
+    from .results import EventRecorder, make_record
+    from .db_sqlite import SQLiteBackend
+
+
+def _rss_bytes():
+    """Текущий RSS процесса (Linux); None, если узнать нельзя."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _measure_memory(factory, sample=10000):
+    """Сколько байт в среднем занимает один объект (вместе со всем, что он создаёт)."""
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    objects = [factory() for _ in range(sample)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    # Сам список объектов — 8 байт на ссылку, его не учитываем
+    return (current - start - 8 * sample) / sample
+
+
+def _measure_access(objects, repeats=3):
+    """Наносекунды на чтение+запись hp и чтение damage по всем живым объектам."""
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for obj in objects:
+            obj.hp = obj.hp - obj.damage + obj.damage
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(objects) * 1e9
+
+
+def bench_objects(count):
+    # Байты на объект считаем по выборке (tracemalloc слишком медленный для миллиона),
+    # а скорость доступа и RSS — на полном наборе из count живых персонажей
+    char_bytes = _measure_memory(lambda: Warrior("Волк"))
+    effect_bytes = _measure_memory(lambda: PoisonEffect(duration=3, damage_per_turn=8))
+    item_bytes = _measure_memory(lambda: HealthPotion())
+
+    gc.collect()
+    rss_before = _rss_bytes()
+    characters = [Warrior("Волк") for _ in range(count)]
+    rss_after = _rss_bytes()
+    access_ns = _measure_access(characters)
+
+    print(f"Живых персонажей: {count}")
+    print(f"Персонаж (Warrior с инвентарём): {char_bytes:.0f} байт, "
+          f"расчётно {char_bytes * count / 2 ** 20:.1f} МиБ")
+    if rss_before is not None:
+        print(f"Прирост RSS процесса: {(rss_after - rss_before) / 2 ** 20:.1f} МиБ")
+    print(f"Доступ к атрибутам персонажа: {access_ns:.1f} нс на объект")
+    print(f"Эффект (PoisonEffect): {effect_bytes:.0f} байт")
+    print(f"Предмет (HealthPotion): {item_bytes:.0f} байт")
+
+
+def _reopen_per_round(path, lines, round_lines):
+    """Прежняя схема: файл открывается заново на каждый раунд, строка — отдельная запись."""
+    for start in range(0, len(lines), round_lines):
+        with open(path, "a", encoding="utf-8") as f:
+            for line in lines[start:start + round_lines]:
+                f.write(line + "\n")
+
+
+def _buffered_logger(path, lines, round_lines, level):
+    logger = BattleLogger(path, echo=False, level=level, max_bytes=0)
+    with logger:
+        for start in range(0, len(lines), round_lines):
+            # Как в бою: первая строка раунда — итоговая, остальные — подробности
+            with logger:
+                logger.log(lines[start], SUMMARY)
+                for line in lines[start + 1:start + round_lines]:
+                    logger.log(line)
+    logger.close()
+
+
+def bench_logger(count, round_lines=20):
+    lines = [f"Раунд {i // round_lines}: Волк атакует Дракон и наносит {i % 40} урона!" for i in range(count)]
+    cases = [
+        ("открытие файла на каждый раунд", lambda path: _reopen_per_round(path, lines, round_lines)),
+        ("BattleLogger, уровень INFO", lambda path: _buffered_logger(path, lines, round_lines, INFO)),
+        ("BattleLogger, уровень SUMMARY", lambda path: _buffered_logger(path, lines, round_lines, SUMMARY)),
+    ]
+    print(f"Строк: {count}, по {round_lines} в раунде")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, (title, run) in enumerate(cases):
+            path = os.path.join(tmp, f"log{index}.txt")
+            started = time.perf_counter()
+            run(path)
+            elapsed = time.perf_counter() - started
+            print(f"{title}: {count / elapsed:,.0f} строк/с, файл {os.path.getsize(path) / 2 ** 20:.1f} МиБ")
+
+
+def _time_per_call(func, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def bench_snapshot(count):
+    # Бой в середине: у участников есть эффекты, инвентари частично потрачены
+    heroes, boss = make_party()
+    battle = Battle(heroes, boss, policy=PotionPolicy(), logger=BattleLogger(filename=None, echo=False),
+                    rng=BattleRNG(1), bus=EventBus())
+    for _ in range(3):
+        battle.start_round()
+    state = battle.snapshot()
+
+    deepcopy_us = _time_per_call(lambda: copy.deepcopy(battle), max(1, count // 20))
+    snapshot_us = _time_per_call(battle.snapshot, count)
+    restore_us = _time_per_call(lambda: battle.restore(state), count)
+    fork_us = _time_per_call(battle.fork, count)
+
+    print(f"Бой: {len(heroes)} героя + босс, раунд {battle.round}, "
+          f"эффектов: {sum(len(char.effects) for char in (*heroes, boss))}")
+    print(f"copy.deepcopy(battle): {deepcopy_us:.1f} мкс")
+    print(f"battle.snapshot():     {snapshot_us:.1f} мкс")
+    print(f"battle.restore(...):   {restore_us:.1f} мкс")
+    print(f"battle.fork():         {fork_us:.1f} мкс")
+
+
+def _sorted_rounds(units, rounds):
+    """Прежняя схема: каждый раунд пересортировать участников и проверять конец боя перед и после хода."""
+    turns = 0
+    for _ in range(rounds):
+        order = sorted((unit for unit in units if unit.is_alive), key=lambda x: x.agility, reverse=True)
+        for _unit in order:
+            if not any(unit.is_alive for unit in units):
+                break
+            turns += 1
+            if not any(unit.is_alive for unit in units):
+                break
+    return turns
+
+
+def _timeline_rounds(units, rounds):
+    timeline = Timeline()
+    for unit in units:
+        timeline.add(unit, delay=0)
+    turns = 0
+    for number in range(1, rounds + 1):
+        turns += len(timeline.pop_until(number * TICKS))
+    return turns
+
+
+def bench_initiative(count, rounds=20):
+    rng = BattleRNG(1)
+    units = [Warrior(f"W{i}") for i in range(count)]
+    for unit in units:
+        unit.agility = rng.randint(5, 40)
+    # Первая половина участников мертва: any() проходит её на каждой проверке
+    for unit in units[:count // 2]:
+        unit.hp = 0
+
+    for title, run in (("sorted() каждый раунд + any()", _sorted_rounds), ("Timeline (куча)", _timeline_rounds)):
+        started = time.perf_counter()
+        turns = run(units, rounds)
+        elapsed = time.perf_counter() - started
+        print(f"{title}: {turns / elapsed:,.0f} ходов/с ({turns} ходов, {count} участников)")
+
+
+def _list_targets(units, rng, picks):
+    """Прежняя схема: на каждый выбор цели заново собирать список живых."""
+    for _ in range(picks):
+        alive = [unit for unit in units if unit.is_alive]
+        rng.choice(alive)
+
+
+def _alive_set_targets(units, rng, picks):
+    alive = AliveSet(units)
+    for _ in range(picks):
+        alive.choice(rng)
+
+
+def bench_raid(hero_count, boss_count, picks=20000):
+    rng = BattleRNG(1)
+    units = [Warrior(f"W{i}") for i in range(hero_count)]
+    # Половина пати мертва, как к середине рейда
+    for unit in units[::2]:
+        unit.hp = 0
+    for title, run in (("список живых на каждый выбор", _list_targets), ("AliveSet.choice", _alive_set_targets)):
+        started = time.perf_counter()
+        run(units, rng, picks)
+        elapsed = time.perf_counter() - started
+        print(f"{title}: {picks / elapsed:,.0f} выборов цели/с ({hero_count} героев)")
+
+    heroes, bosses = make_raid(hero_count, boss_count)
+    battle = Battle(heroes, bosses, policy=PotionPolicy(SkillPolicy()), logger=BattleLogger(filename=None, echo=False),
+                    rng=BattleRNG(1), bus=EventBus())
+    started = time.perf_counter()
+    stats = battle.play()
+    elapsed = time.perf_counter() - started
+    print(f"рейд {hero_count} x {boss_count}: {stats['rounds']} раундов за {elapsed:.3f} с, "
+          f"победитель: {stats['winner']}, живых героев: {stats['heroes_alive']}")
+
+
+# Бюджет времени импорта точек входа (мс, python -X importtime, «холодный» процесс):
+# main — текстовая игра (main.main), pygame_game — окно (pygame_game.run_game)
+IMPORT_BUDGETS_MS = {"main": 60, "pygame_game": 250}
+# Модули, которые точки входа грузят лениво: NumPy — при первом броске BattleRNG,
+# БД — при сохранении результата, multiprocessing — только пакетным прогонам
+LAZY_MODULES = ("numpy", "db", "db_config", "db_mysql", "pymysql", "multiprocessing", "inspect")
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _import_time(module):
+    """
+    Суммарное время импорта module в отдельном интерпретаторе (мкс) и список
+    загруженных им модулей. (None, текст ошибки), если модуль не импортируется.
+    """
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=PACKAGE_DIR,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        return None, lines[-1] if lines else f"код возврата {proc.returncode}"
+    total = None
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | имя"; модуль верхнего уровня — без отступа
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            total = int(parts[1])
+    return total, proc.stdout.split()
+
+
+def bench_imports(repeats=5):
+    over = False
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        samples = []
+        loaded = ()
+        for _ in range(repeats):
+            total, loaded = _import_time(module)
+            if total is None:
+                break
+            samples.append(total)
+        if not samples:
+            print(f"{module}: не импортируется ({loaded})")
+            continue
+        # Минимум из нескольких запусков: меньше всего зависит от шума системы
+        best = min(samples) / 1000
+        eager = [name for name in LAZY_MODULES if name in loaded]
+        status = "в бюджете" if best <= budget else "БЮДЖЕТ ПРЕВЫШЕН"
+        over = over or best > budget
+        print(f"import {module}: {best:.1f} мс (бюджет {budget} мс) — {status}")
+        if eager:
+            print(f"  загружены при импорте, хотя должны быть ленивыми: {', '.join(eager)}")
+    return not over
+
+
+def bench_storage(count, batch_size=1000):
+    """Запись боёв в SQLiteBackend пачками batch_size (как их отдаёт ResultWriter/симулятор)."""
+    heroes, boss = make_party()
+    records = [make_record("victory" if i % 3 else "defeat", boss.name, 5 + i % 40, heroes, (boss,))
+               for i in range(count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteBackend(os.path.join(tmp, "battles.sqlite3"))
+        backend.init_db()
+        started = time.perf_counter()
+        for start in range(0, count, batch_size):
+            backend.save_battle_results(records[start:start + batch_size])
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(backend.path)
+        started = time.perf_counter()
+        backend.fastest_victories()
+        backend.class_win_rates()
+        queries = time.perf_counter() - started
+        backend.close()
+    print(f"SQLite: {count / elapsed:,.0f} боёв/с ({count} боёв по {len(heroes) + 1} участников, "
+          f"пачки по {batch_size}), файл {size / 2**20:.1f} МБ")
+    print(f"рекорды + доля побед по классам: {queries * 1000:.1f} мс")
+
+
+def _play_battles(count, recorder=None):
+    """count боёв make_party с PotionPolicy(SkillPolicy()); с recorder — ещё и телеметрия каждого боя."""
+    batches = []
+    for seed in range(count):
+        heroes, boss = make_party()
+        bus = EventBus()
+        if recorder is not None:
+            bus.subscribe(recorder.on_event, EventRecorder.KINDS)
+        Battle(heroes, [boss], policy=PotionPolicy(SkillPolicy()), logger=BattleLogger(filename=None, echo=False),
+               rng=BattleRNG(seed), bus=bus).play()
+        if recorder is not None:
+            batches.append(recorder.finish(f"{seed:032x}"))
+    return batches
+
+
+def bench_events(count, batch_size=50, repeats=3):
+    """Цена телеметрии в ходе боя и скорость записи battle_events в SQLite."""
+    # Прогрев (импорты, кэши классов, пулы эффектов), затем прогоны вперемешку — лучший из repeats
+    warmup = max(1, min(count, 100))
+    _play_battles(warmup)
+    _play_battles(warmup, EventRecorder())
+    plain = recorded = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        _play_battles(count)
+        elapsed = time.perf_counter() - started
+        plain = elapsed if plain is None else min(plain, elapsed)
+        started = time.perf_counter()
+        batches = _play_battles(count, EventRecorder())
+        elapsed = time.perf_counter() - started
+        recorded = elapsed if recorded is None else min(recorded, elapsed)
+    events = sum(len(batch.rows) for batch in batches)
+    print(f"бои без телеметрии: {count / plain:,.0f} боёв/с; с EventRecorder: {count / recorded:,.0f} боёв/с "
+          f"({(recorded / plain - 1) * 100:+.1f}%, {events / count:.0f} событий на бой)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteBackend(os.path.join(tmp, "battles.sqlite3"))
+        backend.init_db()
+        started = time.perf_counter()
+        for start in range(0, count, batch_size):
+            backend.save_battle_events(batches[start:start + batch_size])
+        elapsed = time.perf_counter() - started
+        backend.close()
+    print(f"SQLite battle_events: {events / elapsed:,.0f} событий/с (пачки по {batch_size} боёв)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Микробенчмарки игровой модели")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    objects = commands.add_parser("objects", help="память и скорость доступа к персонажам, эффектам, предметам")
+    objects.add_argument("--count", type=int, default=100000)
+
+    logger = commands.add_parser("logger", help="пропускная способность лога боя (строк/с)")
+    logger.add_argument("--lines", type=int, default=200000)
+
+    snapshot = commands.add_parser("snapshot", help="снимок/восстановление/копия боя против copy.deepcopy")
+    snapshot.add_argument("--count", type=int, default=20000)
+
+    initiative = commands.add_parser("initiative", help="очередь ходов на больших боях")
+    initiative.add_argument("--units", type=int, default=500)
+
+    raid = commands.add_parser("raid", help="выбор целей и бой рейда: много героев против нескольких боссов")
+    raid.add_argument("--heroes", type=int, default=300)
+    raid.add_argument("--bosses", type=int, default=10)
+
+    imports = commands.add_parser("imports", help="время импорта точек входа против бюджета (python -X importtime)")
+    imports.add_argument("--repeats", type=int, default=5)
+
+    storage = commands.add_parser("storage", help="скорость записи боёв в локальное хранилище SQLite")
+    storage.add_argument("--battles", type=int, default=100000)
+    storage.add_argument("--batch", type=int, default=1000)
+
+    events = commands.add_parser("events", help="телеметрия боя: цена записи событий и скорость вставки")
+    events.add_argument("--battles", type=int, default=2000)
+    events.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    if args.command == "objects":
+        bench_objects(args.count)
+    elif args.command == "logger":
+        bench_logger(args.lines)
+    elif args.command == "snapshot":
+        bench_snapshot(args.count)
+    elif args.command == "initiative":
+        bench_initiative(args.units)
+    elif args.command == "raid":
+        bench_raid(args.heroes, args.bosses)
+    elif args.command == "imports":
+        if not bench_imports(args.repeats):
+            sys.exit(1)
+    elif args.command == "storage":
+        bench_storage(args.battles, args.batch)
+    elif args.command == "events":
+        bench_events(args.battles, repeats=args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,31 @@
 # Импорт Character, работающий и при запуске напрямую, и как пакет bd_curs
 try:
     from main import Character
+    from content import BOSSES
 except ImportError:
     from .main import Character
-
-import random
+    from .content import BOSSES
 
 # Импорт эффектов так, чтобы работало и как скрипт, и как пакет
 try:
     from effects import PoisonEffect, ShieldEffect, StunEffect
+    from events import SkillUsed, DamageDealt, Notice
 except ImportError:
     from .effects import PoisonEffect, ShieldEffect, StunEffect
+    from .events import SkillUsed, DamageDealt, Notice
 
 
 class Boss(Character):
-    def __init__(self, name):
-        # Босс, сбалансированный под текущую пати: всё ещё опасный, но не «ваншотит» команду
-        super().__init__(name, 1700, 70, "Босс")
+    __slots__ = ("special_attack_cooldown",)
+    STATE_FIELDS = Character.STATE_FIELDS + ("special_attack_cooldown",)
+
+    def __init__(self, name, kind="Boss"):
+        # Характеристики — из content.json (сбалансированы под текущую пати)
+        definition = BOSSES[kind]
+        super().__init__(name, definition.hp, definition.damage, definition.role)
         self.special_attack_cooldown = 0
-        self.mp = 200
-        self.max_mp = 200
+        self.mp = definition.mp
+        self.max_mp = definition.mp
 
     def use_skill(self):
         skills = [
@@ -27,17 +33,18 @@ class Boss(Character):
             self.shield_wall,
             self.stomp_attack
         ]
-        skill = random.choice(skills)
+        skill = self.rng.choice(skills)
         return skill()
 
     def poison_breath(self):
         if self.mp >= 40:
             self.mp -= 40
-            print(f"{self.name} использует Ядовитое дыхание!")
+            if self.bus.active:
+                self.bus.publish(SkillUsed(self, "poison_breath"))
             for hero in self.heroes:
                 if hero.is_alive:
                     # Чуть ослабленное отравление
-                    poison = PoisonEffect(duration=4, damage_per_turn=15)
+                    poison = PoisonEffect.acquire(duration=4, damage_per_turn=15)
                     hero.add_effect(poison)
             return "Все герои отравлены!"
         return "Недостаточно маны для навыка!"
@@ -46,33 +53,36 @@ class Boss(Character):
         if self.mp >= 30:
             self.mp -= 30
             # Щит по‑прежнему полезен, но не такой мощный
-            shield = ShieldEffect(duration=3, shield_amount=60)
+            shield = ShieldEffect.acquire(duration=3, shield_amount=60)
             self.add_effect(shield)
             return f"{self.name} создает магический щит!"
         return "Недостаточно маны для навыка!"
 
     def stomp_attack(self):
-        print(f"{self.name} использует Сокрушающий удар!")
+        bus = self.bus
+        if bus.active:
+            bus.publish(SkillUsed(self, "stomp"))
         total_damage = 0
         for hero in self.heroes:
             if hero.is_alive:
                 # Чуть сниженный урон
-                damage = random.randint(35, 50)
+                damage = self.rng.randint(35, 50)
                 actual_damage = hero.take_damage(damage)
                 total_damage += actual_damage
 
                 # Оглушение по‑прежнему опасно, но реже и короче
-                if random.random() < 0.4:
-                    stun = StunEffect(duration=1)
+                if self.rng.random() < 0.4:
+                    stun = StunEffect.acquire(duration=1)
                     hero.add_effect(stun)
-                    print(f"  {hero.name} оглушен!")
-                else:
-                    print(f"  {hero.name} получает {actual_damage} урона!")
+                    if bus.active:
+                        bus.publish(Notice("  {} оглушен!", hero.name))
+                elif bus.active:
+                    bus.publish(DamageDealt(self, hero, actual_damage, "stomp"))
 
         return f"Общий урон: {total_damage}"
 
     def attack(self, target):
-        if self.special_attack_cooldown <= 0 and random.random() < 0.3:
+        if self.special_attack_cooldown <= 0 and self.rng.random() < 0.3:
             return self.use_skill()
         else:
             if self.special_attack_cooldown > 0:
@@ -1,71 +1,97 @@
 # Импорты, которые работают и при запуске напрямую, и при запуске как пакет bd_curs
 try:
     from core import Character, CritMixin
+    from effects import PoisonEffect
+    from events import SkillUsed, Healed
+    from roster import AliveSet
+    from content import CLASSES
 except ImportError:
     from .core import Character, CritMixin
-import random
+    from .effects import PoisonEffect
+    from .events import SkillUsed, Healed
+    from .roster import AliveSet
+    from .content import CLASSES
+
+
+def _init_hero(hero, name, definition):
+    """Характеристики героя из определения класса (content.CLASSES)."""
+    Character.__init__(hero, name, definition.hp, definition.damage, definition.role)
+    hero.mp = definition.mp
+    hero.max_mp = definition.mp
+    hero.agility = definition.agility
+    if isinstance(hero, CritMixin):
+        CritMixin.__init__(hero, crit_chance=definition.crit_chance, crit_multiplier=definition.crit_multiplier)
 
 
 class Warrior(Character, CritMixin):
+    __slots__ = ("crit_chance", "crit_multiplier")
+
     def __init__(self, name):
-        super().__init__(name, 150, 30, "Воин")
-        self.mp = 50
-        self.max_mp = 50
-        self.agility = 12
-        CritMixin.__init__(self, crit_chance=0.25, crit_multiplier=2.0)
+        _init_hero(self, name, CLASSES["Warrior"])
 
 
 class Mage(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, 80, 40, "Маг")
-        self.mp = 100
-        self.max_mp = 100
-        self.agility = 15
+        _init_hero(self, name, CLASSES["Mage"])
 
     def attack(self, target):
         # Маг может использовать магическую атаку
-        if self.mp >= 15 and random.random() < 0.6:
+        if self.mp >= 15 and self.rng.random() < 0.6:
             self.mp -= 15
-            try:
-                from effects import PoisonEffect
-            except ImportError:
-                from .effects import PoisonEffect
-            poison = PoisonEffect(duration=3, damage_per_turn=8)
+            poison = PoisonEffect.acquire(duration=3, damage_per_turn=8)
             target.add_effect(poison)
-            damage = random.randint(20, 30)
+            damage = self.rng.randint(20, 30)
             actual_damage = target.take_damage(damage)
-            print(f"{self.name} использует ЯДОВИТЫЙ ШАР! Наносит {actual_damage} урона и отравляет {target.name}!")
+            if self.bus.active:
+                self.bus.publish(SkillUsed(self, "poison_ball", target, actual_damage))
             return actual_damage
         return super().attack(target)
 
 
 class Archer(Character, CritMixin):
+    __slots__ = ("crit_chance", "crit_multiplier")
+
     def __init__(self, name):
-        super().__init__(name, 100, 28, "Лучник")
-        self.mp = 40
-        self.max_mp = 40
-        self.agility = 25
-        CritMixin.__init__(self, crit_chance=0.35, crit_multiplier=2.2)
+        _init_hero(self, name, CLASSES["Archer"])
 
 
 class Healer(Character):
+    __slots__ = ()
+
     def __init__(self, name):
-        super().__init__(name, 90, 15, "Лекарь")
-        self.mp = 80
-        self.max_mp = 80
-        self.agility = 14
+        _init_hero(self, name, CLASSES["Healer"])
 
     def attack(self, target):
         # Лекарь предпочитает лечить
-        if self.mp >= 20 and random.random() < 0.7:
+        if self.mp >= 20 and self.rng.random() < 0.7:
             self.mp -= 20
-            alive_allies = [h for h in self.heroes if h.is_alive]
-            if alive_allies:
-                heal_target = random.choice(alive_allies)
-                heal_amount = random.randint(25, 40)
+            if isinstance(self.heroes, AliveSet):
+                heal_target = self.heroes.choice(self.rng)
+            else:
+                alive_allies = [h for h in self.heroes if h.is_alive]
+                heal_target = self.rng.choice(alive_allies) if alive_allies else None
+            if heal_target is not None:
+                heal_amount = self.rng.randint(25, 40)
                 old_hp = heal_target.hp
                 heal_target.hp = min(heal_target.max_hp, heal_target.hp + heal_amount)
                 actual_heal = heal_target.hp - old_hp
-                print(f"{self.name} лечит {heal_target.name} на {actual_heal} HP!")
+                if self.bus.active:
+                    self.bus.publish(Healed(self, heal_target, actual_heal, "heal"))
                 return 0
-        return super().attack(target)
\ No newline at end of file
+        return super().attack(target)
+
+
+# Классы с собственным кодом; остальные классы из content.json — просто Character
+HERO_TYPES = {"Warrior": Warrior, "Mage": Mage, "Archer": Archer, "Healer": Healer}
+
+
+def make_hero(kind, name):
+    """Герой класса kind из content.CLASSES (например, "Warrior")."""
+    cls = HERO_TYPES.get(kind)
+    if cls is not None:
+        return cls(name)
+    hero = Character.__new__(Character)
+    _init_hero(hero, name, CLASSES[kind])
+    return hero
@@ -0,0 +1,224 @@
+"""
+Определения игрового контента: классы героев, боссы, умения и предметы.
+
+Определения лежат в content.json рядом с модулем (другой файл можно задать
+переменной окружения BD_CURS_CONTENT). При импорте файл один раз читается,
+проверяется и компилируется в плоские таблицы:
+
+    CLASSES         имя класса героя -> ClassDef;
+    BOSSES          имя босса -> BossDef;
+    SKILLS          код умения -> SkillDef;
+    SKILLS_BY_ROLE  роль героя -> SkillDef его боевого умения;
+    ITEMS           ключ предмета -> ItemDef.
+
+Эффекты в определениях ({"type": "poison", "duration": 2, ...}) заранее
+превращаются в фабрики functools.partial(КлассЭффекта.acquire, ...), так что
+в бою умение или предмет — один поиск в словаре и готовый вызов. Ошибка в
+файле — ValueError с путём до поля при запуске, а не сбой посреди боя.
+"""
+
+import json
+import os
+from collections import namedtuple
+from functools import partial
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from effects import EFFECT_TYPES
+    from events import SkillUsed
+except ImportError:
+    from .effects import EFFECT_TYPES
+    from .events import SkillUsed
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content.json")
+
+# Виды умений и предметов; обработчики — battle.Battle.SKILL_HANDLERS и items.USE_HANDLERS
+SKILL_KINDS = ("strike", "heal_ally")
+ITEM_KINDS = ("heal", "mana", "self_effect", "boss_effect")
+
+ClassDef = namedtuple("ClassDef", (
+    "name", "role", "hp", "damage", "mp", "agility", "crit_chance", "crit_multiplier", "skill", "ui_skill",
+    "projectile",
+))
+BossDef = namedtuple("BossDef", ("name", "role", "hp", "damage", "mp"))
+# low/high — границы броска (урон или лечение), effect — фабрика эффекта или None
+SkillDef = namedtuple("SkillDef", ("key", "kind", "label", "min_mp", "mp_cost", "low", "high", "effect", "text"))
+ItemDef = namedtuple("ItemDef", ("key", "kind", "name", "description", "amount", "effect", "text"))
+Content = namedtuple("Content", ("classes", "bosses", "skills", "skills_by_role", "items"))
+
+_REQUIRED = object()
+_NUMBER = (int, float)
+
+
+# ---------- ПРОВЕРКА ПОЛЕЙ ----------
+
+def _object(data, path, allowed):
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: ожидается объект")
+    unknown = sorted(set(data) - set(allowed))
+    if unknown:
+        raise ValueError(f"{path}: неизвестные поля {', '.join(unknown)}")
+    return data
+
+
+def _field(data, key, path, types, default=_REQUIRED):
+    value = data.get(key)
+    if value is None:
+        if default is _REQUIRED:
+            raise ValueError(f"{path}.{key}: обязательное поле")
+        return default
+    # bool — подкласс int, но в числовых полях это почти наверняка опечатка
+    if isinstance(value, bool) or not isinstance(value, types):
+        raise ValueError(f"{path}.{key}: неверный тип {type(value).__name__}")
+    if isinstance(value, _NUMBER) and value < 0:
+        raise ValueError(f"{path}.{key}: значение не может быть отрицательным")
+    return value
+
+
+def _range(data, key, path):
+    value = data.get(key)
+    if (not isinstance(value, list) or len(value) != 2
+            or not all(isinstance(v, int) and not isinstance(v, bool) for v in value) or value[0] > value[1]):
+        raise ValueError(f"{path}.{key}: ожидается [минимум, максимум] из целых чисел")
+    return value
+
+
+def _effect(data, path):
+    """Фабрика эффекта из {"type": ..., параметры конструктора}."""
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: ожидается объект")
+    params = dict(data)
+    kind = params.pop("type", None)
+    cls = EFFECT_TYPES.get(kind)
+    if cls is None:
+        raise ValueError(f"{path}.type: неизвестный эффект {kind!r}")
+    # Параметры сверяем с аргументами конструктора по __code__, без модуля inspect
+    # (его импорт — заметная доля времени запуска)
+    code = cls.__init__.__code__
+    names = code.co_varnames[1:code.co_argcount + code.co_kwonlyargcount]
+    unknown = sorted(set(params) - set(names))
+    if unknown:
+        raise ValueError(f"{path}: неизвестные параметры {', '.join(unknown)}")
+    defaults = cls.__init__.__defaults__ or ()
+    required = names[:code.co_argcount - 1 - len(defaults)]
+    missing = [name for name in required if name not in params]
+    if missing:
+        raise ValueError(f"{path}: не заданы параметры {', '.join(missing)}")
+    return partial(cls.acquire, **params)
+
+
+# ---------- КОМПИЛЯЦИЯ ----------
+
+def _compile_skill(key, data, path):
+    _object(data, path, ("kind", "label", "min_mp", "mp_cost", "amount", "effect", "text"))
+    kind = _field(data, "kind", path, str)
+    if kind not in SKILL_KINDS:
+        raise ValueError(f"{path}.kind: неизвестный вид умения {kind!r}")
+    low, high = _range(data, "amount", path)
+    mp_cost = _field(data, "mp_cost", path, int)
+    return SkillDef(
+        key, kind, _field(data, "label", path, str, key),
+        _field(data, "min_mp", path, int, mp_cost), mp_cost, low, high,
+        _effect(data.get("effect"), f"{path}.effect"), _field(data, "text", path, str, None),
+    )
+
+
+def _compile_class(name, data, path, skills):
+    _object(data, path, (
+        "role", "hp", "damage", "mp", "agility", "crit_chance", "crit_multiplier", "skill", "ui_skill", "projectile",
+    ))
+    skill = _field(data, "skill", path, str, None)
+    if skill is not None and skill not in skills:
+        raise ValueError(f"{path}.skill: нет умения {skill!r}")
+    projectile = data.get("projectile", ["bolt", 6])
+    if (not isinstance(projectile, list) or len(projectile) != 2
+            or not isinstance(projectile[0], str) or not isinstance(projectile[1], int)):
+        raise ValueError(f"{path}.projectile: ожидается [вид, размер]")
+    return ClassDef(
+        name, _field(data, "role", path, str), _field(data, "hp", path, int), _field(data, "damage", path, int),
+        _field(data, "mp", path, int, 0), _field(data, "agility", path, int, 10),
+        _field(data, "crit_chance", path, _NUMBER, 0.2), _field(data, "crit_multiplier", path, _NUMBER, 2.0),
+        skill, _field(data, "ui_skill", path, str, None), tuple(projectile),
+    )
+
+
+def _compile_boss(name, data, path):
+    _object(data, path, ("role", "hp", "damage", "mp"))
+    return BossDef(
+        name, _field(data, "role", path, str, "Босс"), _field(data, "hp", path, int),
+        _field(data, "damage", path, int), _field(data, "mp", path, int, 0),
+    )
+
+
+def _compile_item(key, data, path):
+    _object(data, path, ("kind", "name", "description", "amount", "effect", "text"))
+    kind = _field(data, "kind", path, str)
+    if kind not in ITEM_KINDS:
+        raise ValueError(f"{path}.kind: неизвестный вид предмета {kind!r}")
+    effect = _effect(data.get("effect"), f"{path}.effect")
+    if kind in ("self_effect", "boss_effect") and effect is None:
+        raise ValueError(f"{path}.effect: обязательное поле для вида {kind!r}")
+    amount = _field(data, "amount", path, int, None if effect is not None else _REQUIRED)
+    return ItemDef(
+        key, kind, _field(data, "name", path, str), _field(data, "description", path, str, ""),
+        amount, effect, _field(data, "text", path, str),
+    )
+
+
+def _section(data, key, source):
+    section = data.get(key, {})
+    if not isinstance(section, dict):
+        raise ValueError(f"{source}: {key}: ожидается объект")
+    return section
+
+
+def compile_content(data, source="content"):
+    """Проверить разобранный JSON и собрать из него таблицы Content."""
+    _object(data, source, ("classes", "bosses", "skills", "items"))
+    skills = {key: _compile_skill(key, value, f"{source}: skills.{key}")
+              for key, value in _section(data, "skills", source).items()}
+    classes = {name: _compile_class(name, value, f"{source}: classes.{name}", skills)
+               for name, value in _section(data, "classes", source).items()}
+    bosses = {name: _compile_boss(name, value, f"{source}: bosses.{name}")
+              for name, value in _section(data, "bosses", source).items()}
+    items = {key: _compile_item(key, value, f"{source}: items.{key}")
+             for key, value in _section(data, "items", source).items()}
+
+    roles = set()
+    skills_by_role = {}
+    for definition in classes.values():
+        if definition.role in roles:
+            raise ValueError(f"{source}: classes.{definition.name}.role: роль {definition.role!r} уже занята")
+        roles.add(definition.role)
+        if definition.skill is not None:
+            skills_by_role[definition.role] = skills[definition.skill]
+    names = [item.name for item in items.values()]
+    if len(set(names)) != len(names):
+        raise ValueError(f"{source}: items: названия предметов повторяются")
+    return Content(classes, bosses, skills, skills_by_role, items)
+
+
+def load(path=None):
+    """Прочитать и скомпилировать файл определений (по умолчанию — content.json)."""
+    path = path or os.environ.get("BD_CURS_CONTENT") or DEFAULT_PATH
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{path}: {e}") from None
+    return compile_content(data, path)
+
+
+_content = load()
+CLASSES = _content.classes
+BOSSES = _content.bosses
+SKILLS = _content.skills
+SKILLS_BY_ROLE = _content.skills_by_role
+ITEMS = _content.items
+
+# Тексты умений из определений — в общую таблицу шаблонов события SkillUsed
+for _skill in SKILLS.values():
+    if _skill.text is not None:
+        SkillUsed.TEXT[_skill.key] = _skill.text
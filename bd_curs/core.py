@@ -1,9 +1,24 @@
-import random
 from abc import ABC, abstractmethod
 
+# Импорт генератора, работающий и при запуске напрямую, и как пакет bd_curs
+try:
+    from rng import DEFAULT_RNG
+    from effects import EffectTable, DerivedStatsMixin
+    from events import DEFAULT_BUS, EffectApplied, EffectExpired, ShieldAbsorbed, CriticalHit
+    from items import Inventory
+except ImportError:
+    from .rng import DEFAULT_RNG
+    from .effects import EffectTable, DerivedStatsMixin
+    from .events import DEFAULT_BUS, EffectApplied, EffectExpired, ShieldAbsorbed, CriticalHit
+    from .items import Inventory
+
 
 class BoundedStat:
-    """Дескриптор для валидации характеристик"""
+    """
+    Дескриптор для валидации характеристик.
+    Значение хранится в атрибуте _<имя>: у классов со __slots__ это должен
+    быть объявленный слот, у обычных классов — запись в __dict__.
+    """
 
     def __init__(self, min_val=0, max_val=1000):
         self.min_val = min_val
@@ -13,22 +28,42 @@ class BoundedStat:
         self.name = f"_{name}"
 
     def __get__(self, instance, owner):
-        return instance.__dict__.get(self.name, self.min_val)
+        if instance is None:
+            return self
+        return getattr(instance, self.name, self.min_val)
 
     def __set__(self, instance, value):
-        instance.__dict__[self.name] = max(self.min_val, min(self.max_val, value))
+        setattr(instance, self.name, max(self.min_val, min(self.max_val, value)))
 
 
-class Human:
+class Human(DerivedStatsMixin):
     """Базовый класс для всех персонажей"""
 
+    # Фиксированный набор полей вместо __dict__. mp/max_mp задают только
+    # классы с маной, heroes/boss — бой: пока слот не заполнен, hasattr()
+    # возвращает False, как и раньше. damage и agility — производные
+    # характеристики (effects.DerivedStatsMixin).
+    __slots__ = (
+        "name", "hp", "max_hp", "base_damage", "_damage", "damage_mod", "role", "effects", "base_agility",
+        "_agility", "agility_mod", "rng", "bus", "timeline", "team", "mp", "max_mp", "heroes", "boss",
+    )
+
+    # Поля, которые меняются в бою и попадают в снимок (snapshot.py)
+    STATE_FIELDS = ("hp", "mp", "base_damage", "base_agility", "damage_mod", "agility_mod")
+
     def __init__(self, name, hp, damage, role="Персонаж"):
         self.name = name
         self.hp = hp
         self.max_hp = hp
-        self.damage = damage
         self.role = role
-        self.effects = []
+        self.effects = EffectTable()
+        self.rng = DEFAULT_RNG  # Battle подменяет на поток своего боя
+        self.bus = DEFAULT_BUS  # и шину событий тоже
+        self.timeline = None  # шкала инициативы боя (initiative.Timeline)
+        self.team = None  # живые своей стороны (roster.AliveSet), задаёт бой
+        self.damage_mod = 0  # сумма модификаторов эффектов (effects.DerivedStatsMixin)
+        self.agility_mod = 0
+        self.damage = damage
         self.agility = 10  # Базовая ловкость для порядка ходов
 
     @property
@@ -36,39 +71,42 @@ class Human:
         return self.hp > 0
 
     def add_effect(self, effect):
-        self.effects.append(effect)
+        self.effects.add(effect)
         effect.on_apply(self)
-        print(f"{self.name} получает эффект: {effect.name}")
+        if self.bus.active:
+            self.bus.publish(EffectApplied(self, effect))
 
     def remove_effect(self, effect):
         if effect in self.effects:
             effect.on_remove(self)
             self.effects.remove(effect)
+            if self.bus.active:
+                self.bus.publish(EffectExpired(self, effect))
+            effect.release()
 
     def update_effects(self):
         """Обновляем эффекты в начале хода"""
-        for effect in self.effects[:]:
-            effect.duration -= 1
-            if effect.duration <= 0:
-                self.remove_effect(effect)
-            else:
-                effect.on_turn(self)
+        self.effects.update(self)
 
     def take_damage(self, damage):
         """Получение урона с учетом эффектов"""
         actual_damage = damage
-        for effect in self.effects:
-            if hasattr(effect, 'absorb_damage'):
-                actual_damage = effect.absorb_damage(actual_damage)
-                if actual_damage <= 0:
-                    break
+        for effect in self.effects.absorbers:
+            actual_damage = effect.absorb_damage(actual_damage)
+            if actual_damage <= 0:
+                break
 
+        if actual_damage < damage and self.bus.active:
+            self.bus.publish(ShieldAbsorbed(self, damage - actual_damage))
         self.hp = max(0, self.hp - actual_damage)
+        if self.hp == 0 and self.team is not None:
+            self.team.discard(self)
         return actual_damage
 
     def attack(self, target):
         """Базовая атака"""
-        damage = random.randint(self.damage - 5, self.damage + 5)
+        damage = self._damage
+        damage = self.rng.randint(damage - 5, damage + 5)
         actual_damage = target.take_damage(damage)
         return actual_damage
 
@@ -81,13 +119,10 @@ class Human:
 class Character(Human):
     """Класс персонажа игрока"""
 
+    __slots__ = ("inventory",)
+
     def __init__(self, name, hp, damage, role="Персонаж"):
         super().__init__(name, hp, damage, role)
-        # Импорт с учётом запуска как пакета bd_curs
-        try:
-            from items import Inventory
-        except ImportError:
-            from .items import Inventory
         self.inventory = Inventory()
 
     def use_item(self, item_name):
@@ -103,14 +138,18 @@ class Character(Human):
 class CritMixin:
     """Миксин для критического удара"""
 
+    # Пустые слоты: поля крита объявляет класс-наследник (иначе конфликт раскладки)
+    __slots__ = ()
+
     def __init__(self, crit_chance=0.2, crit_multiplier=2.0):
         self.crit_chance = crit_chance
         self.crit_multiplier = crit_multiplier
 
     def check_critical(self, damage):
         """Проверка критического удара"""
-        if random.random() < self.crit_chance:
+        if self.rng.random() < self.crit_chance:
             critical_damage = int(damage * self.crit_multiplier)
-            print("Критический удар!")
+            if self.bus.active:
+                self.bus.publish(CriticalHit(self, critical_damage))
             return critical_damage
         return damage
\ No newline at end of file
@@ -1,70 +1,127 @@
 """
-Модуль для работы с базой данных (MySQL на Jino).
+Модуль для работы с базой данных результатов боёв.
 
-Использует библиотеку PyMySQL:
-    pip install pymysql
+Функции модуля работают с текущим хранилищем (db_backend.StorageBackend):
+
+    mysql   — MySQL на Jino через PyMySQL (db_mysql, по умолчанию);
+    sqlite  — локальный файл SQLite (db_sqlite): без сервера, для тестов,
+              офлайн-прогонов и записи большого числа боёв.
+
+Хранилище выбирается переменной окружения DB_BACKEND (файл SQLite —
+DB_SQLITE_PATH) или явно через set_backend(open_backend("sqlite", path=...)).
+Модуль реализации (и PyMySQL) импортируется при первом обращении.
 
 Функции:
-    - get_connection() — создать подключение;
+    - get_backend(), set_backend(backend), open_backend(kind, **options);
     - init_db() — создать таблицы, если их ещё нет;
-    - save_battle_result(...) — сохранить результат боя.
+    - save_battle_result(...) — сохранить результат боя;
+    - save_battle_results(records) — сохранить пачку results.BattleRecord;
+    - save_battle_events(batches) — сохранить телеметрию боёв (results.BattleEvents);
+    - boss_stats(), daily_stats(), party_stats() — доля побед и средняя длина
+      боя по боссам, дням и составам пати (из сводных таблиц);
+    - fastest_victories() — таблица рекордов самых быстрых побед;
+    - class_win_rates() — доля побед по классам героев;
+      (у обеих since/until — период: читаются только секции его месяцев);
+    - event_totals() — телеметрия по действиям (урон/лечение умений и атак);
+    - rebuild_stats() — пересчитать сводные таблицы;
+    - partitions(), drop_partition(month) — помесячные секции боёв (retention.py);
+    - pool_metrics() — счётчики хранилища (у MySQL — пул и предохранитель);
+    - get_connection() — отдельное подключение к MySQL в обход пула.
 """
 
 from __future__ import annotations
 
-import datetime
+import threading
 from typing import Iterable
 
-import pymysql
-
 # Импорт конфигурации БД так, чтобы модуль работал и как часть пакета bd_curs,
 # и при запуске/импорте как обычный скрипт.
 try:
     from . import db_config  # пакетный импорт: bd_curs.db_config
+    from .db_backend import DatabaseUnavailable, StorageBackend, TTLCache, party_key
+    from .results import BattleEvents, BattleRecord, make_record
 except ImportError:
     import db_config  # скриптовый импорт: просто db_config.py в той же папке
+    from db_backend import DatabaseUnavailable, StorageBackend, TTLCache, party_key
+    from results import BattleEvents, BattleRecord, make_record
+
+BACKENDS = ("mysql", "sqlite")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _implementation(name: str):
+    # Модули хранилищ импортируются по требованию: db_mysql тянет PyMySQL
+    if __package__:
+        from importlib import import_module
+        return import_module(f".{name}", __package__)
+    return __import__(name)
+
+
+def open_backend(kind: str | None = None, **options) -> StorageBackend:
+    """
+    Новое хранилище вида kind (по умолчанию — DB_BACKEND). options — параметры
+    конструктора: path для sqlite, pool для mysql; cache_ttl для обоих.
+    """
+    kind = kind or db_config.DB_BACKEND
+    options.setdefault("cache_ttl", db_config.STATS_CACHE_TTL)
+    if kind == "sqlite":
+        options.setdefault("path", db_config.DB_SQLITE_PATH)
+        return _implementation("db_sqlite").SQLiteBackend(**options)
+    if kind == "mysql":
+        return _implementation("db_mysql").MySQLBackend(**options)
+    raise ValueError(f"Неизвестное хранилище {kind!r}: ожидается одно из {', '.join(BACKENDS)}")
+
+
+def get_backend() -> StorageBackend:
+    """Хранилище процесса (создаётся при первом обращении, см. open_backend)."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = open_backend()
+        return _backend
+
+
+def set_backend(backend: StorageBackend | None) -> StorageBackend | None:
+    """Заменить хранилище процесса; возвращает прежнее (его закрывает вызывающий)."""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    return previous
 
 
 def get_connection():
-    """Создаёт и возвращает подключение к БД."""
-    return pymysql.connect(
-        host=db_config.DB_HOST,
-        port=db_config.DB_PORT,
-        user=db_config.DB_USER,
-        password=db_config.DB_PASSWORD,
-        database=db_config.DB_NAME,
-        charset="utf8mb4",
-        autocommit=True,
-        cursorclass=pymysql.cursors.DictCursor,
-    )
+    """Создаёт и возвращает подключение к MySQL (в обход пула)."""
+    return _implementation("db_mysql").get_connection()
+
+
+def pool_metrics() -> dict:
+    """Счётчики хранилища и кэша статистики (у MySQL — ещё пул и предохранитель)."""
+    return get_backend().metrics()
 
 
 def init_db():
-    """Создаёт таблицу для результатов боёв, если её ещё нет."""
-    create_sql = """
-    CREATE TABLE IF NOT EXISTS battle_results (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        result ENUM('victory', 'defeat') NOT NULL,
-        boss_name VARCHAR(100) NOT NULL,
-        round_count INT NOT NULL,
-        hero1_name VARCHAR(100),
-        hero1_hp INT,
-        hero2_name VARCHAR(100),
-        hero2_hp INT,
-        hero3_name VARCHAR(100),
-        hero3_hp INT,
-        hero4_name VARCHAR(100),
-        hero4_hp INT,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-    ) CHARACTER SET utf8mb4
-    COLLATE utf8mb4_general_ci;
+    """Создать таблицы, если их ещё нет (MySQL заодно переносит старую battle_results)."""
+    get_backend().init_db()
+
+
+def save_battle_results(records: Iterable[BattleRecord]) -> int:
+    """
+    Сохранить пачку результатов (results.BattleRecord) одной транзакцией —
+    так их пишет results.ResultWriter. Запись с уже сохранённым battle_id
+    пропускается, поэтому пачку можно безопасно отправить повторно.
+    Возвращает, сколько боёв добавлено.
     """
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(create_sql)
-    finally:
-        conn.close()
+    return get_backend().save_battle_results(records)
+
+
+def save_battle_events(batches: Iterable[BattleEvents]) -> int:
+    """
+    Сохранить телеметрию нескольких боёв (results.BattleEvents) одной пачкой;
+    возвращает, сколько событий добавлено. Повторная отправка безопасна.
+    """
+    return get_backend().save_battle_events(batches)
 
 
 def save_battle_result(
@@ -79,59 +136,63 @@ def save_battle_result(
     result: 'victory' или 'defeat'
     boss_name: имя босса ("Дракон")
     round_count: количество раундов в бою
-    heroes: коллекция героев (ожидаются объекты с атрибутами .name и .hp)
+    heroes: коллекция героев (ожидаются объекты с атрибутами .name, .role и .hp)
     """
-    # Берём максимум 4 героев, чтобы соответствовать структуре таблицы.
-    heroes = list(heroes)[:4]
-    names = [getattr(h, "name", None) for h in heroes]
-    hps = [getattr(h, "hp", None) for h in heroes]
-
-    # Дополняем до 4 значений
-    while len(names) < 4:
-        names.append(None)
-        hps.append(None)
-
-    sql = """
-        INSERT INTO battle_results (
-            result,
-            boss_name,
-            round_count,
-            hero1_name, hero1_hp,
-            hero2_name, hero2_hp,
-            hero3_name, hero3_hp,
-            hero4_name, hero4_hp,
-            created_at
-        ) VALUES (%s, %s, %s,
-                  %s, %s,
-                  %s, %s,
-                  %s, %s,
-                  %s, %s,
-                  %s)
+    save_battle_results([make_record(result, boss_name, round_count, heroes)])
+
+
+def rebuild_stats() -> None:
+    """Пересчитать сводные таблицы по battles целиком (плановая сверка)."""
+    get_backend().rebuild_stats()
+
+
+def boss_stats() -> list:
+    """Доля побед и среднее число раундов по каждому боссу."""
+    return get_backend().boss_stats()
+
+
+def daily_stats(days: int = 30) -> list:
+    """Доля побед и среднее число раундов по дням за последние days дней (UTC)."""
+    return get_backend().daily_stats(days)
+
+
+def party_stats(limit: int = 20) -> list:
+    """Самые частые составы пати (см. party_key) с долей побед и средним числом раундов."""
+    return get_backend().party_stats(limit)
+
+
+def fastest_victories(limit: int = 10, boss_name: str | None = None, since=None, until=None) -> list:
+    """
+    Таблица рекордов: победы за наименьшее число раундов (при равенстве —
+    более ранние); since/until (datetime, UTC) — только бои за период.
     """
+    return get_backend().fastest_victories(limit, boss_name, since, until)
+
+
+def class_win_rates(boss_name: str | None = None, since=None, until=None) -> dict:
+    """Доля побед по классам (роли) героев: {роль: (боёв, побед)}; since/until — период."""
+    return get_backend().class_win_rates(boss_name, since, until)
+
+
+def event_totals(result: str | None = None, boss_name: str | None = None) -> dict:
+    """Телеметрия по действиям: {действие: (событий, сумма урона/лечения)}; см. StorageBackend.event_totals."""
+    return get_backend().event_totals(result, boss_name)
 
-    params = [
-        result,
-        boss_name,
-        int(round_count),
-        names[0],
-        hps[0],
-        names[1],
-        hps[1],
-        names[2],
-        hps[2],
-        names[3],
-        hps[3],
-        datetime.datetime.utcnow(),
-    ]
 
-    conn = get_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(sql, params)
-    finally:
-        conn.close()
+def partitions() -> list:
+    """Месяцы («ГГГГ-ММ»), за которые хранятся бои."""
+    return get_backend().partitions()
 
 
-__all__ = ["get_connection", "init_db", "save_battle_result"]
+def drop_partition(month: str) -> None:
+    """Удалить бои месяца month целиком (без архива — см. retention.apply_retention)."""
+    get_backend().drop_partition(month)
 
 
+__all__ = [
+    "BACKENDS", "DatabaseUnavailable", "StorageBackend", "TTLCache",
+    "open_backend", "get_backend", "set_backend", "get_connection", "pool_metrics",
+    "init_db", "save_battle_result", "save_battle_results", "save_battle_events", "rebuild_stats",
+    "boss_stats", "daily_stats", "party_stats", "fastest_victories", "class_win_rates", "event_totals", "party_key",
+    "partitions", "drop_partition",
+]
@@ -0,0 +1,338 @@
+"""
+Общая часть хранилищ результатов боёв.
+
+StorageBackend — интерфейс хранилища, за которым стоят функции модуля db
+(init_db, save_battle_results, статистика). Реализации:
+
+    db_mysql.MySQLBackend    — MySQL через PyMySQL (пул, предохранитель);
+    db_sqlite.SQLiteBackend  — локальный файл SQLite (WAL, пакетная запись).
+
+Схема у обеих одна: battles + battle_participants и сводные таблицы
+stats_boss_daily и stats_party, которые обновляются в той же транзакции,
+что и запись боёв, а также необязательная телеметрия battle_events
+(results.EventRecorder) — события боёв по ходам. Статистика отдаётся через кэш TTLCache хранилища; запись
+из этого же процесса сбрасывает его сразу.
+
+Бои и участники разбиты по месяцам created_at (UTC): у MySQL — секции
+PARTITION BY RANGE, у SQLite — отдельные таблицы на месяц. Запросы с
+периодом (since/until) читают только нужные месяцы, а старый месяц
+удаляется целиком (drop_partition, см. retention.py), без DELETE по строкам.
+"""
+
+from __future__ import annotations
+
+import datetime
+import re
+import threading
+import time
+from typing import Iterable, Iterator
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from results import SIDE_HERO, BattleEvents, BattleRecord, Participant
+except ImportError:
+    from .results import SIDE_HERO, BattleEvents, BattleRecord, Participant
+
+
+# Столбцы battles в выгрузке (StorageBackend.stream_battles, модуль export)
+BATTLE_COLUMNS = ("id", "battle_id", "result", "boss_name", "round_count", "created_at")
+# Столбцы battle_participants после BATTLE_COLUMNS в строках stream_partition
+PARTICIPANT_COLUMNS = ("slot", "side", "name", "role", "final_hp", "damage_dealt", "healing")
+
+_MONTH_RE = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
+
+
+class DatabaseUnavailable(RuntimeError):
+    """Запрос не отправлялся: хранилище недоступно (предохранитель разомкнут, соединения заняты)."""
+
+
+class TTLCache:
+    """
+    Кэш результатов запросов статистики в памяти процесса: значение живёт ttl
+    секунд. Запись боёв из этого процесса сбрасывает кэш сразу.
+    """
+
+    def __init__(self, ttl: float = 60.0, clock=time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = {}  # ключ -> (срок годности, значение)
+        self._generation = 0  # растёт при clear(): устаревший расчёт не попадёт в кэш
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """Значение по ключу; если его нет или оно устарело — compute() и запомнить."""
+        now = self._clock()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > now:
+                self.hits += 1
+                return item[1]
+            self.misses += 1
+            generation = self._generation
+        # Запрос к БД — вне блокировки: параллельный промах лишь посчитает то же самое
+        value = compute()
+        with self._lock:
+            if generation == self._generation:
+                self._data[key] = (self._clock() + self.ttl, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._generation += 1
+
+
+def party_key(participants) -> str:
+    """
+    Состав пати для stats_party: роли героев по алфавиту через «+», повторы —
+    «роль×n» («Воин×2+Маг»). Так же состав собирает пересчёт сводки в SQL.
+    """
+    counts = {}
+    for p in participants:
+        if p.side == SIDE_HERO:
+            role = p.role if p.role is not None else "?"
+            counts[role] = counts.get(role, 0) + 1
+    return "+".join(role if n == 1 else f"{role}×{n}" for role, n in sorted(counts.items()))
+
+
+
+def aggregate(records) -> tuple[dict, dict]:
+    """
+    Вклад новых боёв в сводные таблицы: ({(босс, день): [боёв, побед, раундов]},
+    {состав: [боёв, побед, раундов]}).
+    """
+    daily = {}
+    parties = {}
+    for record in records:
+        victory = 1 if record.result == "victory" else 0
+        row = daily.setdefault((record.boss_name, record.created_at.date()), [0, 0, 0])
+        row[0] += 1
+        row[1] += victory
+        row[2] += record.round_count
+        party = party_key(record.participants)
+        if party:
+            row = parties.setdefault(party, [0, 0, 0])
+            row[0] += 1
+            row[1] += victory
+            row[2] += record.round_count
+    return daily, parties
+
+
+def month_of(value: datetime.datetime | datetime.date) -> str:
+    """Месяц (секция) боя: «ГГГГ-ММ»."""
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def month_bounds(month: str) -> tuple[datetime.datetime, datetime.datetime]:
+    """Начало месяца «ГГГГ-ММ» и начало следующего (datetime, UTC)."""
+    if not isinstance(month, str) or not _MONTH_RE.fullmatch(month):
+        raise ValueError(f"Месяц {month!r}: ожидается ГГГГ-ММ")
+    year, number = int(month[:4]), int(month[5:])
+    start = datetime.datetime(year, number, 1)
+    return start, datetime.datetime(year + number // 12, number % 12 + 1, 1)
+
+
+def add_months(month: str, count: int) -> str:
+    """Месяц «ГГГГ-ММ», сдвинутый на count (может быть отрицательным)."""
+    start = month_bounds(month)[0]
+    index = start.year * 12 + start.month - 1 + count
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def months_in_period(months: Iterable[str], since=None, until=None) -> list[str]:
+    """Месяцы из months, пересекающиеся с since <= created_at < until (None — без границы)."""
+    selected = []
+    for month in sorted(months):
+        start, end = month_bounds(month)
+        if (since is None or end > since) and (until is None or start < until):
+            selected.append(month)
+    return selected
+
+
+def records_from_rows(rows: Iterable, chunk_size: int) -> Iterator[list]:
+    """
+    Строки (BATTLE_COLUMNS + PARTICIPANT_COLUMNS) боёв с их участниками,
+    упорядоченные по id и slot (у боя без участников столбцы участника — NULL),
+    -> списки BattleRecord не длиннее chunk_size.
+    """
+    chunk = []
+    battle = None
+    participants = []
+    for row in rows:
+        if battle is None or row[0] != battle[0]:
+            if battle is not None:
+                chunk.append(_record(battle, participants))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            battle = row
+            participants = []
+        if row[6] is not None:
+            participants.append(Participant(*row[7:13]))
+    if battle is not None:
+        chunk.append(_record(battle, participants))
+    if chunk:
+        yield chunk
+
+
+def _record(row, participants) -> BattleRecord:
+    created_at = row[5]
+    if isinstance(created_at, str):
+        created_at = datetime.datetime.fromisoformat(created_at)
+    return BattleRecord(row[2], row[3], row[4], tuple(participants), created_at, row[1])
+
+
+def rate_rows(rows: list, key: str) -> list:
+    """Строки сводки -> [{key, battles, victories, win_rate, avg_rounds}]."""
+    result = []
+    for row in rows:
+        battles = int(row["battles"])
+        victories = int(row["victories"] or 0)
+        result.append({
+            key: row[key],
+            "battles": battles,
+            "victories": victories,
+            "win_rate": victories / battles if battles else 0.0,
+            "avg_rounds": int(row["rounds_total"] or 0) / battles if battles else 0.0,
+        })
+    return result
+
+
+
+class StorageBackend:
+    """
+    Хранилище результатов боёв. Реализация определяет init_db, _save и
+    запросы _fetch_*; кэширование статистики — здесь.
+    """
+
+    name = None
+
+    def __init__(self, cache_ttl: float = 60.0):
+        self.cache = TTLCache(ttl=cache_ttl)
+
+    def init_db(self) -> None:
+        """Создать таблицы (и перенести старые данные), если нужно."""
+        raise NotImplementedError
+
+    def _save(self, records: list, update_stats: bool = True) -> int:
+        """Сохранить записи с новыми battle_id (и их вклад в сводку, если update_stats); вернуть, сколько добавлено."""
+        raise NotImplementedError
+
+    def save_battle_results(self, records: Iterable[BattleRecord], update_stats: bool = True) -> int:
+        """
+        Сохранить пачку results.BattleRecord одной транзакцией. Записи с уже
+        сохранённым battle_id пропускаются (и в сводку второй раз не попадают).
+        update_stats=False — сводные таблицы не трогать: так возвращаются бои
+        из архива (retention.restore_archive), которые в сводке уже учтены.
+        """
+        records = list({record.battle_id: record for record in records}.values())
+        if not records:
+            return 0
+        added = self._save(records, update_stats)
+        if added:
+            self.cache.clear()
+        return added
+
+    def rebuild_stats(self) -> None:
+        """Пересчитать сводные таблицы по battles целиком (плановая сверка)."""
+        raise NotImplementedError
+
+    def _save_events(self, rows: list) -> int:
+        """Записать строки (battle_id, *EVENT_COLUMNS), пропуская уже записанные; вернуть число новых."""
+        raise NotImplementedError
+
+    def save_battle_events(self, batches: Iterable[BattleEvents]) -> int:
+        """
+        Сохранить телеметрию (results.BattleEvents) нескольких боёв одной
+        пачкой. Строки с уже записанными (battle_id, seq) пропускаются, так что
+        повторная отправка безопасна. Возвращает, сколько событий добавлено.
+        """
+        rows = [(events.battle_id, *row) for events in batches for row in events.rows]
+        if not rows:
+            return 0
+        added = self._save_events(rows)
+        if added:
+            self.cache.clear()
+        return added
+
+    def boss_stats(self) -> list:
+        """Доля побед и среднее число раундов по каждому боссу."""
+        return self.cache.get(("boss",), self._fetch_boss_stats)
+
+    def daily_stats(self, days: int = 30) -> list:
+        """Доля побед и среднее число раундов по дням за последние days дней (UTC)."""
+        return self.cache.get(("daily", days), lambda: self._fetch_daily_stats(days))
+
+    def party_stats(self, limit: int = 20) -> list:
+        """Самые частые составы пати (см. party_key) с долей побед и средним числом раундов."""
+        return self.cache.get(("party", limit), lambda: self._fetch_party_stats(limit))
+
+    def fastest_victories(self, limit: int = 10, boss_name: str | None = None, since=None, until=None) -> list:
+        """
+        Таблица рекордов: победы за наименьшее число раундов (при равенстве —
+        более ранние). since/until (datetime, UTC) — только бои за период:
+        читаются лишь секции его месяцев.
+        """
+        return self.cache.get(("fastest", limit, boss_name, since, until),
+                              lambda: self._fetch_fastest_victories(limit, boss_name, since, until))
+
+    def class_win_rates(self, boss_name: str | None = None, since=None, until=None) -> dict:
+        """Доля побед по классам (роли) героев: {роль: (боёв, побед)}; since/until — как у fastest_victories."""
+        return self.cache.get(("class", boss_name, since, until),
+                              lambda: self._fetch_class_win_rates(boss_name, since, until))
+
+    def event_totals(self, result: str | None = None, boss_name: str | None = None) -> dict:
+        """
+        Телеметрия по действиям: {действие: (событий, сумма amount)}. Для урона
+        («attack», «poison», умения) amount — урон, для лечения — вылеченное HP.
+        result/boss_name — только бои с таким исходом и боссом («какое умение
+        нанесло больше всего урона в проигранных боях»: event_totals("defeat")).
+        """
+        return self.cache.get(("events", result, boss_name), lambda: self._fetch_event_totals(result, boss_name))
+
+    def battle_span(self, since=None, until=None) -> tuple[int, int]:
+        """
+        (число боёв, наибольший id) с since <= created_at < until (datetime;
+        None — без границы). max_id фиксирует выгрузку: бои, записанные во время
+        stream_battles, в неё не попадут, и число строк известно заранее.
+        """
+        raise NotImplementedError
+
+    def stream_battles(self, since=None, until=None, max_id: int | None = None,
+                       chunk_size: int = 10000) -> Iterator[list]:
+        """
+        Бои за период кусками до chunk_size кортежей (BATTLE_COLUMNS) — без
+        чтения всего результата в память. Порядок — по месяцам, внутри месяца
+        по возрастанию id.
+        """
+        raise NotImplementedError
+
+    def partitions(self) -> list[str]:
+        """Месяцы («ГГГГ-ММ»), за которые есть секция боёв, по возрастанию."""
+        raise NotImplementedError
+
+    def stream_partition(self, month: str, chunk_size: int = 1000) -> Iterator[list]:
+        """Бои месяца month с участниками — списками results.BattleRecord до chunk_size (для архива)."""
+        raise NotImplementedError
+
+    def _drop_partition(self, month: str) -> None:
+        raise NotImplementedError
+
+    def drop_partition(self, month: str) -> None:
+        """
+        Удалить секцию месяца month целиком — бои, участников и их телеметрию
+        battle_events. Сводные таблицы не меняются: статистика за удалённый
+        месяц остаётся (до rebuild_stats).
+        """
+        month_bounds(month)
+        self._drop_partition(month)
+        self.cache.clear()
+
+    def metrics(self) -> dict:
+        """Счётчики хранилища (у MySQL — пул и предохранитель) и кэша статистики."""
+        return {"backend": self.name, "cache_hits": self.cache.hits, "cache_misses": self.cache.misses}
+
+    def close(self) -> None:
+        pass
@@ -59,16 +59,34 @@ for env_path in ENV_CANDIDATES:
 
 # Читаем настройки из окружения (после попытки загрузки .env)
 DB_HOST = os.getenv("DB_HOST")
-DB_PORT = int(os.getenv("DB_PORT", "3306"))
+DB_PORT = int(os.getenv("DB_PORT") or "3306")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
+# Сколько секунд ждать TCP-подключения, прежде чем считать БД недоступной
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT") or "5")
+# Телеметрия боёв (battle_events) на MySQL: пачки от DB_LOAD_DATA_ROWS строк
+# грузятся через LOAD DATA LOCAL INFILE, если сервер разрешает local_infile
+DB_LOCAL_INFILE = (os.getenv("DB_LOCAL_INFILE") or "0").lower() in ("1", "true", "yes")
+DB_LOAD_DATA_ROWS = int(os.getenv("DB_LOAD_DATA_ROWS") or "5000")
+# Хранилище результатов: mysql или sqlite (файл DB_SQLITE_PATH), см. db.open_backend
+DB_BACKEND = (os.getenv("DB_BACKEND") or "mysql").lower()
+DB_SQLITE_PATH = os.getenv("DB_SQLITE_PATH") or str(PACKAGE_DIR / "battles.sqlite3")
+# Сколько соединений держит пул db_mysql.ConnectionPool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or "4")
+# Сколько секунд кэш хранилища (db_backend.TTLCache) отдаёт статистику без повторного запроса
+STATS_CACHE_TTL = float(os.getenv("DB_STATS_CACHE_TTL") or "60")
 
 
-# Простая проверка: без этих параметров подключение к БД не имеет смысла
-if not all([DB_HOST, DB_NAME, DB_USER, DB_PASSWORD]):
-    raise RuntimeError(
-        "Не заданы переменные окружения DB_HOST, DB_NAME, DB_USER, DB_PASSWORD. "
-        "Создайте файл .env в корне проекта (или рядом с папкой bd_curs) "
-        "или экспортируйте их в окружение."
-    )
+def require():
+    """
+    Простая проверка: без этих параметров подключение к БД не имеет смысла.
+    Вызывается при подключении (db.get_connection), а не при импорте, чтобы
+    игра без .env запускалась и просто не сохраняла результаты.
+    """
+    if not all([DB_HOST, DB_NAME, DB_USER, DB_PASSWORD]):
+        raise RuntimeError(
+            "Не заданы переменные окружения DB_HOST, DB_NAME, DB_USER, DB_PASSWORD. "
+            "Создайте файл .env в корне проекта (или рядом с папкой bd_curs) "
+            "или экспортируйте их в окружение."
+        )
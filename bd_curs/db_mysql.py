@@ -0,0 +1,898 @@
+"""
+Хранилище результатов боёв в MySQL (на Jino) — db_backend.StorageBackend.
+
+Использует библиотеку PyMySQL:
+    pip install pymysql
+
+Соединения берутся из пула: новое подключение (TCP + авторизация) создаётся,
+только если свободных нет, а соединение, пролежавшее дольше ping_interval,
+перед выдачей проверяется ping(reconnect=True). Таблицы создаются один раз
+на процесс — при первом обращении.
+
+Если БД недоступна, предохранитель (CircuitBreaker) после нескольких ошибок
+подключения подряд (is_connection_error; взаимная блокировка или таймаут
+блокировки к ним не относятся) «размыкается»: следующие запросы сразу
+получают DatabaseUnavailable, не дожидаясь таймаута подключения. Через
+reset_timeout секунд пропускается один пробный запрос: удался — работа
+возобновляется, нет — ждём снова.
+
+Пачка результатов пишется одной транзакцией: SELECT уже сохранённых
+battle_id, многострочный INSERT новых боёв, SELECT их id, многострочный
+INSERT участников и обновление сводных таблиц.
+
+battles и battle_participants секционированы по месяцам created_at (UTC):
+PARTITION BY RANGE (UNIX_TIMESTAMP(created_at)), секции pГГГГММ и pmax для
+всего, что позже. Секции на PARTITION_MONTHS_AHEAD месяцев вперёд init_db
+выделяет из пустой pmax. Запросы с created_at в условии читают только свои
+секции, а старый месяц удаляется ALTER TABLE ... DROP PARTITION.
+"""
+
+from __future__ import annotations
+
+import calendar
+import datetime
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+# Импорт конфигурации БД так, чтобы модуль работал и как часть пакета bd_curs,
+# и при запуске/импорте как обычный скрипт.
+try:
+    from . import db_config  # пакетный импорт: bd_curs.db_config
+    from .db_backend import (
+        BATTLE_COLUMNS, PARTICIPANT_COLUMNS, DatabaseUnavailable, StorageBackend, add_months, aggregate,
+        month_bounds, month_of, rate_rows, records_from_rows,
+    )
+except ImportError:
+    import db_config  # скриптовый импорт: просто db_config.py в той же папке
+    from db_backend import (
+        BATTLE_COLUMNS, PARTICIPANT_COLUMNS, DatabaseUnavailable, StorageBackend, add_months, aggregate,
+        month_bounds, month_of, rate_rows, records_from_rows,
+    )
+
+
+# Коды OperationalError, означающие, что до сервера не достучаться: ошибки
+# клиента (нет соединения, сервер ушёл или оборвал ответ) и отказ сервера
+# принять подключение. Остальные OperationalError (1205 — таймаут ожидания
+# блокировки, 1213 — взаимная блокировка и т. п.) — ответ живого сервера.
+CONNECTION_ERROR_CODES = frozenset((
+    1040,  # ER_CON_COUNT_ERROR: слишком много соединений
+    1053,  # ER_SERVER_SHUTDOWN: сервер останавливается
+    2002,  # CR_CONNECTION_ERROR: нет локального сокета
+    2003,  # CR_CONN_HOST_ERROR: не удалось подключиться к хосту
+    2005,  # CR_UNKNOWN_HOST
+    2006,  # CR_SERVER_GONE_ERROR
+    2013,  # CR_SERVER_LOST
+    2055,  # CR_SERVER_LOST_EXTENDED
+))
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Ошибка означает недоступность сервера (а не ошибку в запросе или блокировку)."""
+    if isinstance(error, pymysql.err.OperationalError):
+        return bool(error.args) and error.args[0] in CONNECTION_ERROR_CODES
+    return isinstance(error, (pymysql.err.InterfaceError, OSError))
+
+
+def get_connection():
+    """Создаёт и возвращает подключение к БД."""
+    db_config.require()
+    return pymysql.connect(
+        host=db_config.DB_HOST,
+        port=db_config.DB_PORT,
+        user=db_config.DB_USER,
+        password=db_config.DB_PASSWORD,
+        database=db_config.DB_NAME,
+        charset="utf8mb4",
+        autocommit=True,
+        connect_timeout=db_config.DB_CONNECT_TIMEOUT,
+        cursorclass=pymysql.cursors.DictCursor,
+        # LOAD DATA LOCAL INFILE для больших пачек телеметрии (_insert_events)
+        local_infile=db_config.DB_LOCAL_INFILE,
+        # created_at пишется и читается в UTC: по нему режутся секции и считаются дни сводки
+        init_command="SET time_zone = '+00:00'",
+    )
+
+
+def _close(conn) -> None:
+    """Закрыть соединение, не обращая внимания на ошибки (оно и так может быть разорвано)."""
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+# ---------- ПРЕДОХРАНИТЕЛЬ ----------
+
+class CircuitBreaker:
+    """
+    Предохранитель: closed — запросы идут; open — отклоняются сразу;
+    half_open — пропущен один пробный запрос, ждём его исхода.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self.trips = 0  # сколько раз предохранитель размыкался
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос сейчас (в open по истечении паузы — одна проба)."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+
+# ---------- ПУЛ СОЕДИНЕНИЙ ----------
+
+class ConnectionPool:
+    """
+    Ограниченный пул соединений: не больше size одновременно, свободные
+    хранятся стопкой (последнее вернувшееся — самое «тёплое»).
+
+        with pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(...)
+
+    Соединение, на котором случилась ошибка, закрывается, а не возвращается.
+    """
+
+    def __init__(self, connect=None, size: int = 4, ping_interval: float = 30.0, acquire_timeout: float = 5.0,
+                 breaker: CircuitBreaker | None = None, clock=time.monotonic):
+        self._connect = connect or get_connection
+        self.size = size
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker if breaker is not None else CircuitBreaker(clock=clock)
+        self._clock = clock
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []  # (соединение, время возврата в пул)
+        self._in_use = 0
+        self._closed = False
+        self._counters = dict.fromkeys(
+            ("created", "reused", "pings", "discarded", "failures", "rejected", "timeouts"), 0)
+
+    def _count(self, name: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += delta
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._count("timeouts")
+            raise DatabaseUnavailable("все соединения с БД заняты")
+        try:
+            if not self.breaker.allow():
+                self._count("rejected")
+                raise DatabaseUnavailable("БД недоступна, повторная попытка позже")
+            conn = None
+            try:
+                conn = self._checkout()
+                yield conn
+            except BaseException as e:
+                if is_connection_error(e):
+                    self.breaker.record_failure()
+                    self._count("failures")
+                else:
+                    # Сервер отвечал, но состояние соединения после ошибки неизвестно
+                    self.breaker.record_success()
+                self._discard(conn)
+                raise
+            self.breaker.record_success()
+            self._checkin(conn)
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        with self._lock:
+            item = self._idle.pop() if self._idle else None
+            self._in_use += 1
+        if item is None:
+            conn = self._connect()
+            self._count("created")
+            return conn
+        conn, returned_at = item
+        if self._clock() - returned_at >= self.ping_interval:
+            self._count("pings")
+            try:
+                # Сервер мог закрыть простаивающее соединение (wait_timeout)
+                conn.ping(reconnect=True)
+            except BaseException:
+                self._count("discarded")
+                _close(conn)
+                raise
+        self._count("reused")
+        return conn
+
+    def _checkin(self, conn) -> None:
+        with self._lock:
+            if not self._closed:
+                self._in_use -= 1
+                self._idle.append((conn, self._clock()))
+                return
+        self._discard(conn)
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self._in_use -= 1
+            if conn is not None:
+                self._counters["discarded"] += 1
+        if conn is not None:
+            _close(conn)
+
+    def close(self) -> None:
+        """Закрыть пул: свободные соединения — сразу, занятые — когда их вернут."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close(conn)
+
+    def stats(self) -> dict:
+        """Счётчики пула, число занятых/свободных соединений и состояние предохранителя."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update(size=self.size, in_use=self._in_use, idle=len(self._idle))
+        stats.update(breaker=self.breaker.state, trips=self.breaker.trips)
+        return stats
+
+
+# ---------- СХЕМА ----------
+
+# Бой — одна строка battles, участники (любое число героев и боссов) — строки
+# battle_participants. Индексы под типичные запросы:
+#   battles (boss_name, result, created_at) — победы/поражения по боссу за период;
+#   battle_participants (side, role, battle_pk) — статистика по классам героев
+#   (соединение с battles идёт по первичному ключу).
+# В секционированной таблице каждый уникальный ключ включает created_at, а
+# внешние ключи не поддерживаются: уникальность battle_id проверяет _save
+# (SELECT ... FOR UPDATE), а участники хранят created_at своего боя, чтобы
+# лежать в секции того же месяца.
+_PARTITION_BY = "PARTITION BY RANGE (UNIX_TIMESTAMP(created_at))"
+
+SCHEMA = (
+    f"""
+    CREATE TABLE IF NOT EXISTS battles (
+        id BIGINT UNSIGNED AUTO_INCREMENT,
+        battle_id CHAR(32) CHARACTER SET ascii NOT NULL,
+        result ENUM('victory', 'defeat') NOT NULL,
+        boss_name VARCHAR(100) NOT NULL,
+        round_count INT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at),
+        UNIQUE KEY uq_battles_battle_id (battle_id, created_at),
+        KEY ix_battles_boss_result_created (boss_name, result, created_at),
+        KEY ix_battles_result_rounds (result, round_count, created_at)
+    ) ENGINE=InnoDB CHARACTER SET utf8mb4
+    COLLATE utf8mb4_general_ci
+    {_PARTITION_BY} (PARTITION pmax VALUES LESS THAN MAXVALUE)
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS battle_participants (
+        battle_pk BIGINT UNSIGNED NOT NULL,
+        slot SMALLINT UNSIGNED NOT NULL,
+        side ENUM('hero', 'boss') NOT NULL,
+        name VARCHAR(100),
+        role VARCHAR(50),
+        final_hp INT,
+        damage_dealt INT NOT NULL DEFAULT 0,
+        healing INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (battle_pk, slot, created_at),
+        KEY ix_participants_side_role_battle (side, role, battle_pk)
+    ) ENGINE=InnoDB CHARACTER SET utf8mb4
+    COLLATE utf8mb4_general_ci
+    {_PARTITION_BY} (PARTITION pmax VALUES LESS THAN MAXVALUE)
+    """,
+    # Сводные таблицы для статистики: обновляются в той же транзакции, что и
+    # запись боёв (_update_stats), так что запросы статистики не читают battles
+    """
+    CREATE TABLE IF NOT EXISTS stats_boss_daily (
+        boss_name VARCHAR(100) NOT NULL,
+        day DATE NOT NULL,
+        battles INT UNSIGNED NOT NULL,
+        victories INT UNSIGNED NOT NULL,
+        rounds_total BIGINT UNSIGNED NOT NULL,
+        PRIMARY KEY (boss_name, day),
+        KEY ix_stats_boss_daily_day (day)
+    ) ENGINE=InnoDB CHARACTER SET utf8mb4
+    COLLATE utf8mb4_general_ci
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS stats_party (
+        party VARCHAR(255) NOT NULL PRIMARY KEY,
+        battles INT UNSIGNED NOT NULL,
+        victories INT UNSIGNED NOT NULL,
+        rounds_total BIGINT UNSIGNED NOT NULL
+    ) ENGINE=InnoDB CHARACTER SET utf8mb4
+    COLLATE utf8mb4_general_ci
+    """,
+    # Телеметрия по ходам (results.EventRecorder). Связь с battles — по battle_id:
+    # события пишутся своим потоком и могут прийти раньше самого боя. Кроме
+    # первичного ключа (он же обслуживает соединение с battles) индексов нет —
+    # каждый лишний индекс замедлял бы массовую вставку
+    """
+    CREATE TABLE IF NOT EXISTS battle_events (
+        battle_id CHAR(32) CHARACTER SET ascii NOT NULL,
+        seq INT UNSIGNED NOT NULL,
+        round_no SMALLINT UNSIGNED NOT NULL,
+        actor VARCHAR(100),
+        action VARCHAR(32) NOT NULL,
+        target VARCHAR(100),
+        amount INT,
+        effect VARCHAR(32),
+        PRIMARY KEY (battle_id, seq)
+    ) ENGINE=InnoDB CHARACTER SET utf8mb4
+    COLLATE utf8mb4_general_ci
+    """,
+)
+
+# Индексы, добавленные после первых версий схемы: CREATE TABLE IF NOT EXISTS
+# их в существующие таблицы не добавит
+INDEXES = (
+    ("battles", "ix_battles_result_rounds", "(result, round_count, created_at)"),
+)
+
+# Старая таблица с колонками hero1..hero4: переносится в battles/battle_participants
+# и переименовывается в LEGACY_TABLE, чтобы перенос не повторялся
+LEGACY_TABLE = "battle_results_legacy"
+
+# Секционированные таблицы (участники — первыми: секции удаляются в этом порядке)
+PARTITIONED_TABLES = ("battle_participants", "battles")
+# На сколько месяцев вперёд держать готовые секции
+PARTITION_MONTHS_AHEAD = 3
+
+
+def _table_columns(cur, table: str) -> set:
+    cur.execute(
+        "SELECT COLUMN_NAME AS name FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return {row["name"] for row in cur.fetchall()}
+
+
+def _migrate_legacy(cur) -> None:
+    """Перенести строки battle_results (hero1..hero4) в нормализованную схему."""
+    columns = _table_columns(cur, "battle_results")
+    if not columns:
+        return
+    # Секции для месяцев старых боёв — до переноса: иначе все они легли бы в секцию
+    # текущего месяца (VALUES LESS THAN принимает любое более раннее время)
+    cur.execute("SELECT MIN(created_at) AS first FROM battle_results")
+    first = cur.fetchone()["first"]
+    if first is not None:
+        _split_partitions(cur, _month_range(month_of(first), month_of(datetime.datetime.utcnow())))
+    # Строкам без battle_id (до появления ключа идемпотентности) — ключ из id
+    key = "CONCAT('legacy', LPAD(id, 26, '0'))"
+    if "battle_id" in columns:
+        key = f"COALESCE(battle_id, {key})"
+    # INSERT IGNORE: прерванный перенос можно просто запустить снова
+    cur.execute(f"""
+        INSERT IGNORE INTO battles (battle_id, result, boss_name, round_count, created_at)
+        SELECT {key}, result, boss_name, round_count, created_at FROM battle_results
+    """)
+    heroes = " UNION ALL ".join(
+        f"SELECT {key} AS battle_id, {slot} AS slot, hero{slot + 1}_name AS name, hero{slot + 1}_hp AS hp "
+        f"FROM battle_results WHERE hero{slot + 1}_name IS NOT NULL"
+        for slot in range(4)
+    )
+    # Роль в старой таблице не хранилась — остаётся NULL
+    cur.execute(f"""
+        INSERT IGNORE INTO battle_participants (battle_pk, slot, side, name, role, final_hp, created_at)
+        SELECT b.id, h.slot, 'hero', h.name, NULL, h.hp, b.created_at
+        FROM ({heroes}) AS h JOIN battles AS b ON b.battle_id = h.battle_id
+    """)
+    cur.execute(f"RENAME TABLE battle_results TO {LEGACY_TABLE}")
+
+
+def _partition_name(month: str) -> str:
+    month_bounds(month)
+    return "p" + month.replace("-", "")
+
+
+def _partition_definitions(months, with_max: bool = True) -> str:
+    # Границы — секунды Unix начала следующего месяца (UTC), последняя секция — pmax
+    definitions = [
+        f"PARTITION {_partition_name(month)} VALUES LESS THAN ({calendar.timegm(month_bounds(month)[1].timetuple())})"
+        for month in months
+    ]
+    if with_max:
+        definitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    return ", ".join(definitions)
+
+
+def _month_range(first: str, last: str) -> list:
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+
+def _partitions(cur, table: str) -> list | None:
+    """Месяцы секций таблицы по порядку (без pmax); None — таблица не секционирована."""
+    cur.execute(
+        "SELECT PARTITION_NAME AS name FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION",
+        (table,),
+    )
+    names = [row["name"] for row in cur.fetchall()]
+    if not names:
+        return None
+    return [f"{name[1:5]}-{name[5:7]}" for name in names if name != "pmax"]
+
+
+def _partition_existing(cur, last_month: str) -> None:
+    """Секционировать battles/battle_participants, созданные до секций (одна перестройка таблиц)."""
+    if _partitions(cur, "battles") is not None:
+        return
+    cur.execute(
+        "SELECT CONSTRAINT_NAME AS name FROM information_schema.REFERENTIAL_CONSTRAINTS "
+        "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = 'battle_participants'"
+    )
+    for row in cur.fetchall():
+        cur.execute(f"ALTER TABLE battle_participants DROP FOREIGN KEY {row['name']}")
+    if "created_at" not in _table_columns(cur, "battle_participants"):
+        cur.execute("ALTER TABLE battle_participants "
+                    "ADD COLUMN created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP")
+        cur.execute("UPDATE battle_participants AS p JOIN battles AS b ON b.id = p.battle_pk "
+                    "SET p.created_at = b.created_at")
+    cur.execute("ALTER TABLE battles DROP PRIMARY KEY, ADD PRIMARY KEY (id, created_at), "
+                "DROP INDEX uq_battles_battle_id, ADD UNIQUE KEY uq_battles_battle_id (battle_id, created_at)")
+    cur.execute("ALTER TABLE battle_participants DROP PRIMARY KEY, ADD PRIMARY KEY (battle_pk, slot, created_at)")
+    cur.execute("SELECT MIN(created_at) AS first FROM battles")
+    first = cur.fetchone()["first"]
+    months = _month_range(min(month_of(first), last_month) if first is not None else last_month, last_month)
+    for table in PARTITIONED_TABLES:
+        cur.execute(f"ALTER TABLE {table} {_PARTITION_BY} ({_partition_definitions(months)})")
+
+
+def _ensure_partitions(cur, last_month: str) -> None:
+    """Выделить из pmax секции по last_month включительно (pmax пуста — это мгновенно)."""
+    for table in PARTITIONED_TABLES:
+        months = _partitions(cur, table)
+        first = add_months(months[-1], 1) if months else month_of(datetime.datetime.utcnow())
+        new = _month_range(first, last_month)
+        if new:
+            cur.execute(f"ALTER TABLE {table} REORGANIZE PARTITION pmax INTO ({_partition_definitions(new)})")
+
+
+def _split_partitions(cur, months) -> None:
+    """
+    Вернуть секции месяцам из months, которые лежат до последней секции, но
+    своей не имеют (удалены retention или старше первой секции): иначе их бои
+    попали бы в секцию следующего месяца. Секция, что сейчас покрывает эти
+    месяцы, делится одним REORGANIZE на их секции и себя.
+    """
+    for table in PARTITIONED_TABLES:
+        existing = _partitions(cur, table) or []
+        missing = {}
+        for month in sorted(set(months)):
+            if not existing or month in existing or month > existing[-1]:
+                continue
+            holder = next(other for other in existing if other > month)
+            missing.setdefault(holder, []).append(month)
+        for holder, new in missing.items():
+            cur.execute(f"ALTER TABLE {table} REORGANIZE PARTITION {_partition_name(holder)} "
+                        f"INTO ({_partition_definitions(new + [holder], with_max=False)})")
+
+
+def _ensure_indexes(cur) -> None:
+    for table, name, columns in INDEXES:
+        cur.execute(
+            "SELECT COUNT(*) AS n FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+            (table, name),
+        )
+        if not cur.fetchone()["n"]:
+            cur.execute(f"ALTER TABLE {table} ADD INDEX {name} {columns}")
+
+
+# ---------- ЗАПИСЬ ----------
+
+_INSERT_BATTLES_SQL = """
+    INSERT INTO battles (battle_id, result, boss_name, round_count, created_at)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE battle_id = battle_id
+"""
+
+_INSERT_PARTICIPANTS_SQL = """
+    INSERT INTO battle_participants (battle_pk, slot, side, name, role, final_hp, damage_dealt, healing, created_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE battle_pk = battle_pk
+"""
+
+
+_UPSERT_BOSS_DAILY_SQL = """
+    INSERT INTO stats_boss_daily (boss_name, day, battles, victories, rounds_total)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE battles = battles + VALUES(battles), victories = victories + VALUES(victories),
+                            rounds_total = rounds_total + VALUES(rounds_total)
+"""
+
+_UPSERT_PARTY_SQL = """
+    INSERT INTO stats_party (party, battles, victories, rounds_total)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE battles = battles + VALUES(battles), victories = victories + VALUES(victories),
+                            rounds_total = rounds_total + VALUES(rounds_total)
+"""
+
+
+_EVENT_COLUMNS_SQL = "(battle_id, seq, round_no, actor, action, target, amount, effect)"
+_INSERT_EVENTS_SQL = f"INSERT IGNORE INTO battle_events {_EVENT_COLUMNS_SQL} VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+# Формат LOAD DATA по умолчанию: поля через табуляцию, экранирование «\», NULL — «\N»
+_LOAD_EVENTS_SQL = (
+    f"LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE battle_events CHARACTER SET utf8mb4 {_EVENT_COLUMNS_SQL}"
+)
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n"})
+
+
+def _tsv_field(value) -> str:
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.translate(_TSV_ESCAPES)
+    return str(value)
+
+
+def _insert_events(cur, rows) -> int:
+    """
+    Массовая вставка телеметрии. Большие пачки (от DB_LOAD_DATA_ROWS строк, если
+    разрешён DB_LOCAL_INFILE) — через LOAD DATA LOCAL INFILE из временного
+    файла, остальные — многострочным INSERT IGNORE (PyMySQL склеивает
+    executemany в один запрос).
+    """
+    if not (db_config.DB_LOCAL_INFILE and len(rows) >= db_config.DB_LOAD_DATA_ROWS):
+        return cur.executemany(_INSERT_EVENTS_SQL, rows) or 0
+    with tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="\n", suffix=".tsv", delete=False) as f:
+        for row in rows:
+            f.write("\t".join(map(_tsv_field, row)))
+            f.write("\n")
+    try:
+        return cur.execute(_LOAD_EVENTS_SQL, (f.name,)) or 0
+    finally:
+        os.unlink(f.name)
+
+
+def _update_stats(cur, records) -> None:
+    """Добавить новые бои в сводные таблицы (по одной строке на босса/день и на состав)."""
+    daily, parties = aggregate(records)
+    cur.executemany(_UPSERT_BOSS_DAILY_SQL, [key + tuple(row) for key, row in daily.items()])
+    if parties:
+        cur.executemany(_UPSERT_PARTY_SQL, [(key, *row) for key, row in parties.items()])
+
+
+def _rebuild_stats(cur) -> None:
+    """Пересчитать сводные таблицы по battles целиком."""
+    cur.execute("DELETE FROM stats_boss_daily")
+    cur.execute("DELETE FROM stats_party")
+    cur.execute("""
+        INSERT INTO stats_boss_daily (boss_name, day, battles, victories, rounds_total)
+        SELECT boss_name, DATE(created_at), COUNT(*), SUM(result = 'victory'), SUM(round_count)
+        FROM battles GROUP BY boss_name, DATE(created_at)
+    """)
+    cur.execute("""
+        INSERT INTO stats_party (party, battles, victories, rounds_total)
+        SELECT party, COUNT(*), SUM(result = 'victory'), SUM(round_count)
+        FROM (
+            SELECT b.id, b.result, b.round_count,
+                   GROUP_CONCAT(IF(r.n = 1, r.role, CONCAT(r.role, '×', r.n)) ORDER BY r.role SEPARATOR '+') AS party
+            FROM battles AS b
+            JOIN (
+                SELECT battle_pk, COALESCE(role, '?') AS role, COUNT(*) AS n
+                FROM battle_participants WHERE side = 'hero' GROUP BY battle_pk, COALESCE(role, '?')
+            ) AS r ON r.battle_pk = b.id
+            GROUP BY b.id, b.result, b.round_count
+        ) AS t
+        GROUP BY party
+    """)
+
+
+def _whole_seconds(record):
+    # created_at — TIMESTAMP без дробной части: MySQL округлил бы микросекунды
+    # (иногда в следующую секунду, день или месяц), и поиск боя по created_at
+    # его бы не нашёл. Записи старых spool и архивов ещё хранят микросекунды
+    if record.created_at.microsecond:
+        return record._replace(created_at=record.created_at.replace(microsecond=0))
+    return record
+
+
+def _battle_ids_condition(records) -> tuple[str, list]:
+    # Диапазон created_at пачки: поиск по battle_id идёт только в секциях её месяцев
+    placeholders = ", ".join(["%s"] * len(records))
+    created = [record.created_at for record in records]
+    return (f"battle_id IN ({placeholders}) AND created_at BETWEEN %s AND %s",
+            [record.battle_id for record in records] + [min(created), max(created)])
+
+
+def _insert_battles(cur, records) -> None:
+    # executemany у PyMySQL склеивает INSERT ... VALUES (...) ON DUPLICATE KEY ...
+    # в один многострочный INSERT (с разбиением по max_allowed_packet)
+    cur.executemany(_INSERT_BATTLES_SQL, [
+        (record.battle_id, record.result, record.boss_name, int(record.round_count), record.created_at)
+        for record in records
+    ])
+    where, params = _battle_ids_condition(records)
+    cur.execute(f"SELECT id, battle_id FROM battles WHERE {where}", params)
+    ids = {row["battle_id"]: row["id"] for row in cur.fetchall()}
+    participants = [
+        (ids[record.battle_id], slot, p.side, p.name, p.role, p.hp, p.damage, p.healing, record.created_at)
+        for record in records
+        for slot, p in enumerate(record.participants)
+    ]
+    if participants:
+        cur.executemany(_INSERT_PARTICIPANTS_SQL, participants)
+
+
+# ---------- ХРАНИЛИЩЕ ----------
+
+class MySQLBackend(StorageBackend):
+    """Хранилище в MySQL (см. описание модуля)."""
+
+    name = "mysql"
+
+    def __init__(self, pool: ConnectionPool | None = None, cache_ttl: float = db_config.STATS_CACHE_TTL):
+        super().__init__(cache_ttl)
+        self.pool = pool if pool is not None else ConnectionPool(size=db_config.DB_POOL_SIZE)
+        self._schema_ready = False
+        self._partitioned_until = None  # последний месяц с готовой секцией
+
+    def init_db(self) -> None:
+        last_month = add_months(month_of(datetime.datetime.utcnow()), PARTITION_MONTHS_AHEAD)
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                for statement in SCHEMA:
+                    cur.execute(statement)
+                _partition_existing(cur, last_month)
+                _ensure_partitions(cur, last_month)
+                _ensure_indexes(cur)
+                _migrate_legacy(cur)
+                # Бои есть, а сводных данных нет (перенос, первое обновление схемы) — пересчитать
+                cur.execute("SELECT EXISTS(SELECT 1 FROM battles) AS battles, "
+                            "EXISTS(SELECT 1 FROM stats_boss_daily) AS stats")
+                row = cur.fetchone()
+                if row["battles"] and not row["stats"]:
+                    _rebuild_stats(cur)
+        self._partitioned_until = last_month
+        self._schema_ready = True
+
+    def _extend_partitions(self, last_month: str) -> None:
+        # Бой позже заготовленных секций попал бы в pmax: выделяем секции заранее
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                _ensure_partitions(cur, last_month)
+        self._partitioned_until = last_month
+
+    @contextmanager
+    def _transaction(self):
+        # Таблицы создаются один раз на процесс, а не перед каждым сохранением
+        if not self._schema_ready:
+            self.init_db()
+        with self.pool.connection() as conn:
+            conn.begin()
+            try:
+                with conn.cursor() as cur:
+                    yield cur
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def _save(self, records: list, update_stats: bool = True) -> int:
+        if not self._schema_ready:
+            self.init_db()
+        records = [_whole_seconds(record) for record in records]
+        months = {month_of(record.created_at) for record in records}
+        if max(months) > self._partitioned_until:
+            self._extend_partitions(max(months))
+        # Прошлые месяцы (возврат из архива, запоздавший spool): их секции могли быть удалены
+        if min(months) < month_of(datetime.datetime.utcnow()):
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    _split_partitions(cur, months)
+        with self._transaction() as cur:
+            where, params = _battle_ids_condition(records)
+            cur.execute(f"SELECT battle_id FROM battles WHERE {where} FOR UPDATE", params)
+            saved = {row["battle_id"] for row in cur.fetchall()}
+            records = [record for record in records if record.battle_id not in saved]
+            if records:
+                _insert_battles(cur, records)
+                if update_stats:
+                    _update_stats(cur, records)
+        return len(records)
+
+    def rebuild_stats(self) -> None:
+        with self._transaction() as cur:
+            _rebuild_stats(cur)
+        self.cache.clear()
+
+    def _query(self, sql: str, params=()) -> list:
+        if not self._schema_ready:
+            self.init_db()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchall()
+
+    def _fetch_boss_stats(self) -> list:
+        return rate_rows(self._query("""
+            SELECT boss_name, SUM(battles) AS battles, SUM(victories) AS victories, SUM(rounds_total) AS rounds_total
+            FROM stats_boss_daily GROUP BY boss_name ORDER BY battles DESC
+        """), "boss_name")
+
+    def _fetch_daily_stats(self, days: int) -> list:
+        return rate_rows(self._query("""
+            SELECT day, SUM(battles) AS battles, SUM(victories) AS victories, SUM(rounds_total) AS rounds_total
+            FROM stats_boss_daily WHERE day >= UTC_DATE() - INTERVAL %s DAY GROUP BY day ORDER BY day
+        """, (days,)), "day")
+
+    def _fetch_party_stats(self, limit: int) -> list:
+        return rate_rows(self._query("""
+            SELECT party, battles, victories, rounds_total FROM stats_party ORDER BY battles DESC LIMIT %s
+        """, (limit,)), "party")
+
+    def _fetch_fastest_victories(self, limit: int, boss_name: str | None, since=None, until=None) -> list:
+        # Читает первые строки индекса ix_battles_result_rounds (в секциях периода), а не всю battles
+        where, params = self._period(since, until, prefix="result = 'victory'")
+        sql = "SELECT battle_id, boss_name, round_count, created_at FROM battles" + where
+        if boss_name is not None:
+            sql += " AND boss_name = %s"
+            params.append(boss_name)
+        sql += " ORDER BY round_count, created_at LIMIT %s"
+        params.append(limit)
+        return self._query(sql, params)
+
+    def _fetch_class_win_rates(self, boss_name: str | None, since=None, until=None) -> dict:
+        # Идёт по индексу ix_participants_side_role_battle и первичному ключу battles
+        sql = """
+            SELECT p.role AS role, COUNT(*) AS battles, SUM(b.result = 'victory') AS victories
+            FROM battle_participants AS p
+            JOIN battles AS b ON b.id = p.battle_pk AND b.created_at = p.created_at
+            WHERE p.side = 'hero' AND p.role IS NOT NULL
+        """
+        params = []
+        # Период — для обеих таблиц, чтобы лишние секции отсекались у каждой
+        for alias in ("p", "b"):
+            if since is not None:
+                sql += f" AND {alias}.created_at >= %s"
+                params.append(since)
+            if until is not None:
+                sql += f" AND {alias}.created_at < %s"
+                params.append(until)
+        if boss_name is not None:
+            sql += " AND b.boss_name = %s"
+            params.append(boss_name)
+        sql += " GROUP BY p.role"
+        return {row["role"]: (int(row["battles"]), int(row["victories"] or 0)) for row in self._query(sql, params)}
+
+    def _save_events(self, rows: list) -> int:
+        with self._transaction() as cur:
+            return _insert_events(cur, rows)
+
+    def _fetch_event_totals(self, result: str | None, boss_name: str | None) -> dict:
+        sql = "SELECT e.action AS action, COUNT(*) AS events, SUM(e.amount) AS amount FROM battle_events AS e"
+        conditions = []
+        params = []
+        if result is not None or boss_name is not None:
+            sql += " JOIN battles AS b ON b.battle_id = e.battle_id"
+        if result is not None:
+            conditions.append("b.result = %s")
+            params.append(result)
+        if boss_name is not None:
+            conditions.append("b.boss_name = %s")
+            params.append(boss_name)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " GROUP BY e.action"
+        return {row["action"]: (int(row["events"]), int(row["amount"] or 0)) for row in self._query(sql, params)}
+
+    @staticmethod
+    def _period(since, until, max_id=None, prefix=None) -> tuple[str, list]:
+        conditions = [prefix] if prefix else []
+        params = []
+        for sql, value in (("created_at >= %s", since), ("created_at < %s", until), ("id <= %s", max_id)):
+            if value is not None:
+                conditions.append(sql)
+                params.append(value)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def battle_span(self, since=None, until=None) -> tuple[int, int]:
+        where, params = self._period(since, until)
+        row = self._query(f"SELECT COUNT(*) AS n, MAX(id) AS max_id FROM battles{where}", params)[0]
+        return int(row["n"]), int(row["max_id"] or 0)
+
+    def stream_battles(self, since=None, until=None, max_id=None, chunk_size=10000):
+        if not self._schema_ready:
+            self.init_db()
+        where, params = self._period(since, until, max_id)
+        sql = f"SELECT {', '.join(BATTLE_COLUMNS)} FROM battles{where} ORDER BY id"
+        with self.pool.connection() as conn:
+            # SSCursor: сервер отдаёт строки по мере fetchmany, а не весь результат
+            # сразу, и строки — кортежи, а не словари DictCursor
+            with conn.cursor(pymysql.cursors.SSCursor) as cur:
+                cur.execute(sql, params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+    def partitions(self) -> list[str]:
+        if not self._schema_ready:
+            self.init_db()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                return _partitions(cur, "battles") or []
+
+    def stream_partition(self, month, chunk_size=1000):
+        if not self._schema_ready:
+            self.init_db()
+        name = _partition_name(month)
+        if month not in self.partitions():
+            return
+        columns = ", ".join([f"b.{column}" for column in BATTLE_COLUMNS] + [f"p.{column}" for column in PARTICIPANT_COLUMNS])
+        sql = (f"SELECT {columns} FROM battles PARTITION ({name}) AS b "
+               f"LEFT JOIN battle_participants PARTITION ({name}) AS p ON p.battle_pk = b.id "
+               "ORDER BY b.id, p.slot")
+        with self.pool.connection() as conn:
+            with conn.cursor(pymysql.cursors.SSCursor) as cur:
+                cur.execute(sql)
+                # Итерация SSCursor — построчное чтение с сервера
+                yield from records_from_rows(cur, chunk_size)
+
+    def _drop_partition(self, month: str) -> None:
+        name = _partition_name(month)
+        if month not in self.partitions():
+            return
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                # battle_events не секционирована (у событий нет created_at) — её строки удаляются по боям месяца
+                cur.execute(f"DELETE e FROM battle_events AS e JOIN battles PARTITION ({name}) AS b "
+                            "ON b.battle_id = e.battle_id")
+                for table in PARTITIONED_TABLES:
+                    cur.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+
+    def metrics(self) -> dict:
+        metrics = super().metrics()
+        metrics.update(self.pool.stats())
+        return metrics
+
+    def close(self) -> None:
+        self.pool.close()
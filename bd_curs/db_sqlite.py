@@ -0,0 +1,516 @@
+"""
+Хранилище результатов боёв в локальном файле SQLite — db_backend.StorageBackend.
+
+Нужен там, где MySQL нет или он лишний: тесты, офлайн-прогоны симулятора,
+локальная запись большого числа боёв. Схема та же, что у db_mysql (battles,
+battle_participants, stats_boss_daily, stats_party), поэтому и статистика
+считается одинаково.
+
+Быстрая запись:
+    - журнал WAL и synchronous=NORMAL: фиксация транзакции — дописывание в
+      журнал без fsync базы на каждую пачку;
+    - пачка результатов — одна транзакция BEGIN IMMEDIATE ... COMMIT;
+    - запросы с параметрами «?»: sqlite3 кэширует подготовленные выражения,
+      и executemany не разбирает SQL заново для каждой строки.
+
+Телеметрия battle_events пишется так же: пачка событий нескольких боёв —
+один executemany в одной транзакции.
+
+Секций в SQLite нет, поэтому бои лежат в таблицах по месяцам created_at:
+battles_pГГГГММ и battle_participants_pГГГГММ (список — battle_partitions,
+сквозные id боёв — счётчик battle_ids). Запрос за период склеивает через
+UNION ALL только таблицы своих месяцев, а месяц удаляется одним DROP TABLE.
+Файл прежней схемы (одна таблица battles) раскладывается по месяцам при
+первом открытии.
+
+Одно соединение на хранилище, обращения из разных потоков (писатель
+результатов и игровой поток со статистикой) — под блокировкой.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from db_backend import (
+        BATTLE_COLUMNS, PARTICIPANT_COLUMNS, StorageBackend, aggregate, month_bounds, month_of, months_in_period,
+        party_key, rate_rows, records_from_rows,
+    )
+    from results import SIDE_HERO, Participant
+except ImportError:
+    from .db_backend import (
+        BATTLE_COLUMNS, PARTICIPANT_COLUMNS, StorageBackend, aggregate, month_bounds, month_of, months_in_period,
+        party_key, rate_rows, records_from_rows,
+    )
+    from .results import SIDE_HERO, Participant
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS battle_partitions (
+    month TEXT NOT NULL PRIMARY KEY
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS battle_ids (
+    next_id INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stats_boss_daily (
+    boss_name TEXT NOT NULL,
+    day TEXT NOT NULL,
+    battles INTEGER NOT NULL,
+    victories INTEGER NOT NULL,
+    rounds_total INTEGER NOT NULL,
+    PRIMARY KEY (boss_name, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS stats_party (
+    party TEXT NOT NULL PRIMARY KEY,
+    battles INTEGER NOT NULL,
+    victories INTEGER NOT NULL,
+    rounds_total INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS battle_events (
+    battle_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    round_no INTEGER NOT NULL,
+    actor TEXT,
+    action TEXT NOT NULL,
+    target TEXT,
+    amount INTEGER,
+    effect TEXT,
+    PRIMARY KEY (battle_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Таблицы одного месяца: {b} — battles_pГГГГММ, {p} — battle_participants_pГГГГММ.
+# Выражения по одному: executescript зафиксировал бы открытую транзакцию
+PARTITION_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS {b} (
+        id INTEGER PRIMARY KEY,
+        battle_id TEXT NOT NULL UNIQUE,
+        result TEXT NOT NULL CHECK (result IN ('victory', 'defeat')),
+        boss_name TEXT NOT NULL,
+        round_count INTEGER NOT NULL,
+        created_at TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_{b}_boss_result_created ON {b} (boss_name, result, created_at)",
+    "CREATE INDEX IF NOT EXISTS ix_{b}_result_rounds ON {b} (result, round_count, created_at)",
+    """CREATE TABLE IF NOT EXISTS {p} (
+        battle_pk INTEGER NOT NULL REFERENCES {b} (id) ON DELETE CASCADE,
+        slot INTEGER NOT NULL,
+        side TEXT NOT NULL CHECK (side IN ('hero', 'boss')),
+        name TEXT,
+        role TEXT,
+        final_hp INTEGER,
+        damage_dealt INTEGER NOT NULL DEFAULT 0,
+        healing INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (battle_pk, slot)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS ix_{p}_side_role_battle ON {p} (side, role, battle_pk)",
+)
+
+_INSERT_BATTLE_SQL = (
+    "INSERT INTO {b} (id, battle_id, result, boss_name, round_count, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+)
+_INSERT_PARTICIPANT_SQL = (
+    "INSERT INTO {p} (battle_pk, slot, side, name, role, final_hp, damage_dealt, healing) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_UPSERT_BOSS_DAILY_SQL = """
+    INSERT INTO stats_boss_daily (boss_name, day, battles, victories, rounds_total) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (boss_name, day) DO UPDATE SET battles = battles + excluded.battles,
+        victories = victories + excluded.victories, rounds_total = rounds_total + excluded.rounds_total
+"""
+_UPSERT_PARTY_SQL = """
+    INSERT INTO stats_party (party, battles, victories, rounds_total) VALUES (?, ?, ?, ?)
+    ON CONFLICT (party) DO UPDATE SET battles = battles + excluded.battles,
+        victories = victories + excluded.victories, rounds_total = rounds_total + excluded.rounds_total
+"""
+
+
+_INSERT_EVENT_SQL = (
+    "INSERT OR IGNORE INTO battle_events (battle_id, seq, round_no, actor, action, target, amount, effect) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+def _timestamp(value: datetime.datetime) -> str:
+    # Текст ISO сортируется как время — индексы по created_at работают
+    return value.isoformat(sep=" ")
+
+
+def _tables(month: str) -> tuple[str, str]:
+    suffix = month.replace("-", "")
+    return f"battles_p{suffix}", f"battle_participants_p{suffix}"
+
+
+def _union(template: str, months: list, params: list) -> tuple[str, list]:
+    # Один и тот же запрос по таблицам каждого месяца, склеенный UNION ALL
+    parts = []
+    for month in months:
+        b, p = _tables(month)
+        parts.append(template.format(b=b, p=p))
+    return " UNION ALL ".join(parts), params * len(months)
+
+
+class SQLiteBackend(StorageBackend):
+    """Хранилище в файле SQLite (см. описание модуля)."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, cache_ttl: float = 60.0):
+        super().__init__(cache_ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._months = None  # месяцы с таблицами (из battle_partitions), None — перечитать
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # isolation_level=None: транзакциями управляем сами (BEGIN IMMEDIATE в _transaction)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False,
+                                   cached_statements=64)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Индексы battles/участников при большой базе не помещаются в кэш по умолчанию (2 МБ)
+            conn.execute("PRAGMA cache_size=-65536")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.executescript(SCHEMA)
+            conn.execute("INSERT INTO battle_ids (next_id) SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM battle_ids)")
+            self._migrate_unpartitioned(conn)
+            self._conn = conn
+        return self._conn
+
+    def _migrate_unpartitioned(self, conn: sqlite3.Connection) -> None:
+        # Файл прежней схемы: одна таблица battles -> таблицы по месяцам
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'battles'").fetchone() is None:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            months = [row[0] for row in conn.execute("SELECT DISTINCT substr(created_at, 1, 7) FROM battles")]
+            for month in months:
+                b, p = self._create_partition(conn, month)
+                conn.execute(f"INSERT INTO {b} SELECT id, battle_id, result, boss_name, round_count, created_at "
+                             "FROM battles WHERE substr(created_at, 1, 7) = ?", (month,))
+                conn.execute(f"INSERT INTO {p} SELECT p.battle_pk, p.slot, p.side, p.name, p.role, p.final_hp, "
+                             f"p.damage_dealt, p.healing FROM battle_participants AS p JOIN {b} AS b ON b.id = p.battle_pk")
+            conn.execute("UPDATE battle_ids SET next_id = (SELECT COALESCE(MAX(id), 0) + 1 FROM battles)")
+            conn.execute("DROP TABLE IF EXISTS battle_participants")
+            conn.execute("DROP TABLE battles")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def init_db(self) -> None:
+        with self._lock:
+            self._connection()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE: блокировка записи берётся сразу, а не посреди пачки
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                # Таблицы месяцев, созданные в откаченной транзакции, тоже откатились
+                self._months = None
+                raise
+
+    def _known_months(self, conn: sqlite3.Connection) -> set:
+        if self._months is None:
+            self._months = {row[0] for row in conn.execute("SELECT month FROM battle_partitions")}
+        return self._months
+
+    @staticmethod
+    def _create_partition(conn: sqlite3.Connection, month: str) -> tuple[str, str]:
+        month_bounds(month)
+        b, p = _tables(month)
+        for sql in PARTITION_SCHEMA:
+            conn.execute(sql.format(b=b, p=p))
+        conn.execute("INSERT OR IGNORE INTO battle_partitions (month) VALUES (?)", (month,))
+        return b, p
+
+    def _partition(self, conn: sqlite3.Connection, month: str) -> tuple[str, str]:
+        months = self._known_months(conn)
+        if month not in months:
+            self._create_partition(conn, month)
+            months.add(month)
+        return _tables(month)
+
+    def _save(self, records: list, update_stats: bool = True) -> int:
+        by_month = {}
+        for record in records:
+            by_month.setdefault(month_of(record.created_at), []).append(record)
+        added = []
+        with self._transaction() as conn:
+            for month, batch in by_month.items():
+                battles, participants = self._partition(conn, month)
+                # Один запрос на всю пачку: список battle_id передаётся JSON-массивом.
+                # Бой с тем же battle_id лежит в таблице того же месяца: created_at записи не меняется
+                saved = {row[0] for row in conn.execute(
+                    f"SELECT battle_id FROM {battles} WHERE battle_id IN (SELECT value FROM json_each(?))",
+                    (json.dumps([record.battle_id for record in batch]),),
+                )}
+                batch = [record for record in batch if record.battle_id not in saved]
+                if not batch:
+                    continue
+                # Блокировка записи у нас (BEGIN IMMEDIATE), так что сквозные id новых
+                # боёв назначаем сами и пишем бои и участников двумя executemany
+                first = conn.execute("SELECT next_id FROM battle_ids").fetchone()[0]
+                conn.execute("UPDATE battle_ids SET next_id = ?", (first + len(batch),))
+                conn.executemany(_INSERT_BATTLE_SQL.format(b=battles), [
+                    (first + i, record.battle_id, record.result, record.boss_name, int(record.round_count),
+                     _timestamp(record.created_at))
+                    for i, record in enumerate(batch)
+                ])
+                conn.executemany(_INSERT_PARTICIPANT_SQL.format(p=participants), [
+                    (first + i, slot, p.side, p.name, p.role, p.hp, p.damage, p.healing)
+                    for i, record in enumerate(batch)
+                    for slot, p in enumerate(record.participants)
+                ])
+                added.extend(batch)
+            if not added:
+                return 0
+            if not update_stats:
+                return len(added)
+            daily, parties = aggregate(added)
+            conn.executemany(_UPSERT_BOSS_DAILY_SQL, [
+                (boss, day.isoformat(), *row) for (boss, day), row in daily.items()
+            ])
+            conn.executemany(_UPSERT_PARTY_SQL, [(key, *row) for key, row in parties.items()])
+        return len(added)
+
+    def rebuild_stats(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM stats_boss_daily")
+            conn.execute("DELETE FROM stats_party")
+            # Состав пати собираем тем же party_key, что и при записи
+            parties = {}
+
+            def flush(battle, heroes):
+                party = party_key(heroes)
+                if party:
+                    row = parties.setdefault(party, [0, 0, 0])
+                    row[0] += 1
+                    row[1] += battle["result"] == "victory"
+                    row[2] += battle["round_count"]
+
+            # По месяцу за раз: дни разных месяцев не пересекаются, а соединение
+            # боёв с участниками идёт по индексам таблиц одного месяца
+            for month in sorted(self._known_months(conn)):
+                b, p = _tables(month)
+                conn.execute(f"""
+                    INSERT INTO stats_boss_daily (boss_name, day, battles, victories, rounds_total)
+                    SELECT boss_name, substr(created_at, 1, 10), COUNT(*), SUM(result = 'victory'), SUM(round_count)
+                    FROM {b} GROUP BY boss_name, substr(created_at, 1, 10)
+                """)
+                battle = None
+                heroes = []
+                for row in conn.execute(f"""
+                    SELECT b.id, b.result, b.round_count, p.role FROM {b} AS b
+                    JOIN {p} AS p ON p.battle_pk = b.id AND p.side = 'hero'
+                    ORDER BY b.id
+                """):
+                    if battle is not None and row["id"] != battle["id"]:
+                        flush(battle, heroes)
+                        heroes = []
+                    battle = row
+                    heroes.append(Participant(SIDE_HERO, None, row["role"], None, 0, 0))
+                if battle is not None:
+                    flush(battle, heroes)
+            conn.executemany(_UPSERT_PARTY_SQL, [(key, *row) for key, row in parties.items()])
+        self.cache.clear()
+
+    def _save_events(self, rows: list) -> int:
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(_INSERT_EVENT_SQL, rows)
+            return conn.total_changes - before
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return [dict(row) for row in self._connection().execute(sql, params)]
+
+    def _period_months(self, since=None, until=None) -> list:
+        with self._lock:
+            return months_in_period(self._known_months(self._connection()), since, until)
+
+    def _fetch_boss_stats(self) -> list:
+        return rate_rows(self._query("""
+            SELECT boss_name, SUM(battles) AS battles, SUM(victories) AS victories, SUM(rounds_total) AS rounds_total
+            FROM stats_boss_daily GROUP BY boss_name ORDER BY battles DESC
+        """), "boss_name")
+
+    def _fetch_daily_stats(self, days: int) -> list:
+        rows = self._query("""
+            SELECT day, SUM(battles) AS battles, SUM(victories) AS victories, SUM(rounds_total) AS rounds_total
+            FROM stats_boss_daily WHERE day >= date('now', ?) GROUP BY day ORDER BY day
+        """, (f"-{int(days)} days",))
+        # Как у MySQL: день — datetime.date
+        for row in rows:
+            row["day"] = datetime.date.fromisoformat(row["day"])
+        return rate_rows(rows, "day")
+
+    def _fetch_party_stats(self, limit: int) -> list:
+        return rate_rows(self._query(
+            "SELECT party, battles, victories, rounds_total FROM stats_party ORDER BY battles DESC LIMIT ?",
+            (limit,),
+        ), "party")
+
+    def _fetch_fastest_victories(self, limit: int, boss_name: str | None, since=None, until=None) -> list:
+        months = self._period_months(since, until)
+        if not months:
+            return []
+        where, params = self._period(since, until, prefix="result = 'victory'")
+        if boss_name is not None:
+            where += " AND boss_name = ?"
+            params.append(boss_name)
+        # В каждом месяце лучшие limit берутся по индексу (result, round_count), затем общий отбор
+        sql, params = _union(
+            "SELECT * FROM (SELECT battle_id, boss_name, round_count, created_at FROM {b}"
+            + where + " ORDER BY round_count, created_at LIMIT ?)",
+            months, params + [limit],
+        )
+        rows = self._query(sql + " ORDER BY round_count, created_at LIMIT ?", params + [limit])
+        for row in rows:
+            row["created_at"] = datetime.datetime.fromisoformat(row["created_at"])
+        return rows
+
+    def _fetch_class_win_rates(self, boss_name: str | None, since=None, until=None) -> dict:
+        months = self._period_months(since, until)
+        if not months:
+            return {}
+        where, params = self._period(since, until, prefix="p.side = 'hero' AND p.role IS NOT NULL", alias="b.")
+        if boss_name is not None:
+            where += " AND b.boss_name = ?"
+            params.append(boss_name)
+        sql, params = _union(
+            "SELECT p.role AS role, COUNT(*) AS battles, SUM(b.result = 'victory') AS victories "
+            "FROM {p} AS p JOIN {b} AS b ON b.id = p.battle_pk" + where + " GROUP BY p.role",
+            months, params,
+        )
+        rows = self._query(
+            f"SELECT role, SUM(battles) AS battles, SUM(victories) AS victories FROM ({sql}) GROUP BY role", params)
+        return {row["role"]: (row["battles"], row["victories"] or 0) for row in rows}
+
+    def _fetch_event_totals(self, result: str | None, boss_name: str | None) -> dict:
+        if result is None and boss_name is None:
+            rows = self._query(
+                "SELECT action, COUNT(*) AS events, SUM(amount) AS amount FROM battle_events GROUP BY action")
+            return {row["action"]: (row["events"], row["amount"] or 0) for row in rows}
+        months = self._period_months()
+        if not months:
+            return {}
+        conditions = []
+        params = []
+        if result is not None:
+            conditions.append("b.result = ?")
+            params.append(result)
+        if boss_name is not None:
+            conditions.append("b.boss_name = ?")
+            params.append(boss_name)
+        sql, params = _union(
+            "SELECT e.action AS action, e.amount AS amount FROM battle_events AS e "
+            "JOIN {b} AS b ON b.battle_id = e.battle_id WHERE " + " AND ".join(conditions),
+            months, params,
+        )
+        rows = self._query(
+            f"SELECT action, COUNT(*) AS events, SUM(amount) AS amount FROM ({sql}) GROUP BY action", params)
+        return {row["action"]: (row["events"], row["amount"] or 0) for row in rows}
+
+    @staticmethod
+    def _period(since, until, max_id=None, prefix=None, alias="") -> tuple[str, list]:
+        conditions = [prefix] if prefix else []
+        params = []
+        for sql, value in (("created_at >= ?", since), ("created_at < ?", until), ("id <= ?", max_id)):
+            if value is not None:
+                conditions.append(alias + sql)
+                params.append(_timestamp(value) if isinstance(value, datetime.datetime) else value)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def battle_span(self, since=None, until=None) -> tuple[int, int]:
+        months = self._period_months(since, until)
+        if not months:
+            return 0, 0
+        where, params = self._period(since, until)
+        sql, params = _union("SELECT COUNT(*) AS n, MAX(id) AS max_id FROM {b}" + where, months, params)
+        row = self._query(f"SELECT SUM(n) AS n, MAX(max_id) AS max_id FROM ({sql})", params)[0]
+        return row["n"] or 0, row["max_id"] or 0
+
+    def _read_only(self) -> sqlite3.Connection:
+        # Отдельное соединение только для чтения: в WAL оно видит снимок базы и
+        # не держит блокировку хранилища, пока идёт выгрузка
+        self.init_db()
+        conn = sqlite3.connect(Path(self.path).resolve().as_uri() + "?mode=ro", uri=True,
+                               isolation_level=None, check_same_thread=False)
+        # Одна транзакция чтения на всю выгрузку: все месяцы — из одного снимка
+        conn.execute("BEGIN")
+        return conn
+
+    def stream_battles(self, since=None, until=None, max_id=None, chunk_size=10000):
+        where, params = self._period(since, until, max_id)
+        conn = self._read_only()
+        try:
+            months = months_in_period([row[0] for row in conn.execute("SELECT month FROM battle_partitions")],
+                                      since, until)
+            for month in months:
+                b, _ = _tables(month)
+                cur = conn.execute(f"SELECT {', '.join(BATTLE_COLUMNS)} FROM {b}{where} ORDER BY id", params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            conn.close()
+
+    def partitions(self) -> list[str]:
+        with self._lock:
+            return sorted(self._known_months(self._connection()))
+
+    def stream_partition(self, month, chunk_size=1000):
+        month_bounds(month)
+        conn = self._read_only()
+        try:
+            if conn.execute("SELECT 1 FROM battle_partitions WHERE month = ?", (month,)).fetchone() is None:
+                return
+            b, p = _tables(month)
+            columns = ", ".join([f"b.{name}" for name in BATTLE_COLUMNS] + [f"p.{name}" for name in PARTICIPANT_COLUMNS])
+            yield from records_from_rows(conn.execute(
+                f"SELECT {columns} FROM {b} AS b LEFT JOIN {p} AS p ON p.battle_pk = b.id ORDER BY b.id, p.slot"
+            ), chunk_size)
+        finally:
+            conn.close()
+
+    def _drop_partition(self, month: str) -> None:
+        with self._transaction() as conn:
+            if month not in self._known_months(conn):
+                return
+            b, p = _tables(month)
+            conn.execute(f"DELETE FROM battle_events WHERE battle_id IN (SELECT battle_id FROM {b})")
+            conn.execute(f"DROP TABLE {p}")
+            conn.execute(f"DROP TABLE {b}")
+            conn.execute("DELETE FROM battle_partitions WHERE month = ?", (month,))
+            self._months.discard(month)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,7 +1,82 @@
+from types import MappingProxyType
+
+# Импорт событий так, чтобы работало и как скрипт, и как пакет bd_curs
+try:
+    from events import DamageDealt, Healed, Notice
+except ImportError:
+    from .events import DamageDealt, Healed, Notice
+
+# Сколько свободных экземпляров каждого вида эффекта держать в пуле
+POOL_LIMIT = 1024
+
+_pools = {}
+
+
 class Effect:
-    def __init__(self, name, duration):
-        self.name = name
-        self.duration = duration
+    """
+    Базовый эффект. Неизменяемая часть определения (название и флаги вида) —
+    атрибуты класса, общие для всех экземпляров; в самом экземпляре хранится
+    только состояние конкретного наложения (длительность и параметры).
+
+    Эффекты ничего не печатают: тексты наложения и снятия — шаблоны
+    apply_text/remove_text, их форматируют подписчики шины событий.
+
+    Флаги вида используются EffectTable для индексов:
+        absorbs — у эффекта есть absorb_damage (щиты);
+        ticks — эффект что-то делает в on_turn;
+        stuns — эффект лишает хода.
+    """
+
+    __slots__ = ("_duration", "_expires", "_table", "_pooled")
+    name = "Эффект"
+    absorbs = False
+    ticks = False
+    stuns = False
+    # Шаблоны текста для событий наложения/снятия (поля {target} и {effect})
+    apply_text = ""
+    remove_text = ""
+
+    def __init__(self, duration):
+        self._duration = duration
+        self._expires = 0
+        self._table = None
+        self._pooled = False
+
+    @classmethod
+    def acquire(cls, *args, **kwargs):
+        """
+        Взять экземпляр из пула (или создать новый) и проинициализировать.
+        Такой эффект возвращается в пул, когда снимается с персонажа, поэтому
+        держать на него ссылку после снятия нельзя.
+        """
+        pool = _pools.get(cls)
+        effect = pool.pop() if pool else cls.__new__(cls)
+        effect.__init__(*args, **kwargs)
+        effect._pooled = True
+        return effect
+
+    def release(self):
+        """Вернуть эффект в пул, если он был взят через acquire()."""
+        if self._pooled:
+            pool = _pools.setdefault(type(self), [])
+            if len(pool) < POOL_LIMIT:
+                pool.append(self)
+
+    @property
+    def duration(self):
+        """Сколько обновлений эффект ещё продержится."""
+        table = self._table
+        if table is None:
+            return self._duration
+        return self._expires - table.tick
+
+    @duration.setter
+    def duration(self, value):
+        table = self._table
+        if table is None:
+            self._duration = value
+        else:
+            table.reschedule(self, value)
 
     def on_apply(self, target):
         pass
@@ -13,94 +88,303 @@ class Effect:
         pass
 
 
+# Общие пустые словари таблицы без эффектов (только для чтения)
+_NO_EFFECTS = MappingProxyType({})
+
+
+class EffectTable:
+    """
+    Эффекты персонажа с индексами по виду.
+
+    Снаружи ведёт себя как упорядоченная коллекция (итерация в порядке
+    наложения, len, in), а внутри хранит:
+        - эффекты по классу (has/of_kind за O(1));
+        - поглощающие урон эффекты (absorbers);
+        - счётчик оглушений (stunned);
+        - корзины истечения: эффект кладётся в корзину номера обновления,
+          на котором он закончится, поэтому update() не уменьшает
+          длительность каждого эффекта, а просто снимает одну корзину.
+
+    Семантика прежняя: при обновлении закончившиеся эффекты снимаются
+    (on_remove), остальные срабатывают (on_turn). Обработчики on_turn
+    не должны накладывать или снимать эффекты.
+    """
+
+    __slots__ = ("tick", "stun_count", "_order", "_by_kind", "_absorbers", "_tickers", "_buckets")
+
+    def __init__(self):
+        self.tick = 0
+        self.stun_count = 0
+        # Словари заводятся при первом add: у большинства персонажей эффектов нет
+        self._order = self._by_kind = self._absorbers = self._tickers = self._buckets = _NO_EFFECTS
+
+    def __iter__(self):
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __bool__(self):
+        return bool(self._order)
+
+    def __contains__(self, effect):
+        return effect in self._order
+
+    @property
+    def stunned(self):
+        return self.stun_count > 0
+
+    @property
+    def absorbers(self):
+        """Эффекты с absorb_damage в порядке наложения."""
+        return self._absorbers
+
+    def has(self, kind):
+        """Есть ли эффект данного класса."""
+        return bool(self._by_kind.get(kind))
+
+    def of_kind(self, kind):
+        return list(self._by_kind.get(kind, ()))
+
+    def add(self, effect):
+        if self._order is _NO_EFFECTS:
+            self._order = {}
+            self._by_kind = {}
+            self._absorbers = {}
+            self._tickers = {}
+            self._buckets = {}
+        self._order[effect] = None
+        self._by_kind.setdefault(type(effect), {})[effect] = None
+        if effect.absorbs:
+            self._absorbers[effect] = None
+        if effect.ticks:
+            self._tickers[effect] = None
+        if effect.stuns:
+            self.stun_count += 1
+        effect._table = self
+        self._schedule(effect, effect._duration)
+
+    def remove(self, effect):
+        """Убрать эффект из таблицы (on_remove вызывает владелец)."""
+        if effect not in self._order:
+            return False
+        del self._order[effect]
+        del self._by_kind[type(effect)][effect]
+        self._absorbers.pop(effect, None)
+        self._tickers.pop(effect, None)
+        if effect.stuns:
+            self.stun_count -= 1
+        bucket = self._buckets.get(effect._expires)
+        if bucket is not None:
+            bucket.pop(effect, None)
+        effect._duration = effect._expires - self.tick
+        effect._table = None
+        return True
+
+    def _schedule(self, effect, duration):
+        # Эффект с длительностью <= 0 снимается на ближайшем обновлении, как раньше
+        expires = self.tick + max(1, duration)
+        effect._expires = expires
+        self._buckets.setdefault(expires, {})[effect] = None
+
+    def reschedule(self, effect, duration):
+        """Изменить оставшуюся длительность эффекта."""
+        bucket = self._buckets.get(effect._expires)
+        if bucket is not None:
+            bucket.pop(effect, None)
+        self._schedule(effect, duration)
+
+    def update(self, owner):
+        """Одно обновление эффектов owner: снять истёкшие, затем сработать остальные."""
+        self.tick += 1
+        expired = self._buckets.pop(self.tick, None) if self._buckets else None
+        if expired:
+            for effect in expired:
+                owner.remove_effect(effect)
+        for effect in self._tickers:
+            effect.on_turn(owner)
+
+
+class DerivedStatsMixin:
+    """
+    Производные характеристики персонажа: база плюс сумма модификаторов.
+
+    Эффекты при наложении и снятии добавляют и убирают свои модификаторы
+    через modify_stats() — только тогда урон и ловкость пересчитываются;
+    готовые значения лежат в слотах _damage и _agility и читаются за O(1).
+    Присваивание damage или agility меняет базу (base_damage, base_agility).
+    Слоты base_damage, base_agility, damage_mod, agility_mod, _damage и
+    _agility объявляет класс персонажа.
+    """
+
+    __slots__ = ()
+
+    @property
+    def damage(self):
+        return self._damage
+
+    @damage.setter
+    def damage(self, value):
+        self.base_damage = value
+        self.refresh_stats()
+
+    @property
+    def agility(self):
+        return self._agility
+
+    @agility.setter
+    def agility(self, value):
+        self.base_agility = value
+        self.refresh_stats()
+
+    def modify_stats(self, damage=0, agility=0):
+        """Добавить модификаторы урона и ловкости (снятие эффекта — те же значения со знаком минус)."""
+        self.damage_mod += damage
+        self.agility_mod += agility
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        """Пересчитать урон и ловкость; при смене ловкости переставить ход на шкале инициативы."""
+        self._damage = max(1, self.base_damage + self.damage_mod)
+        base_agility = getattr(self, "base_agility", None)
+        if base_agility is None:
+            # Ловкость не задана (у босса её назначает бой)
+            return
+        agility = base_agility + self.agility_mod
+        if agility != getattr(self, "_agility", None):
+            self._agility = agility
+            if self.timeline is not None:
+                self.timeline.reschedule(self)
+
+
 class PoisonEffect(Effect):
+    __slots__ = ("damage_per_turn",)
+    name = "Отравление"
+    ticks = True
+    apply_text = "{target} отравлен! Будет получать {effect.damage_per_turn} урона за ход."
+    remove_text = "{target} больше не отравлен."
+
     def __init__(self, duration=3, damage_per_turn=5):
-        super().__init__("Отравление", duration)
+        super().__init__(duration)
         self.damage_per_turn = damage_per_turn
 
-    def on_apply(self, target):
-        print(f"{target.name} отравлен! Будет получать {self.damage_per_turn} урона за ход.")
-
     def on_turn(self, target):
         if target.is_alive:
             damage = target.take_damage(self.damage_per_turn)
-            print(f"{target.name} получает {damage} урона от яда!")
-
-    def on_remove(self, target):
-        print(f"{target.name} больше не отравлен.")
+            bus = target.bus
+            if bus.active:
+                bus.publish(DamageDealt(None, target, damage, "poison"))
 
 
 class ShieldEffect(Effect):
+    __slots__ = ("shield_amount", "remaining_shield")
+    name = "Щит"
+    absorbs = True
+    apply_text = "{target} получает щит на {effect.shield_amount} урона!"
+    remove_text = "Щит {target} исчезает."
+
     def __init__(self, duration=2, shield_amount=20):
-        super().__init__("Щит", duration)
+        super().__init__(duration)
         self.shield_amount = shield_amount
         self.remaining_shield = shield_amount
 
-    def on_apply(self, target):
-        print(f"{target.name} получает щит на {self.shield_amount} урона!")
-
     def absorb_damage(self, damage):
         if self.remaining_shield >= damage:
             self.remaining_shield -= damage
-            print(f"Щит поглощает {damage} урона!")
             return 0
         else:
             remaining_damage = damage - self.remaining_shield
-            print(f"Щит поглощает {self.remaining_shield} урона!")
             self.remaining_shield = 0
             return remaining_damage
 
-    def on_remove(self, target):
-        print(f"Щит {target.name} исчезает.")
-
 
 class StrengthBuffEffect(Effect):
+    __slots__ = ("damage_bonus",)
+    name = "Усиление силы"
+    apply_text = "{target} получает +{effect.damage_bonus} к урону!"
+    remove_text = "Эффект усиления силы у {target} заканчивается."
+
     def __init__(self, duration=3, damage_bonus=10):
-        super().__init__("Усиление силы", duration)
+        super().__init__(duration)
         self.damage_bonus = damage_bonus
 
     def on_apply(self, target):
-        target.damage += self.damage_bonus
-        print(f"{target.name} получает +{self.damage_bonus} к урону!")
+        target.modify_stats(damage=self.damage_bonus)
+
+    def on_remove(self, target):
+        target.modify_stats(damage=-self.damage_bonus)
+
+
+class SpeedEffect(Effect):
+    """Меняет ловкость (отрицательный бонус — замедление) и тем самым переставляет ход на шкале инициативы."""
+
+    __slots__ = ("agility_bonus",)
+    name = "Скорость"
+    apply_text = "Ловкость {target} меняется на {effect.agility_bonus:+d}!"
+    remove_text = "Ловкость {target} возвращается к прежней."
+
+    def __init__(self, duration=3, agility_bonus=5):
+        super().__init__(duration)
+        self.agility_bonus = agility_bonus
+
+    def on_apply(self, target):
+        target.modify_stats(agility=self.agility_bonus)
 
     def on_remove(self, target):
-        target.damage -= self.damage_bonus
-        print(f"Эффект усиления силы у {target.name} заканчивается.")
+        target.modify_stats(agility=-self.agility_bonus)
 
 
 class RegenerationEffect(Effect):
+    __slots__ = ("heal_per_turn",)
+    name = "Регенерация"
+    ticks = True
+    apply_text = "{target} начинает регенерировать!"
+    remove_text = "Регенерация {target} прекращается."
+
     def __init__(self, duration=3, heal_per_turn=10):
-        super().__init__("Регенерация", duration)
+        super().__init__(duration)
         self.heal_per_turn = heal_per_turn
 
-    def on_apply(self, target):
-        print(f"{target.name} начинает регенерировать!")
-
     def on_turn(self, target):
         if target.is_alive:
             old_hp = target.hp
             target.hp = min(target.max_hp, target.hp + self.heal_per_turn)
             actual_heal = target.hp - old_hp
             if actual_heal > 0:
-                print(f"{target.name} восстанавливает {actual_heal} HP от регенерации!")
-
-    def on_remove(self, target):
-        print(f"Регенерация {target.name} прекращается.")
+                bus = target.bus
+                if bus.active:
+                    bus.publish(Healed(None, target, actual_heal, "regen"))
 
 
 class StunEffect(Effect):
+    __slots__ = ("stunned_this_turn",)
+    name = "Оглушение"
+    ticks = True
+    stuns = True
+    apply_text = "{target} оглушен и пропускает ход!"
+    remove_text = "{target} больше не оглушен."
+
     def __init__(self, duration=1):
-        super().__init__("Оглушение", duration)
+        super().__init__(duration)
         self.stunned_this_turn = False
 
     def on_apply(self, target):
-        print(f"{target.name} оглушен и пропускает ход!")
         self.stunned_this_turn = True
 
     def on_turn(self, target):
         if self.stunned_this_turn:
-            print(f"{target.name} все еще оглушен!")
+            bus = target.bus
+            if bus.active:
+                bus.publish(Notice("{} все еще оглушен!", target.name))
             self.stunned_this_turn = False
 
-    def on_remove(self, target):
-        print(f"{target.name} больше не оглушен.")
\ No newline at end of file
+
+# Виды эффектов по имени — для определений в content.json ({"type": "poison", ...})
+EFFECT_TYPES = {
+    "poison": PoisonEffect,
+    "shield": ShieldEffect,
+    "strength": StrengthBuffEffect,
+    "speed": SpeedEffect,
+    "regeneration": RegenerationEffect,
+    "stun": StunEffect,
+}
@@ -0,0 +1,231 @@
+"""
+Шина событий боя.
+
+Игровая логика (персонажи, эффекты, босс, движки боя) не печатает текст,
+а публикует типизированные события: урон, лечение, наложение и снятие
+эффектов, использование умений, начало хода и т.д. Текст события строится
+только в подписчике, который этого хочет (консоль, BattleLogger, лог и
+всплывающие числа pygame), — без подписчиков события даже не создаются:
+
+    bus = target.bus
+    if bus.active:
+        bus.publish(DamageDealt(None, target, damage, "poison"))
+
+Событие действительно только во время publish(): оно ссылается на живые
+объекты (эффекты берутся из пула и переиспользуются), поэтому подписчик,
+которому нужен текст, должен вызвать format() сразу.
+"""
+
+
+class Event:
+    __slots__ = ()
+
+    def format(self):
+        raise NotImplementedError
+
+
+class RoundStarted(Event):
+    __slots__ = ("round",)
+
+    def __init__(self, round_number):
+        self.round = round_number
+
+    def format(self):
+        return f"\n{'=' * 60}\nРАУНД {self.round}\n{'=' * 60}"
+
+
+class TurnStarted(Event):
+    __slots__ = ("actor",)
+
+    def __init__(self, actor):
+        self.actor = actor
+
+    def format(self):
+        return f"\n--- Ход {self.actor.name} (Ловкость: {self.actor.agility}) ---"
+
+
+class TurnSkipped(Event):
+    __slots__ = ("actor", "reason")
+
+    TEXT = {
+        "stunned": "{} оглушен и пропускает ход!",
+        "skip": "{} пропускает ход",
+    }
+
+    def __init__(self, actor, reason="skip"):
+        self.actor = actor
+        self.reason = reason
+
+    def format(self):
+        return self.TEXT[self.reason].format(self.actor.name)
+
+
+class DamageDealt(Event):
+    """Урон: kind — "attack" (обычный удар), "poison" (тик яда), "stomp" (удар по площади)."""
+
+    __slots__ = ("source", "target", "amount", "kind")
+
+    def __init__(self, source, target, amount, kind="attack"):
+        self.source = source
+        self.target = target
+        self.amount = amount
+        self.kind = kind
+
+    def format(self):
+        if self.kind == "poison":
+            return f"{self.target.name} получает {self.amount} урона от яда!"
+        if self.kind == "stomp":
+            return f"  {self.target.name} получает {self.amount} урона!"
+        return f"{self.source.name} атакует {self.target.name} и наносит {self.amount} урона!"
+
+
+class ShieldAbsorbed(Event):
+    __slots__ = ("target", "amount")
+
+    def __init__(self, target, amount):
+        self.target = target
+        self.amount = amount
+
+    def format(self):
+        return f"Щит поглощает {self.amount} урона!"
+
+
+class Healed(Event):
+    """Лечение: kind — "heal" (Healer.attack), "heal_ally" (умение лекаря), "regen" (регенерация)."""
+
+    __slots__ = ("source", "target", "amount", "kind")
+
+    def __init__(self, source, target, amount, kind="heal"):
+        self.source = source
+        self.target = target
+        self.amount = amount
+        self.kind = kind
+
+    def format(self):
+        if self.kind == "regen":
+            return f"{self.target.name} восстанавливает {self.amount} HP от регенерации!"
+        if self.kind == "heal_ally":
+            return f"{self.source.name} исцеляет {self.target.name} на {self.amount} HP!"
+        return f"{self.source.name} лечит {self.target.name} на {self.amount} HP!"
+
+
+class EffectApplied(Event):
+    __slots__ = ("target", "effect")
+
+    def __init__(self, target, effect):
+        self.target = target
+        self.effect = effect
+
+    def format(self):
+        line = f"{self.target.name} получает эффект: {self.effect.name}"
+        text = self.effect.apply_text
+        if text:
+            return text.format(target=self.target.name, effect=self.effect) + "\n" + line
+        return line
+
+
+class EffectExpired(Event):
+    __slots__ = ("target", "effect")
+
+    def __init__(self, target, effect):
+        self.target = target
+        self.effect = effect
+
+    def format(self):
+        return self.effect.remove_text.format(target=self.target.name, effect=self.effect)
+
+
+class SkillUsed(Event):
+    """Умение: текст берётся из шаблона по коду умения (умения из content.json добавляют свои)."""
+
+    __slots__ = ("actor", "skill", "target", "amount")
+
+    TEXT = {
+        "poison_ball": "{actor} использует ЯДОВИТЫЙ ШАР! Наносит {amount} урона и отравляет {target}!",
+        "poison_breath": "{actor} использует Ядовитое дыхание!",
+        "shield_wall": "{actor} создает магический щит!",
+        "stomp": "{actor} использует Сокрушающий удар!",
+    }
+
+    def __init__(self, actor, skill, target=None, amount=None):
+        self.actor = actor
+        self.skill = skill
+        self.target = target
+        self.amount = amount
+
+    def format(self):
+        target = self.target.name if self.target is not None else ""
+        return self.TEXT[self.skill].format(actor=self.actor.name, target=target, amount=self.amount)
+
+
+class CriticalHit(Event):
+    __slots__ = ("actor", "amount")
+
+    def __init__(self, actor, amount):
+        self.actor = actor
+        self.amount = amount
+
+    def format(self):
+        return "Критический удар!"
+
+
+class Notice(Event):
+    """Прочие сообщения: шаблон и аргументы, форматируются только по запросу."""
+
+    __slots__ = ("template", "args")
+
+    def __init__(self, template, *args):
+        self.template = template
+        self.args = args
+
+    def format(self):
+        return self.template.format(*self.args)
+
+
+class StatusReport(Event):
+    """Статус боя в конце раунда; строки собирает сам бой (battle.status_lines())."""
+
+    __slots__ = ("battle",)
+
+    def __init__(self, battle):
+        self.battle = battle
+
+    def format(self):
+        return "\n".join(self.battle.status_lines())
+
+
+class EventBus:
+    """Синхронная шина: publish() сразу вызывает подписчиков по порядку."""
+
+    __slots__ = ("active", "_subscribers")
+
+    def __init__(self):
+        # active — есть ли хоть один подписчик; издатели проверяют его до
+        # создания события
+        self.active = False
+        self._subscribers = []
+
+    def subscribe(self, callback, kinds=None):
+        """Подписать callback(event); kinds — класс или кортеж классов событий."""
+        self._subscribers.append((callback, kinds))
+        self.active = True
+        return callback
+
+    def unsubscribe(self, callback):
+        self._subscribers = [(cb, kinds) for cb, kinds in self._subscribers if cb != callback]
+        self.active = bool(self._subscribers)
+
+    def publish(self, event):
+        for callback, kinds in self._subscribers:
+            if kinds is None or isinstance(event, kinds):
+                callback(event)
+
+
+def console_subscriber(event):
+    """Подписчик, печатающий события в консоль (как раньше делала игровая логика)."""
+    print(event.format())
+
+
+# Шина персонажей вне боя: без подписчиков, события не создаются.
+# Бои подменяют её своей шиной так же, как генератор случайных чисел.
+DEFAULT_BUS = EventBus()
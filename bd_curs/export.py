@@ -0,0 +1,275 @@
+"""
+Выгрузка результатов боёв в столбцовые файлы для анализа (NumPy/pandas).
+
+Бои читаются из хранилища кусками (StorageBackend.stream_battles: у MySQL —
+небуферизованный SSCursor, у SQLite — отдельное соединение только для
+чтения) и сразу дописываются в файлы, так что память не зависит от числа
+боёв. Формат npy (по умолчанию) — каталог:
+
+    manifest.json       что выгружено: период, число строк, столбцы и их типы;
+    id.npy              int64;
+    battle_id.npy       S32 (UUID боя, ASCII);
+    result.npy          int32 — коды, значения в manifest["columns"][...]["categories"];
+    boss_name.npy       int32 — коды, как result;
+    round_count.npy     int32;
+    created_at.npy      datetime64[us] (UTC).
+
+manifest.json пишется последним: есть манифест — выгрузка полная. Читать
+через load(): столбцы открываются как np.memmap и в память целиком не грузятся.
+Формат parquet (если установлен pyarrow) — один battles.parquet, группа строк
+на каждый кусок, плюс тот же manifest.json.
+
+Запуск:
+    python -m bd_curs.export exports/2026-09 --since 2026-09-01 --until 2026-10-01
+    python -m bd_curs.export exports/all --backend sqlite --path battles.sqlite3 --format parquet
+"""
+
+import argparse
+import datetime
+import json
+import os
+import struct
+
+import numpy as np
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    import db
+    from db_backend import BATTLE_COLUMNS
+except ImportError:
+    from . import db
+    from .db_backend import BATTLE_COLUMNS
+
+FORMATS = ("npy", "parquet")
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+# Тип столбца «категория»: коды int32 в .npy и список значений в манифесте
+CATEGORY = "category"
+# Типы столбцов выгрузки, в порядке BATTLE_COLUMNS
+COLUMN_TYPES = {
+    "id": "<i8",
+    "battle_id": "S32",
+    "result": CATEGORY,
+    "boss_name": CATEGORY,
+    "round_count": "<i4",
+    "created_at": "<M8[us]",
+}
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+class _NpyColumn:
+    """
+    Столбец .npy, который дописывается кусками. Длина массива в заголовке
+    заранее не известна, поэтому под неё оставлено место (20 знаков), и в
+    close() заголовок переписывается на том же месте с итоговым числом строк.
+    """
+
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self._file = open(path, "wb")
+        self._write_header()
+
+    def _write_header(self):
+        descr = np.lib.format.dtype_to_descr(self.dtype)
+        header = "{'descr': %r, 'fortran_order': False, 'shape': (%20d,), }" % (descr, self.rows)
+        # Заголовок вместе с сигнатурой и '\n' выравнивается на 64 байта (как у np.save)
+        header += " " * (-(len(_NPY_MAGIC) + 2 + len(header) + 1) % 64) + "\n"
+        self._file.write(_NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1"))
+
+    def append(self, values):
+        np.asarray(values, dtype=self.dtype).tofile(self._file)
+        self.rows += len(values)
+
+    def describe(self):
+        return {"file": os.path.basename(self.path), "dtype": self.dtype.str}
+
+    def close(self):
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+
+
+class _CategoryColumn(_NpyColumn):
+    """Столбец с малым числом разных строк: коды int32, словарь значений — в манифесте."""
+
+    def __init__(self, path):
+        super().__init__(path, "<i4")
+        self.categories = {}  # значение -> код, в порядке появления
+
+    def append(self, values):
+        codes = self.categories
+        # Новые значения получают коды в порядке появления, остальное — поиск в словаре без Python-цикла
+        for value in dict.fromkeys(values):
+            if value not in codes:
+                codes[value] = len(codes)
+        super().append(np.fromiter(map(codes.__getitem__, values), dtype=self.dtype, count=len(values)))
+
+    def describe(self):
+        description = super().describe()
+        description["categories"] = list(self.categories)
+        return description
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _export_npy(chunks, directory):
+    columns = [
+        _CategoryColumn(os.path.join(directory, f"{name}.npy")) if COLUMN_TYPES[name] == CATEGORY
+        else _NpyColumn(os.path.join(directory, f"{name}.npy"), COLUMN_TYPES[name])
+        for name in BATTLE_COLUMNS
+    ]
+    try:
+        for rows in chunks:
+            for column, values in zip(columns, zip(*rows)):
+                column.append(values)
+    finally:
+        for column in columns:
+            column.close()
+    return columns[0].rows, {name: column.describe() for name, column in zip(BATTLE_COLUMNS, columns)}
+
+
+def _export_parquet(chunks, directory):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для формата parquet нужен pyarrow: pip install pyarrow") from None
+    category = pa.dictionary(pa.int32(), pa.string())
+    types = {"id": pa.int64(), "battle_id": pa.string(), "result": category, "boss_name": category,
+             "round_count": pa.int32(), "created_at": pa.timestamp("us")}
+    schema = pa.schema([(name, types[name]) for name in BATTLE_COLUMNS])
+    path = os.path.join(directory, "battles.parquet")
+    rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        # Каждый кусок — отдельная группа строк файла
+        for chunk in chunks:
+            arrays = []
+            for name, values in zip(BATTLE_COLUMNS, zip(*chunk)):
+                if types[name] == category:
+                    arrays.append(pa.array(values, pa.string()).dictionary_encode())
+                elif name == "created_at":
+                    arrays.append(pa.array(np.asarray(values, dtype=COLUMN_TYPES[name])))
+                else:
+                    arrays.append(pa.array(values, types[name]))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    return rows, {name: {"file": os.path.basename(path), "type": str(types[name])} for name in BATTLE_COLUMNS}
+
+
+def export_battles(backend, directory, since=None, until=None, chunk_size=20000, fmt="npy"):
+    """
+    Выгрузить бои с since <= created_at < until (datetime, UTC; None — без
+    границы) из хранилища backend в каталог directory. Возвращает манифест.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат {fmt!r}: ожидается одно из {', '.join(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, MANIFEST)
+    # Старый манифест убираем сразу: недописанная выгрузка не должна выглядеть полной
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+    expected, max_id = backend.battle_span(since, until)
+    chunks = backend.stream_battles(since, until, max_id=max_id, chunk_size=chunk_size)
+    if fmt == "npy":
+        rows, columns = _export_npy(chunks, directory)
+    else:
+        rows, columns = _export_parquet(chunks, directory)
+
+    manifest = {
+        "format": fmt,
+        "version": FORMAT_VERSION,
+        "table": "battles",
+        "backend": backend.name,
+        "exported_at": datetime.datetime.utcnow().isoformat(),
+        "since": _iso(since),
+        "until": _iso(until),
+        "max_id": max_id,
+        # Меньше expected — часть боёв удалили, пока шла выгрузка
+        "rows": rows,
+        "expected_rows": expected,
+        "columns": columns,
+    }
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+
+class ExportedBattles:
+    """
+    Выгрузка в формате npy, открытая для анализа: table["round_count"] —
+    np.memmap (только чтение), table.decoded("boss_name") — значения категории.
+    """
+
+    def __init__(self, directory, mmap_mode="r"):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != "npy":
+            raise ValueError(f"{directory}: выгрузка в формате {self.manifest.get('format')!r}, а не npy")
+        self.mmap_mode = mmap_mode
+        self._columns = {}
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    @property
+    def columns(self):
+        return list(self.manifest["columns"])
+
+    def __getitem__(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            description = self.manifest["columns"][name]
+            column = np.load(os.path.join(self.directory, description["file"]), mmap_mode=self.mmap_mode)
+            self._columns[name] = column
+        return column
+
+    def categories(self, name):
+        return self.manifest["columns"][name].get("categories")
+
+    def decoded(self, name):
+        """Столбец-категория как массив строк (object); обычный столбец — как есть."""
+        categories = self.categories(name)
+        if categories is None:
+            return self[name]
+        return np.asarray(categories, dtype=object)[self[name]]
+
+
+def load(directory, mmap_mode="r"):
+    """Открыть выгрузку npy из каталога directory (см. ExportedBattles)."""
+    return ExportedBattles(directory, mmap_mode)
+
+
+def _day(text):
+    return datetime.datetime.combine(datetime.date.fromisoformat(text), datetime.time())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Выгрузка результатов боёв в столбцовые файлы")
+    parser.add_argument("directory", help="каталог выгрузки")
+    parser.add_argument("--since", type=_day, default=None, help="с этой даты включительно (ГГГГ-ММ-ДД, UTC)")
+    parser.add_argument("--until", type=_day, default=None, help="до этой даты, не включая её")
+    parser.add_argument("--format", choices=FORMATS, default="npy", help="формат файлов")
+    parser.add_argument("--chunk-size", type=int, default=20000, help="строк в одном куске чтения")
+    parser.add_argument("--backend", choices=db.BACKENDS, default=None, help="хранилище (по умолчанию DB_BACKEND)")
+    parser.add_argument("--path", default=None, help="файл базы для --backend sqlite")
+    args = parser.parse_args(argv)
+
+    options = {"path": args.path} if args.path else {}
+    backend = db.open_backend(args.backend, **options)
+    try:
+        manifest = export_battles(backend, args.directory, args.since, args.until, args.chunk_size, args.format)
+    finally:
+        backend.close()
+    print(f"Выгружено боёв: {manifest['rows']} ({manifest['format']}) в {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+"""
+Локальный приёмник результатов боёв для многих игровых клиентов.
+
+В классе или по локальной сети десятки pygame_game пишут в одну БД: каждый
+держит свои соединения и отправляет мелкие пачки. Приёмник (asyncio, сокет
+TCP или UNIX) принимает записи от всех клиентов, склеивает их в общие пачки
+до batch_size записей (или что успело прийти за max_delay секунд) и пишет
+их в хранилище не более чем writers пачками одновременно — БД видит пару
+соединений и крупные транзакции вместо шквала подключений.
+
+Протокол — строки UTF-8, поля через табуляцию:
+
+    клиент -> приёмник   R <battle_id> <запись JSON, как results.encode_record>
+                         E <battle_id> <строки телеметрии JSON (results.EVENT_COLUMNS)>
+    приёмник -> клиент   OK <вид> <battle_id>
+                         ERR <вид> <battle_id> <ошибка>
+
+OK приходит только после фиксации транзакции, в которую попала запись;
+ERR — если запись негодна или её не удалось записать (пачку, которую
+отверг сервер БД, приёмник дописывает по одной записи, так что ERR
+получает только виноватая). Ответы могут идти не по порядку запросов.
+Клиент (IngestClient) держит запись у себя, пока не получит OK: в игре
+это ResultWriter с его повторами и spool, так что повторная отправка
+безопасна — хранилище отбрасывает дубликаты по battle_id.
+
+Запуск приёмника и клиентов:
+    python -m bd_curs.ingest --listen 0.0.0.0:7480 --backend mysql --writers 2
+    BD_CURS_INGEST=192.168.1.10:7480 python -m bd_curs.pygame_game
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    import db
+    from db_backend import DatabaseUnavailable
+    from results import EVENT_COLUMNS, SIDE_BOSS, SIDE_HERO, BattleEvents, decode_record, encode_record
+except ImportError:
+    from . import db
+    from .db_backend import DatabaseUnavailable
+    from .results import EVENT_COLUMNS, SIDE_BOSS, SIDE_HERO, BattleEvents, decode_record, encode_record
+
+DEFAULT_ADDRESS = "127.0.0.1:7480"
+KIND_RESULT = "R"
+KIND_EVENTS = "E"
+RESULTS = ("victory", "defeat")
+# Самая длинная строка протокола (телеметрия длинного боя)
+MAX_LINE = 1 << 20
+
+
+class IngestError(RuntimeError):
+    """Приёмник ответил ERR: запись не сохранена (её нужно отправить снова)."""
+
+
+def parse_address(text):
+    """«unix:/путь/к/сокету» -> путь (str), «хост:порт» -> (хост, порт)."""
+    if text.startswith("unix:"):
+        return text[len("unix:"):]
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def format_address(address):
+    return f"unix:{address}" if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+
+def _field(text):
+    return str(text).replace("\t", " ").replace("\n", " ")
+
+
+def _remove_stale_socket(path):
+    # Файл сокета от упавшего приёмника мешает bind; живой приёмник не трогаем
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    else:
+        raise OSError(f"{path}: приёмник уже запущен")
+    finally:
+        probe.close()
+
+
+def _optional(value, kind):
+    return value is None or isinstance(value, kind)
+
+
+def _check_participant(fields):
+    # Поля results.Participant: side, name, role, hp, damage, healing
+    if not isinstance(fields, list) or len(fields) != 6:
+        raise ValueError(f"негодный участник боя: {fields!r}")
+    side, name, role, hp, damage, healing = fields
+    if (side not in (SIDE_HERO, SIDE_BOSS) or not _optional(name, str) or not _optional(role, str)
+            or not _optional(hp, int) or not isinstance(damage, int) or not isinstance(healing, int)):
+        raise ValueError(f"негодный участник боя: {fields!r}")
+
+
+def _check_event(row):
+    # Столбцы results.EVENT_COLUMNS: seq, round, actor, action, target, amount, effect
+    if not isinstance(row, list) or len(row) != len(EVENT_COLUMNS):
+        raise ValueError(f"негодная строка телеметрии: {row!r}")
+    seq, round_number, actor, action, target, amount, effect = row
+    if (not isinstance(seq, int) or not isinstance(round_number, int) or not isinstance(action, str)
+            or not _optional(actor, str) or not _optional(target, str)
+            or not _optional(amount, int) or not _optional(effect, str)):
+        raise ValueError(f"негодная строка телеметрии: {row!r}")
+
+
+def _decode(kind, battle_id, data):
+    # Отбраковываем здесь: одна негодная запись провалила бы всю общую пачку
+    if kind == KIND_RESULT:
+        result, boss_name, round_count, participants, created_at = json.loads(data)
+        if result not in RESULTS or not isinstance(round_count, int) or not _optional(boss_name, str):
+            raise ValueError(f"негодная запись боя: {result!r}, {round_count!r}")
+        if not isinstance(participants, list):
+            raise ValueError(f"негодный список участников: {participants!r}")
+        for fields in participants:
+            _check_participant(fields)
+        return decode_record(battle_id, data)
+    if kind == KIND_EVENTS:
+        rows = json.loads(data)
+        if not isinstance(rows, list):
+            raise ValueError(f"негодная телеметрия: {rows!r}")
+        for row in rows:
+            _check_event(row)
+        return BattleEvents(battle_id, [tuple(row) for row in rows])
+    raise ValueError(f"неизвестный вид записи {kind!r}")
+
+
+class IngestServer:
+    """Приёмник результатов (см. описание модуля) поверх хранилища db_backend.StorageBackend."""
+
+    def __init__(self, backend, batch_size=500, max_delay=0.05, writers=2, max_pending=10000):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.writers = writers
+        self.max_pending = max_pending
+        self.address = None
+        self._server = None
+        self._executor = None
+        self._slots = None
+        self._queues = {}
+        self._collectors = []
+        self._writes = set()
+        self._handlers = set()
+        self._clients = set()
+        self._closing = False
+        self.received = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.connections = 0
+
+    async def start(self, address=DEFAULT_ADDRESS):
+        """Открыть сокет и начать приём; address — как у parse_address."""
+        address = parse_address(address) if isinstance(address, str) else address
+        self._executor = ThreadPoolExecutor(max_workers=self.writers, thread_name_prefix="ingest-writer")
+        self._slots = asyncio.Semaphore(self.writers)
+        saves = {KIND_RESULT: self.backend.save_battle_results, KIND_EVENTS: self.backend.save_battle_events}
+        for kind, save in saves.items():
+            # Очередь ограничена: когда БД не успевает, чтение из сокетов встаёт (обратное давление TCP)
+            queue = asyncio.Queue(self.max_pending)
+            self._queues[kind] = queue
+            self._collectors.append(asyncio.create_task(self._collect(queue, save)))
+        if isinstance(address, str):
+            _remove_stale_socket(address)
+            self._server = await asyncio.start_unix_server(self._handle, path=address, limit=MAX_LINE)
+            self.address = address
+        else:
+            self._server = await asyncio.start_server(self._handle, *address, limit=MAX_LINE)
+            self.address = self._server.sockets[0].getsockname()[:2]
+        return self
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        self.connections += 1
+        self._clients.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+                kind, battle_id = "-", "-"
+                try:
+                    kind, battle_id, data = line.decode("utf-8").rstrip("\n").split("\t", 2)
+                    item = _decode(kind, battle_id, data)
+                except (ValueError, TypeError, KeyError) as e:
+                    writer.write(f"ERR\t{_field(kind)}\t{_field(battle_id)}\t{_field(e)}\n".encode("utf-8"))
+                    continue
+                self.received += 1
+                future = loop.create_future()
+                future.add_done_callback(functools.partial(self._acknowledge, writer, kind, battle_id))
+                await self._queues[kind].put((item, future))
+                # Клиент не читает ответы — не копим их в памяти без предела
+                if writer.transport.get_write_buffer_size() > MAX_LINE:
+                    await writer.drain()
+        except asyncio.CancelledError:
+            # Остановка приёмника (close): чтение прекращается, ответы на принятое допишет close
+            pass
+        finally:
+            self._handlers.discard(asyncio.current_task())
+            self.connections -= 1
+            # При остановке соединение закрывает close(): ответы на принятое ещё нужно отправить
+            if not self._closing:
+                self._clients.discard(writer)
+                writer.close()
+
+    @staticmethod
+    def _acknowledge(writer, kind, battle_id, future):
+        if writer.is_closing():
+            return
+        error = future.result()
+        if error is None:
+            writer.write(f"OK\t{kind}\t{battle_id}\n".encode("utf-8"))
+        else:
+            writer.write(f"ERR\t{kind}\t{battle_id}\t{_field(error)}\n".encode("utf-8"))
+
+    async def _collect(self, queue, save):
+        # Склеивает записи всех клиентов в пачки; None в очереди — остановка
+        loop = asyncio.get_running_loop()
+        stop = False
+        while not stop:
+            item = await queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.batch_size:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = queue.get_nowait()
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            # Не больше writers пачек в БД одновременно; пока все заняты, пачка растёт дальше в очереди
+            await self._slots.acquire()
+            task = asyncio.create_task(self._write(save, batch))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+
+    async def _write(self, save, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            try:
+                await loop.run_in_executor(self._executor, save, [item for item, _ in batch])
+            except DatabaseUnavailable as e:
+                errors = [e] * len(batch)
+            except Exception as e:
+                # Пачку отверг сам сервер БД — пишем записи по одной, чтобы ERR получила только виноватая
+                errors = [e] if len(batch) == 1 else [
+                    await loop.run_in_executor(self._executor, self._save_one, save, item) for item, _ in batch
+                ]
+            else:
+                errors = [None] * len(batch)
+                self.batches += 1
+            for error, (_, future) in zip(errors, batch):
+                if error is None:
+                    self.written += 1
+                else:
+                    self.failed += 1
+                if not future.done():
+                    future.set_result(error)
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _save_one(save, item):
+        try:
+            save([item])
+        except Exception as e:
+            return e
+        return None
+
+    def stats(self):
+        return {
+            "received": self.received, "written": self.written, "failed": self.failed,
+            "batches": self.batches, "connections": self.connections,
+            "pending": sum(queue.qsize() for queue in self._queues.values()),
+        }
+
+    async def close(self):
+        """Перестать принимать, дописать принятое, ответить клиентам и закрыть соединения."""
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        for task in list(self._handlers):
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        for queue in self._queues.values():
+            await queue.put(None)
+        await asyncio.gather(*self._collectors, return_exceptions=True)
+        await asyncio.gather(*self._writes, return_exceptions=True)
+        for writer in self._clients:
+            writer.close()
+        self._clients.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+
+class IngestClient:
+    """
+    Клиент приёмника для игры: send_results/send_events отправляют пачку и
+    ждут OK на каждую запись. Ошибка (нет связи, ERR, таймаут) — исключение:
+    вызывающий (ResultWriter) повторит пачку или отложит её в spool.
+    Соединение одно и переиспользуется; обращения из разных потоков — под блокировкой.
+    """
+
+    def __init__(self, address=DEFAULT_ADDRESS, timeout=10.0):
+        self.address = parse_address(address)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock = None
+        self._file = None
+
+    def _connect(self):
+        if isinstance(self.address, str):
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.address)
+        else:
+            sock = socket.create_connection(self.address, self.timeout)
+        self._sock = sock
+        self._file = sock.makefile("rb")
+
+    def _send(self, kind, lines):
+        # lines: {battle_id: строка}; ждём ответ на каждую
+        if not lines:
+            return
+        with self._lock:
+            errors = []
+            try:
+                if self._sock is None:
+                    self._connect()
+                self._sock.sendall(b"".join(lines.values()))
+                waiting = set(lines)
+                while waiting:
+                    reply = self._file.readline()
+                    if not reply:
+                        raise ConnectionError("приёмник закрыл соединение")
+                    status, reply_kind, battle_id, *message = reply.decode("utf-8").rstrip("\n").split("\t")
+                    # Ответ на запись прошлой, прерванной пачки — пропускаем
+                    if reply_kind != kind or battle_id not in waiting:
+                        continue
+                    waiting.discard(battle_id)
+                    if status != "OK":
+                        errors.append(f"{battle_id}: {' '.join(message)}")
+            except (OSError, ValueError):
+                self.close()
+                raise
+        if errors:
+            raise IngestError(f"Приёмник не сохранил {len(errors)} из {len(lines)}: {errors[0]}")
+
+    def send_results(self, records):
+        """Отправить пачку results.BattleRecord и дождаться их записи в БД."""
+        self._send(KIND_RESULT, {
+            record.battle_id: f"{KIND_RESULT}\t{record.battle_id}\t{encode_record(record)}\n".encode("utf-8")
+            for record in records
+        })
+
+    def send_events(self, batches):
+        """Отправить телеметрию (results.BattleEvents) и дождаться её записи в БД."""
+        self._send(KIND_EVENTS, {
+            events.battle_id: f"{KIND_EVENTS}\t{events.battle_id}\t{json.dumps(events.rows, ensure_ascii=False)}\n"
+            .encode("utf-8")
+            for events in batches
+        })
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            self._file.close()
+            sock.close()
+
+
+async def serve(backend, address=DEFAULT_ADDRESS, **options):
+    """Работать приёмником до SIGINT/SIGTERM (в Windows — до Ctrl+C)."""
+    server = await IngestServer(backend, **options).start(address)
+    print(f"Приём результатов боёв на {format_address(server.address)}")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        print(f"Приёмник остановлен: {server.stats()}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Приёмник результатов боёв от игровых клиентов")
+    parser.add_argument("--listen", default=DEFAULT_ADDRESS, help="хост:порт или unix:/путь (по умолчанию %(default)s)")
+    parser.add_argument("--backend", choices=db.BACKENDS, default=None, help="хранилище (по умолчанию DB_BACKEND)")
+    parser.add_argument("--path", default=None, help="файл базы для --backend sqlite")
+    parser.add_argument("--batch-size", type=int, default=500, help="записей в одной пачке")
+    parser.add_argument("--max-delay", type=float, default=0.05, help="сколько секунд копить пачку")
+    parser.add_argument("--writers", type=int, default=2, help="пачек в БД одновременно (соединений)")
+    args = parser.parse_args(argv)
+
+    options = {"path": args.path} if args.path else {}
+    backend = db.open_backend(args.backend, **options)
+    try:
+        asyncio.run(serve(backend, args.listen, batch_size=args.batch_size, max_delay=args.max_delay,
+                          writers=args.writers))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Шкала инициативы: кто и когда ходит следующим.
+
+Timeline — очередь с приоритетом (куча) по времени следующего хода. Время
+меряется в тиках, раунд длится TICKS тиков. Два режима:
+
+    - раунды (round_based=True, по умолчанию в battle.Battle): каждый
+      участник ходит раз в раунд, внутри раунда — по убыванию ловкости,
+      при равной ловкости — в порядке добавления;
+    - active-time battle (round_based=False): участник ходит раз в
+      TICKS * base_agility / ловкость тиков, то есть быстрые ходят чаще.
+
+Ход стоит O(log n): после хода участник кладётся обратно в кучу со
+следующим временем. Погибшие и удалённые участники удаляются лениво —
+их записи помечаются и выбрасываются, когда доходят до вершины кучи.
+Изменение ловкости (эффекты скорости) — reschedule(): в режиме ATB
+оставшееся до хода время пересчитывается пропорционально скорости.
+"""
+
+import heapq
+
+TICKS = 1000         # длина раунда в тиках шкалы
+BASE_AGILITY = 15    # в режиме ATB участник с такой ловкостью ходит раз в раунд
+
+# Поля записи кучи: [время, -ловкость, порядковый номер, участник]
+_TIME, _SPEED, _ORDER, _UNIT = range(4)
+
+
+class Timeline:
+    """Очередь ходов по инициативе (см. описание модуля)."""
+
+    def __init__(self, round_based=True, base_agility=BASE_AGILITY):
+        self.round_based = round_based
+        self.base_agility = base_agility
+        self.now = 0          # время последнего взятого хода
+        self._heap = []
+        self._entries = {}    # участник -> его живая запись в куче
+        self._order = {}      # участник -> порядковый номер добавления (для равной ловкости)
+        self._next_order = 0
+        self._removed = 0     # помеченных записей в куче
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, unit):
+        return unit in self._entries
+
+    @staticmethod
+    def _agility(unit):
+        return getattr(unit, "agility", 10)
+
+    def interval(self, unit):
+        """Время между ходами участника."""
+        if self.round_based:
+            return TICKS
+        return TICKS * self.base_agility / max(1, self._agility(unit))
+
+    def _push(self, unit, time):
+        entry = [time, -self._agility(unit), self._order[unit], unit]
+        self._entries[unit] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _drop(self, entry):
+        """Пометить запись удалённой; кучу перестраиваем, когда мусора больше половины."""
+        entry[_UNIT] = None
+        self._removed += 1
+        if self._removed > len(self._heap) // 2:
+            self._heap = [entry for entry in self._heap if entry[_UNIT] is not None]
+            heapq.heapify(self._heap)
+            self._removed = 0
+
+    def add(self, unit, delay=None):
+        """
+        Поставить участника на шкалу через delay тиков от текущего времени
+        (по умолчанию — через свой интервал: призванный посреди раунда
+        в режиме раундов вступает со следующего раунда).
+        """
+        if unit in self._entries:
+            return
+        if unit not in self._order:
+            self._order[unit] = self._next_order
+            self._next_order += 1
+        self._push(unit, self.now + (self.interval(unit) if delay is None else delay))
+
+    def remove(self, unit):
+        """Снять участника со шкалы."""
+        entry = self._entries.pop(unit, None)
+        if entry is not None:
+            self._drop(entry)
+
+    def reschedule(self, unit):
+        """Ловкость участника изменилась: переставить его ход."""
+        entry = self._entries.pop(unit, None)
+        if entry is None:
+            return
+        time = entry[_TIME]
+        if not self.round_based:
+            # Доля интервала, оставшаяся до хода, сохраняется
+            old_speed = max(1, -entry[_SPEED])
+            time = self.now + max(0, time - self.now) * old_speed / max(1, self._agility(unit))
+        self._drop(entry)
+        self._push(unit, time)
+
+    def _top(self):
+        """Ближайшая живая запись (погибших и удалённых выбрасываем по дороге)."""
+        heap = self._heap
+        while heap:
+            entry = heap[0]
+            unit = entry[_UNIT]
+            if unit is None:
+                heapq.heappop(heap)
+                self._removed -= 1
+                continue
+            if not unit.is_alive:
+                heapq.heappop(heap)
+                del self._entries[unit]
+                continue
+            return entry
+        return None
+
+    def next_time(self):
+        """Время ближайшего хода или None, если ходить некому."""
+        entry = self._top()
+        return entry[_TIME] if entry is not None else None
+
+    def pop(self):
+        """Взять следующего ходящего и сразу запланировать его следующий ход; None — шкала пуста."""
+        entry = self._top()
+        if entry is None:
+            return None
+        unit = entry[_UNIT]
+        self.now = entry[_TIME]
+        new = [self.now + self.interval(unit), -self._agility(unit), entry[_ORDER], unit]
+        self._entries[unit] = new
+        heapq.heapreplace(self._heap, new)
+        return unit
+
+    def pop_until(self, end):
+        """Все ходы раньше времени end по порядку (состав ходящих фиксируется сразу)."""
+        units = []
+        while True:
+            time = self.next_time()
+            if time is None or time >= end:
+                return units
+            units.append(self.pop())
+
+    # ---------- СНИМОК ----------
+
+    def getstate(self, participants):
+        """Неизменяемое состояние: (now, ((время, индекс участника в participants), ...))."""
+        index = {unit: i for i, unit in enumerate(participants)}
+        return self.now, tuple(sorted((entry[_TIME], index[unit]) for unit, entry in self._entries.items()))
+
+    def setstate(self, state, participants):
+        """Восстановить шкалу из getstate() для того же (или склонированного) списка участников."""
+        now, entries = state
+        self.now = now
+        self._heap = []
+        self._entries = {}
+        self._removed = 0
+        # Порядок добавления — порядок в participants, как при создании боя
+        self._order = {unit: i for i, unit in enumerate(participants)}
+        self._next_order = len(participants)
+        for time, i in entries:
+            self._push(participants[i], time)
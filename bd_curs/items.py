@@ -1,83 +1,131 @@
-class Item:
-    def __init__(self, name, description):
-        self.name = name
-        self.description = description
+# Импорт определений, работающий и при запуске напрямую, и как пакет bd_curs
+try:
+    from content import ITEMS
+except ImportError:
+    from .content import ITEMS
 
-    def use(self, user):
-        pass
 
-    def __str__(self):
-        return f"{self.name}: {self.description}"
+# ---------- ДЕЙСТВИЯ ПРЕДМЕТОВ ПО ВИДУ ----------
 
+def _text(item, user, amount=None, target=""):
+    return item.definition.text.format(user=user.name, item=item.name, amount=amount, target=target)
 
-class HealthPotion(Item):
-    def __init__(self):
-        super().__init__("Зелье здоровья", "Восстанавливает 50 HP")
-        self.heal_amount = 50
 
-    def use(self, user):
-        if not user.is_alive:
-            return f"{user.name} мертв и не может использовать зелье!"
+def _use_heal(item, user):
+    if not user.is_alive:
+        return f"{user.name} мертв и не может использовать зелье!"
 
-        old_hp = user.hp
-        user.hp = min(user.max_hp, user.hp + self.heal_amount)
-        actual_heal = user.hp - old_hp
+    old_hp = user.hp
+    user.hp = min(user.max_hp, user.hp + item.definition.amount)
+    return _text(item, user, user.hp - old_hp)
 
-        return f"{user.name} использует {self.name}! Восстанавливает {actual_heal} HP!"
 
+def _use_mana(item, user):
+    if not user.is_alive:
+        return f"{user.name} мертв и не может использовать зелье!"
 
-class ManaPotion(Item):
-    def __init__(self):
-        super().__init__("Зелье маны", "Восстанавливает 30 MP")
-        self.mana_amount = 30
+    # Для простоты считаем, что у всех есть MP
+    if not hasattr(user, 'mp'):
+        return f"{user.name} не использует ману!"
 
-    def use(self, user):
-        if not user.is_alive:
-            return f"{user.name} мертв и не может использовать зелье!"
+    old_mp = user.mp
+    user.mp = min(user.max_mp, user.mp + item.definition.amount)
+    return _text(item, user, user.mp - old_mp)
 
-        # Для простоты считаем, что у всех есть MP
-        if not hasattr(user, 'mp'):
-            return f"{user.name} не использует ману!"
 
-        old_mp = user.mp
-        user.mp = min(user.max_mp, user.mp + self.mana_amount)
-        actual_mana = user.mp - old_mp
+def _use_self_effect(item, user):
+    user.add_effect(item.definition.effect())
+    return _text(item, user, item.definition.amount)
 
-        return f"{user.name} использует {self.name}! Восстанавливает {actual_mana} MP!"
 
+def _use_boss_effect(item, user):
+    if hasattr(user, 'boss') and user.boss.is_alive:
+        user.boss.add_effect(item.definition.effect())
+        return _text(item, user, item.definition.amount, user.boss.name)
+    return "Нет цели для использования!"
 
-class DamagePotion(Item):
-    def __init__(self):
-        super().__init__("Зелье ярости", "Увеличивает урон на 15 на 3 хода")
 
-    def use(self, user):
-        # Импорт эффекта с учётом возможного запуска как пакета
-        try:
-            from effects import StrengthBuffEffect
-        except ImportError:
-            from .effects import StrengthBuffEffect
-        effect = StrengthBuffEffect(duration=3, damage_bonus=15)
-        user.add_effect(effect)
-        return f"{user.name} использует {self.name}! Урон увеличен на 15!"
+# Вид предмета (content.ITEM_KINDS) -> действие
+USE_HANDLERS = {
+    "heal": _use_heal,
+    "mana": _use_mana,
+    "self_effect": _use_self_effect,
+    "boss_effect": _use_boss_effect,
+}
 
 
-class PoisonDart(Item):
-    def __init__(self):
-        super().__init__("Отравленный дротик", "Накладывает отравление на врага")
+class Item:
+    """
+    Предмет. Предметы не хранят состояния (количество лежит в Inventory),
+    поэтому один экземпляр каждого вида можно делить между всеми
+    инвентарями — см. Item.shared() и Item.get().
+
+    Параметры предмета — его определение из content.json (content.ITEMS),
+    действие — обработчик вида из USE_HANDLERS, выбранный один раз при
+    создании. Подклассы только задают KEY определения; предмету, описанному
+    лишь в данных, подкласс не нужен: Item.get(ключ).
+    """
+
+    __slots__ = ("definition", "name", "description", "_use")
+    KEY = None
+    _shared = {}
+    _classes = {}  # ключ определения -> подкласс с таким KEY
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.KEY is not None:
+            Item._classes[cls.KEY] = cls
+
+    def __init__(self, key=None):
+        definition = ITEMS[key if key is not None else self.KEY]
+        self.definition = definition
+        self.name = definition.name
+        self.description = definition.description
+        self._use = USE_HANDLERS[definition.kind]
+
+    @classmethod
+    def shared(cls):
+        """Общий экземпляр предмета этого вида (flyweight)."""
+        return Item.get(cls.KEY)
+
+    @staticmethod
+    def get(key):
+        """Общий экземпляр предмета по ключу определения."""
+        item = Item._shared.get(key)
+        if item is None:
+            item = Item._shared[key] = Item._classes.get(key, Item)(key)
+        return item
 
     def use(self, user):
-        if hasattr(user, 'boss') and user.boss.is_alive:
-            try:
-                from effects import PoisonEffect
-            except ImportError:
-                from .effects import PoisonEffect
-            effect = PoisonEffect(duration=3, damage_per_turn=8)
-            user.boss.add_effect(effect)
-            return f"{user.name} использует {self.name} на {user.boss.name}! {user.boss.name} отравлен!"
-        return "Нет цели для использования!"
+        return self._use(self, user)
+
+    def __str__(self):
+        return f"{self.name}: {self.description}"
+
+
+class HealthPotion(Item):
+    __slots__ = ()
+    KEY = "health_potion"
+
+
+class ManaPotion(Item):
+    __slots__ = ()
+    KEY = "mana_potion"
+
+
+class DamagePotion(Item):
+    __slots__ = ()
+    KEY = "damage_potion"
+
+
+class PoisonDart(Item):
+    __slots__ = ()
+    KEY = "poison_dart"
 
 
 class Inventory:
+    __slots__ = ("items",)
+
     def __init__(self):
         self.items = {}
 
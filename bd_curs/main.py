@@ -1,68 +1,89 @@
-import random
-
 # Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
 try:
-    from effects import Effect, PoisonEffect, ShieldEffect, StrengthBuffEffect
+    from effects import Effect, EffectTable, DerivedStatsMixin, PoisonEffect, StrengthBuffEffect
     from items import Inventory, HealthPotion, ManaPotion, DamagePotion
+    from rng import BattleRNG, DEFAULT_RNG
+    from events import (
+        DEFAULT_BUS, EventBus, console_subscriber, RoundStarted, TurnSkipped,
+        DamageDealt, EffectApplied, EffectExpired, ShieldAbsorbed,
+    )
 except ImportError:
-    from .effects import Effect, PoisonEffect, ShieldEffect, StrengthBuffEffect
+    from .effects import Effect, EffectTable, DerivedStatsMixin, PoisonEffect, StrengthBuffEffect
     from .items import Inventory, HealthPotion, ManaPotion, DamagePotion
+    from .rng import BattleRNG, DEFAULT_RNG
+    from .events import (
+        DEFAULT_BUS, EventBus, console_subscriber, RoundStarted, TurnSkipped,
+        DamageDealt, EffectApplied, EffectExpired, ShieldAbsorbed,
+    )
+
+
+class Character(DerivedStatsMixin):
+    # Фиксированный набор полей вместо __dict__ (см. core.Human)
+    __slots__ = (
+        "name", "hp", "max_hp", "base_damage", "_damage", "damage_mod", "role", "effects", "inventory", "rng",
+        "bus", "timeline", "team", "base_agility", "_agility", "agility_mod", "mp", "max_mp", "heroes", "boss",
+    )
+    # Поля, которые меняются в бою и попадают в снимок (snapshot.py)
+    STATE_FIELDS = ("hp", "mp", "base_damage", "base_agility", "damage_mod", "agility_mod")
 
-
-class Character:
     def __init__(self, name, hp, damage, role="Персонаж"):
         self.name = name
         self.hp = hp
         self.max_hp = hp
-        self.damage = damage
-        self.base_damage = damage
         self.role = role
-        self.effects = []
+        self.effects = EffectTable()
         self.inventory = Inventory()
+        self.rng = DEFAULT_RNG  # Battle подменяет на поток своего боя
+        self.bus = DEFAULT_BUS  # и шину событий тоже
+        self.timeline = None  # шкала инициативы боя (initiative.Timeline)
+        self.team = None  # живые своей стороны (roster.AliveSet), задаёт бой
+        self.damage_mod = 0  # сумма модификаторов эффектов (effects.DerivedStatsMixin)
+        self.agility_mod = 0
+        self.damage = damage
 
     @property
     def is_alive(self):
         return self.hp > 0
 
     def add_effect(self, effect):
-        self.effects.append(effect)
+        self.effects.add(effect)
         effect.on_apply(self)
-        print(f"{self.name} получает эффект: {effect.name}")
+        if self.bus.active:
+            self.bus.publish(EffectApplied(self, effect))
 
     def remove_effect(self, effect):
         if effect in self.effects:
             effect.on_remove(self)
             self.effects.remove(effect)
+            if self.bus.active:
+                self.bus.publish(EffectExpired(self, effect))
+            effect.release()
 
     def update_effects(self):
-        for effect in self.effects[:]:
-            effect.duration -= 1
-            if effect.duration <= 0:
-                self.remove_effect(effect)
-            else:
-                effect.on_turn(self)
+        self.effects.update(self)
 
     def calculate_damage(self):
-        damage = self.base_damage
-        for effect in self.effects:
-            if hasattr(effect, 'damage_bonus'):
-                damage += effect.damage_bonus
-        return max(1, damage)
+        """Текущий урон с учётом эффектов (то же, что damage)."""
+        return self._damage
 
     def take_damage(self, damage):
         # Проверяем щиты
         actual_damage = damage
-        for effect in self.effects:
-            if isinstance(effect, ShieldEffect):
-                actual_damage = effect.absorb_damage(actual_damage)
-                if actual_damage <= 0:
-                    break
+        for effect in self.effects.absorbers:
+            actual_damage = effect.absorb_damage(actual_damage)
+            if actual_damage <= 0:
+                break
 
+        if actual_damage < damage and self.bus.active:
+            self.bus.publish(ShieldAbsorbed(self, damage - actual_damage))
         self.hp = max(0, self.hp - actual_damage)
+        if self.hp == 0 and self.team is not None:
+            self.team.discard(self)
         return actual_damage
 
     def attack(self, target):
-        damage = random.randint(self.calculate_damage() - 5, self.calculate_damage() + 5)
+        damage = self._damage
+        damage = self.rng.randint(damage - 5, damage + 5)
         actual_damage = target.take_damage(damage)
         return actual_damage
 
@@ -81,15 +102,25 @@ class Character:
 
 
 class Battle:
-    def __init__(self, heroes, boss):
+    def __init__(self, heroes, boss, rng=None, bus=None):
         self.heroes = heroes
         self.boss = boss
         self.round = 0
+        self.rng = rng if rng is not None else BattleRNG()
+        # Консольная игра: события боя печатаются сразу
+        if bus is None:
+            bus = EventBus()
+            bus.subscribe(console_subscriber)
+        self.bus = bus
 
         for hero in heroes:
             hero.heroes = heroes
             hero.boss = boss
+            hero.rng = self.rng
+            hero.bus = bus
         boss.heroes = heroes
+        boss.rng = self.rng
+        boss.bus = bus
 
     def is_battle_over(self):
         heroes_alive = any(hero.is_alive for hero in self.heroes)
@@ -98,9 +129,7 @@ class Battle:
 
     def start_round(self):
         self.round += 1
-        print(f"\n" + "=" * 60)
-        print(f"РАУНД {self.round}")
-        print("=" * 60)
+        self.bus.publish(RoundStarted(self.round))
 
         # Обновляем эффекты в начале раунда
         for hero in self.heroes:
@@ -128,7 +157,7 @@ class Battle:
         print("2. Использовать предмет")
         print("3. Пропустить ход")
 
-        if any(isinstance(effect, PoisonEffect) for effect in hero.effects):
+        if hero.effects.has(PoisonEffect):
             print("ВНИМАНИЕ: Вы отравлены!")
 
         while True:
@@ -136,13 +165,13 @@ class Battle:
 
             if choice == "1":
                 damage = hero.attack(self.boss)
-                print(f"{hero.name} атакует {self.boss.name} и наносит {damage} урона!")
+                self.bus.publish(DamageDealt(hero, self.boss, damage))
                 break
             elif choice == "2":
                 self.use_item_menu(hero)
                 break
             elif choice == "3":
-                print(f"{hero.name} пропускает ход")
+                self.bus.publish(TurnSkipped(hero))
                 break
             else:
                 print("Неверный выбор. Попробуйте снова.")
@@ -174,20 +203,20 @@ class Battle:
         print(f"\n--- Ход {self.boss.name} ---")
 
         # Босс выбирает действие
-        action = random.choice(["attack", "skill", "item"])
+        action = self.rng.choice(["attack", "skill", "item"])
 
         if action == "attack" or not self.boss.inventory.items:
             alive_heroes = [hero for hero in self.heroes if hero.is_alive]
             if alive_heroes:
-                target = random.choice(alive_heroes)
+                target = self.rng.choice(alive_heroes)
                 damage = self.boss.attack(target)
-                print(f"{self.boss.name} атакует {target.name} и наносит {damage} урона!")
+                self.bus.publish(DamageDealt(self.boss, target, damage))
 
         elif action == "skill":
             self.boss.use_skill()
 
         elif action == "item" and self.boss.inventory.items:
-            item_name = random.choice(list(self.boss.inventory.items.keys()))
+            item_name = self.rng.choice(list(self.boss.inventory.items.keys()))
             result = self.boss.use_item(item_name)
             print(result)
 
@@ -201,7 +230,8 @@ class Battle:
 
 
 def main():
-    # Импорт героев и босса так, чтобы работало и при запуске файла напрямую, и как пакет
+    # Импорт героев и босса так, чтобы работало и при запуске файла напрямую, и как пакет.
+    # Внутри функции, а не в начале модуля: boss.py сам импортирует main (цикл)
     try:
         from characters import Warrior, Mage, Archer, Healer
         from boss import Boss
@@ -225,11 +255,11 @@ def main():
 
     # Даем начальные предметы
     for hero in heroes:
-        hero.inventory.add_item(HealthPotion(), 2)
-        hero.inventory.add_item(ManaPotion(), 1)
-        hero.inventory.add_item(DamagePotion(), 1)
+        hero.inventory.add_item(HealthPotion.shared(), 2)
+        hero.inventory.add_item(ManaPotion.shared(), 1)
+        hero.inventory.add_item(DamagePotion.shared(), 1)
 
-    boss.inventory.add_item(HealthPotion(), 3)
+    boss.inventory.add_item(HealthPotion.shared(), 3)
 
     print("Наша команда:")
     for hero in heroes:
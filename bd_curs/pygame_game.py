@@ -2,6 +2,7 @@ import sys
 import random
 import math
 import os
+import threading
 import pygame
 
 # Импорты, которые работают и при запуске файла напрямую, и при запуске как пакет bd_curs
@@ -9,14 +10,26 @@ try:
     from characters import Warrior, Mage, Archer, Healer
     from boss import Boss
     from items import HealthPotion, ManaPotion, DamagePotion
-    from effects import PoisonEffect, StrengthBuffEffect, RegenerationEffect
-    import db as db_module
+    from effects import PoisonEffect, StrengthBuffEffect, RegenerationEffect, StunEffect
+    from rng import BattleRNG, preload as preload_rng
+    from roster import AliveSet
+    from content import CLASSES
+    from events import EventBus, DamageDealt, Healed, SkillUsed, EffectApplied, Notice
+    from battle import ACTION_ATTACK, ACTION_ITEM, ACTION_SKILL, ACTION_SKIP
+    from replay import ReplayRecorder, ENGINE_PYGAME, dump as dump_replays
+    from results import BattleTally, EventRecorder, ResultSpool, ResultWriter, make_record
 except ImportError:  # пакетный импорт
     from .characters import Warrior, Mage, Archer, Healer
     from .boss import Boss
     from .items import HealthPotion, ManaPotion, DamagePotion
-    from .effects import PoisonEffect, StrengthBuffEffect, RegenerationEffect
-    from . import db as db_module
+    from .effects import PoisonEffect, StrengthBuffEffect, RegenerationEffect, StunEffect
+    from .rng import BattleRNG, preload as preload_rng
+    from .roster import AliveSet
+    from .content import CLASSES
+    from .events import EventBus, DamageDealt, Healed, SkillUsed, EffectApplied, Notice
+    from .battle import ACTION_ATTACK, ACTION_ITEM, ACTION_SKILL, ACTION_SKIP
+    from .replay import ReplayRecorder, ENGINE_PYGAME, dump as dump_replays
+    from .results import BattleTally, EventRecorder, ResultSpool, ResultWriter, make_record
 
 # Окно поменьше по высоте, чтобы кнопки не перекрывались доком
 WIDTH, HEIGHT = 1400, 600
@@ -32,6 +45,103 @@ LIGHT_GRAY = (80, 80, 80)
 YELLOW = (240, 210, 90)
 
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
+# Сюда сохраняются реплеи сыгранных боёв (для воспроизведения багов)
+REPLAYS_DIR = os.path.join(os.path.dirname(__file__), "replays")
+# Результаты, которые не удалось отправить в БД, ждут здесь следующей попытки
+RESULTS_SPOOL = os.path.join(os.path.dirname(__file__), "spool", "results.sqlite3")
+
+
+# Модуль БД (и вместе с ним pymysql и разбор .env) загружается при первом
+# сохранении результата, а не при старте игры; False — загрузка не удалась
+_db_module = None
+# Фоновый писатель результатов в БД: кадр никогда не ждёт сеть (см. results.py)
+_result_writer = None
+# Телеметрия боёв по ходам (таблица battle_events) — только если включена
+# переменной окружения BD_CURS_EVENTS=1; пишется своим писателем без spool
+RECORD_EVENTS = os.environ.get("BD_CURS_EVENTS", "").lower() in ("1", "true", "yes")
+_event_writer = None
+# Адрес общего приёмника результатов (ingest.py, «хост:порт» или «unix:/путь»):
+# если задан, игра пишет через него, а не своими соединениями с БД
+INGEST_ADDRESS = os.environ.get("BD_CURS_INGEST") or None
+_ingest_client = None
+
+
+def _load_db():
+    """Модуль db (импортируется при первом сохранении) или None, если импорт не удался."""
+    global _db_module
+    if _db_module is None:
+        try:
+            if __package__:
+                from . import db as module
+            else:
+                import db as module
+        except ImportError as e:
+            print(f"Сохранение результатов в БД недоступно: {e}")
+            module = False
+        _db_module = module
+    return _db_module or None
+
+
+def _get_ingest_client():
+    global _ingest_client
+    if _ingest_client is None:
+        if __package__:
+            from .ingest import IngestClient
+        else:
+            from ingest import IngestClient
+        _ingest_client = IngestClient(INGEST_ADDRESS)
+    return _ingest_client
+
+
+def _write_results(records):
+    """Пачка результатов боёв в БД; выполняется в потоке ResultWriter."""
+    if INGEST_ADDRESS:
+        # Возвращается после подтверждения приёмника, что пачка записана в БД
+        _get_ingest_client().send_results(records)
+    else:
+        db_module = _load_db()
+        if db_module is None:
+            # Не «успех»: записи должны остаться в spool до появления модуля БД
+            raise RuntimeError("модуль БД недоступен")
+        db_module.save_battle_results(records)
+    print(f"Результаты боёв сохранены в БД: {', '.join(record.result for record in records)}")
+
+
+def _write_events(batches):
+    """Пачка телеметрии боёв в БД; выполняется в потоке писателя телеметрии."""
+    if INGEST_ADDRESS:
+        _get_ingest_client().send_events(batches)
+        return
+    db_module = _load_db()
+    if db_module is None:
+        raise RuntimeError("модуль БД недоступен")
+    db_module.save_battle_events(batches)
+
+
+def get_result_writer():
+    """Общий писатель результатов (поток запускается при первой записи)."""
+    global _result_writer
+    if _result_writer is None:
+        _result_writer = ResultWriter(_write_results, spool=ResultSpool(RESULTS_SPOOL))
+    return _result_writer
+
+
+def get_event_writer():
+    """Общий писатель телеметрии боёв; потерянная телеметрия не откладывается, а только сообщается."""
+    global _event_writer
+    if _event_writer is None:
+        _event_writer = ResultWriter(_write_events, batch_size=20)
+    return _event_writer
+
+
+def close_result_writer(timeout=5.0):
+    """Дописать очереди результатов и телеметрии перед выходом из игры."""
+    if _result_writer is not None and not _result_writer.close(timeout):
+        print("Не все результаты боёв успели сохраниться в БД")
+    if _event_writer is not None and not _event_writer.close(timeout):
+        print("Не вся телеметрия боёв успела сохраниться в БД")
+    if _ingest_client is not None:
+        _ingest_client.close()
 
 
 def load_sprite(filename, size=None):
@@ -102,7 +212,7 @@ class PygameBattle:
     Не меняет сами классы персонажей, а только управляет ходами и отрисовкой.
     """
 
-    def __init__(self, screen, font, small_font):
+    def __init__(self, screen, font, small_font, rng=None, recorder=None, save_results=True, record_events=None):
         self.screen = screen
         self.font = font
         self.small_font = small_font
@@ -127,6 +237,10 @@ class PygameBattle:
 
         # Флаг, чтобы в БД записывался только один результат боя
         self._db_result_saved = False
+        # save_results=False — не писать в БД и не сохранять реплей (повтор реплея)
+        self.save_results = save_results
+        # Запись нажатий игрока для реплея; бой идёт на потоке с зерном записи
+        self.recorder = recorder
 
         # Краткие описания умений героев (для подсказки на экране)
         self.skill_descriptions = {
@@ -145,22 +259,48 @@ class PygameBattle:
 
         self.boss = Boss("Дракон")
 
-        # Ссылки друг на друга, чтобы работали умения и предметы
+        # Все игровые броски боя идут через один поток (визуальные эффекты — нет)
+        if rng is None:
+            rng = BattleRNG(recorder.seed) if recorder is not None else BattleRNG()
+        self.rng = rng
+        # События из логики персонажей (яд, лечение, умения) идут в лог и всплывающие числа
+        self.bus = EventBus()
+        self.bus.subscribe(self.on_battle_event, (DamageDealt, Healed, SkillUsed, EffectApplied, Notice))
+        # Урон и лечение участников для записи результата (события шины + учёт ходов сцены ниже)
+        self.tally = BattleTally()
+        self.bus.subscribe(self.tally.on_event, BattleTally.KINDS)
+        # Телеметрия по ходам (self.events = None — выключена): события шины + действия сцены через _log_event
+        if record_events is None:
+            record_events = RECORD_EVENTS
+        self.events = EventRecorder() if record_events and save_results else None
+        if self.events is not None:
+            self.bus.subscribe(self.events.on_event, EventRecorder.KINDS)
+
+        # Ссылки друг на друга, чтобы работали умения и предметы;
+        # живые герои — roster.AliveSet, как в battle.Battle
+        self._alive_heroes = AliveSet(self.heroes)
         for h in self.heroes:
-            h.heroes = self.heroes
+            h.heroes = self._alive_heroes
+            h.team = self._alive_heroes
             h.boss = self.boss
-        self.boss.heroes = self.heroes
+            h.rng = self.rng
+            h.bus = self.bus
+        self.boss.heroes = self._alive_heroes
+        self.boss.rng = self.rng
+        self.boss.bus = self.bus
 
         # Начальные предметы как в текстовой версии
         for hero in self.heroes:
-            hero.inventory.add_item(HealthPotion(), 2)
-            hero.inventory.add_item(ManaPotion(), 1)
-            hero.inventory.add_item(DamagePotion(), 1)
-        self.boss.inventory.add_item(HealthPotion(), 3)
+            hero.inventory.add_item(HealthPotion.shared(), 2)
+            hero.inventory.add_item(ManaPotion.shared(), 1)
+            hero.inventory.add_item(DamagePotion.shared(), 1)
+        self.boss.inventory.add_item(HealthPotion.shared(), 3)
 
         self.current_hero_index = 0
         self.state = "player_turn"  # player_turn, boss_turn, choose_item, battle_over
         self.round = 1
+        if self.events is not None:
+            self.events.round = self.round
         # Кто уже сходил в этом раунде (для корректного хода босса)
         self.heroes_played_this_round = set()
 
@@ -303,9 +443,29 @@ class PygameBattle:
         if len(self.log_lines) > self.max_log_lines:
             self.log_lines = self.log_lines[-self.max_log_lines:]
 
+    def on_battle_event(self, event):
+        """Подписчик шины: сообщения логики боя — в лог, урон и лечение — всплывающими числами."""
+        if isinstance(event, DamageDealt):
+            # Обычные атаки сцена показывает сама, здесь только яд и удар по площади
+            if event.kind == "attack":
+                return
+            x, y = self.get_model_pos(event.target)
+            color = (170, 230, 90) if event.kind == "poison" else (255, 80, 80)
+            self.add_float_text(x, y - 60, f"-{event.amount}", color)
+        elif isinstance(event, Healed):
+            x, y = self.get_model_pos(event.target)
+            self.add_float_text(x, y - 70, f"+{event.amount}", (140, 230, 160))
+        elif isinstance(event, EffectApplied):
+            # Про наложение эффекта достаточно строки шаблона, без «получает эффект»
+            text = event.effect.apply_text
+            if text:
+                self.add_log(text.format(target=event.target.name, effect=event.effect))
+            return
+        self.add_log(event.format())
+
     @property
     def alive_heroes(self):
-        return [h for h in self.heroes if h.is_alive]
+        return self._alive_heroes
 
     def get_current_hero(self):
         if not self.alive_heroes:
@@ -365,6 +525,7 @@ class PygameBattle:
                 self.add_log("ПОБЕДА! Босс повержен!")
                 # Сохраняем результат боя в БД (если настроено подключение)
                 self._save_battle_result_to_db("victory")
+                self._save_replay()
             # Проигрываем звук победы только один раз
             if not self.victory_sound_played and "victory" in self.sounds:
                 try:
@@ -376,14 +537,14 @@ class PygameBattle:
                     print(f"Ошибка воспроизведения звука победы: {e}")
 
         # Проверяем поражение - более надежная проверка
-        alive_count = sum(1 for h in self.heroes if h.is_alive)
-        if alive_count == 0:
+        if not self._alive_heroes:
             # Устанавливаем состояние поражения
             if self.state != "battle_over":
                 self.state = "battle_over"
                 self.add_log("ПОРАЖЕНИЕ... Босс одолел героев")
                 # Сохранение результата поражения
                 self._save_battle_result_to_db("defeat")
+                self._save_replay()
 
             # Проигрываем звук поражения - проверяем каждый раз, но проигрываем только один раз
             if not self.defeat_sound_played:
@@ -404,30 +565,47 @@ class PygameBattle:
 
     def _save_battle_result_to_db(self, result: str):
         """
-        Пытается сохранить результат боя в удалённую БД.
-        Ошибки подключения выводятся в консоль, но игру не ломают.
+        Ставит результат боя в очередь фоновой записи в удалённую БД.
+        Кадр не ждёт сеть; ошибки подключения выводятся в консоль, но игру не ломают.
         """
-        if self._db_result_saved:
+        if self._db_result_saved or not self.save_results:
             return
 
-        # Подстраховка: проверяем, что модуль БД действительно есть
-        if db_module is None:
+        # Снимок героев берётся сейчас: к моменту записи бой может продолжиться анимацией
+        record = make_record(
+            result,
+            getattr(self.boss, "name", "Босс"),
+            self.round,
+            self.heroes,
+            (self.boss,),
+            self.tally,
+        )
+        get_result_writer().submit(record)
+        # Телеметрия копилась в памяти весь бой и уходит одной пачкой
+        if self.events is not None:
+            get_event_writer().submit(self.events.finish(record.battle_id))
+        self._db_result_saved = True
+
+    def _log_event(self, actor, action, target=None, amount=None):
+        """Действие сцены мимо шины событий — в телеметрию боя (если она включена)."""
+        if self.events is not None:
+            self.events.add(actor, action, target, amount)
+
+    def _save_replay(self):
+        """Сохранить реплей закончившегося боя в REPLAYS_DIR."""
+        if self.recorder is None or not self.save_results:
             return
-
         try:
-            # На всякий случай инициализируем таблицу (CREATE TABLE IF NOT EXISTS ...)
-            db_module.init_db()
-            db_module.save_battle_result(
-                result=result,
-                boss_name=getattr(self.boss, "name", "Босс"),
-                round_count=self.round,
-                heroes=self.heroes,
-            )
-            self._db_result_saved = True
-            print(f"Результат боя сохранён в БД: {result}")
-        except Exception as e:
-            # Для учебного проекта достаточно вывести ошибку в консоль
-            print(f"Не удалось сохранить результат боя в БД: {e}")
+            os.makedirs(REPLAYS_DIR, exist_ok=True)
+            path = os.path.join(REPLAYS_DIR, f"battle_{self.recorder.seed:016x}.bdr")
+            dump_replays([self.recorder.finish(self.heroes, self.boss, self.round)], path)
+            print(f"Реплей боя сохранён: {path}")
+        except (OSError, ValueError) as e:
+            print(f"Не удалось сохранить реплей: {e}")
+
+    def _record(self, choice, item_name=None):
+        if self.recorder is not None:
+            self.recorder.record(choice, item_name)
 
     def hero_attack(self):
         hero = self.get_current_hero()
@@ -438,8 +616,10 @@ class PygameBattle:
         self.attack_animations[hero] = {"time": 0.0, "duration": 0.4}
 
         damage = hero.attack(self.boss)
+        self.tally.add_damage(hero, damage)
+        self._log_event(hero, "attack", self.boss, damage)
         # Крит, если урон значительно выше среднего
-        is_crit = damage >= 50 or random.random() < 0.15  # 15% шанс крита
+        is_crit = damage >= 50 or self.rng.random() < 0.15  # 15% шанс крита
 
         # Звук атаки
         if "attack" in self.sounds:
@@ -491,9 +671,10 @@ class PygameBattle:
 
         hero.mp -= mp_cost
         self.add_log(f"{hero.name} использует БОЕВОЙ КРИК! Вся команда получает усиление урона.")
+        self._log_event(hero, "battle_cry")
         for ally in self.heroes:
             if ally.is_alive:
-                ally.add_effect(StrengthBuffEffect(duration=3, damage_bonus=10))
+                ally.add_effect(StrengthBuffEffect.acquire(duration=3, damage_bonus=10))
                 ax, ay = self.get_model_pos(ally)
                 self.add_float_text(ax, ay - 70, "Усиление", (255, 230, 120), size_mult=0.9)
         # Лёгкий вибро‑эффект
@@ -510,11 +691,13 @@ class PygameBattle:
             return False
 
         hero.mp -= mp_cost
-        poison = PoisonEffect(duration=3, damage_per_turn=10)
+        poison = PoisonEffect.acquire(duration=3, damage_per_turn=10)
         self.boss.add_effect(poison)
 
-        damage = random.randint(25, 35)
+        damage = self.rng.randint(25, 35)
         actual_damage = self.boss.take_damage(damage)
+        self.tally.add_damage(hero, actual_damage)
+        self._log_event(hero, "poison_magic", self.boss, actual_damage)
         self.add_log(
             f"{hero.name} использует МАГИЮ ЯДА! {self.boss.name} получает {actual_damage} урона и отравляется."
         )
@@ -539,8 +722,10 @@ class PygameBattle:
             return False
 
         hero.mp -= mp_cost
-        damage = random.randint(hero.damage + 5, hero.damage + 20)
+        damage = self.rng.randint(hero.damage + 5, hero.damage + 20)
         actual_damage = self.boss.take_damage(damage)
+        self.tally.add_damage(hero, actual_damage)
+        self._log_event(hero, "stun_shot", self.boss, actual_damage)
 
         msg = f"{hero.name} выпускает МОЩНЫЙ ВЫСТРЕЛ и наносит {actual_damage} урона."
         self.add_log(msg)
@@ -563,22 +748,20 @@ class PygameBattle:
         for ally in self.heroes:
             if ally.is_alive:
                 old_hp = ally.hp
-                heal_amount = random.randint(20, 35)
+                heal_amount = self.rng.randint(20, 35)
                 ally.hp = min(ally.max_hp, ally.hp + heal_amount)
                 actual_heal = ally.hp - old_hp
                 if actual_heal > 0:
                     any_healed = True
+                    self.tally.add_healing(hero, actual_heal)
+                    self._log_event(hero, "mass_heal", ally, actual_heal)
                     ax, ay = self.get_model_pos(ally)
                     self.add_float_text(ax, ay - 70, f"+{actual_heal}", (140, 230, 160), size_mult=1.0)
                     # Краткая регенерация
-                    ally.add_effect(RegenerationEffect(duration=2, heal_per_turn=6))
+                    ally.add_effect(RegenerationEffect.acquire(duration=2, heal_per_turn=6))
 
                 # Частичное очищение негативных эффектов (яд, оглушение)
-                to_remove = []
-                for eff in getattr(ally, "effects", []):
-                    name = getattr(eff, "name", "")
-                    if name in ("Отравление", "Оглушение"):
-                        to_remove.append(eff)
+                to_remove = ally.effects.of_kind(PoisonEffect) + ally.effects.of_kind(StunEffect)
                 for eff in to_remove:
                     ally.remove_effect(eff)
                     ax, ay = self.get_model_pos(ally)
@@ -590,26 +773,25 @@ class PygameBattle:
             self.add_log(f"{hero.name} пытается исцелить союзников, но лечить пока некого.")
         return any_healed
 
+    # Код умения в content.json (ui_skill класса) -> метод
+    UI_SKILLS = {
+        "battle_cry": _skill_warrior_battle_cry,
+        "poison_magic": _skill_mage_poison_magic,
+        "stun_shot": _skill_archer_stun_shot,
+        "mass_heal": _skill_healer_mass_heal,
+    }
+
     def hero_use_skill(self):
         """Активирует особую способность текущего героя."""
         hero = self.get_current_hero()
         if hero is None or not hero.is_alive:
             return
 
-        role = getattr(hero, "role", "")
-        used = False
-
-        if role == "Воин":
-            used = self._skill_warrior_battle_cry(hero)
-        elif role == "Маг":
-            used = self._skill_mage_poison_magic(hero)
-        elif role == "Лучник":
-            used = self._skill_archer_stun_shot(hero)
-        elif role == "Лекарь":
-            used = self._skill_healer_mass_heal(hero)
-        else:
+        skill = ROLE_UI_SKILLS.get(getattr(hero, "role", ""))
+        if skill is None:
             self.add_log(f"У {hero.name} нет особых умений.")
             return
+        used = skill(self, hero)
 
         # Если умение не сработало (например, не хватило маны) — ход не тратим
         if not used:
@@ -677,26 +859,26 @@ class PygameBattle:
             actions = ["attack"]
             weights = [1.0]
 
-        action = random.choices(actions, weights=weights)[0]
+        action = self.rng.choices(actions, weights=weights)[0]
 
         if action == "attack":
-            alive = [h for h in self.heroes if h.is_alive]
-            if alive:
-                target = random.choice(alive)
-                if target is not None:
-                    damage = self.boss.attack(target)
-                    self.add_log(f"{self.boss.name} атакует {target.name} и наносит {damage} урона!")
-                    # Звук попадания по герою
-                    if "hero_hit" in self.sounds:
-                        try:
-                            self.sounds["hero_hit"].play()
-                        except:
-                            pass
-
-                    # Анимация выстрела босса по герою
-                    self.spawn_projectile(from_char=self.boss, to_char=target, color=RED)
-                    tx, ty = self.get_model_pos(target)
-                    self.add_float_text(tx, ty - 60, f"-{damage}", (255, 80, 80))
+            target = self._alive_heroes.choice(self.rng)
+            if target is not None:
+                damage = self.boss.attack(target)
+                self.tally.add_damage(self.boss, damage)
+                self._log_event(self.boss, "attack", target, damage)
+                self.add_log(f"{self.boss.name} атакует {target.name} и наносит {damage} урона!")
+                # Звук попадания по герою
+                if "hero_hit" in self.sounds:
+                    try:
+                        self.sounds["hero_hit"].play()
+                    except:
+                        pass
+
+                # Анимация выстрела босса по герою
+                self.spawn_projectile(from_char=self.boss, to_char=target, color=RED)
+                tx, ty = self.get_model_pos(target)
+                self.add_float_text(tx, ty - 60, f"-{damage}", (255, 80, 80))
         elif action == "skill":
             result = self.boss.use_skill()
             self.add_log(str(result))
@@ -710,7 +892,7 @@ class PygameBattle:
                     except:
                         pass
         elif action == "item":
-            item_name = random.choice(list(self.boss.inventory.items.keys()))
+            item_name = self.rng.choice(list(self.boss.inventory.items.keys()))
             if item_name:
                 result = self.boss.use_item(item_name)
                 self.add_log(str(result))
@@ -727,17 +909,21 @@ class PygameBattle:
                     self.current_hero_index = i
                     break
             self.round += 1
+            if self.events is not None:
+                self.events.round = self.round
 
     # ---------- КНОПКИ / СОБЫТИЯ ----------
 
     def on_attack_clicked(self):
         if self.state != "player_turn":
             return
+        self._record(ACTION_ATTACK)
         self.hero_attack()
 
     def on_skill_clicked(self):
         if self.state != "player_turn":
             return
+        self._record(ACTION_SKILL)
         self.hero_use_skill()
 
     def on_item_clicked(self):
@@ -753,6 +939,7 @@ class PygameBattle:
     def on_skip_clicked(self):
         if self.state != "player_turn":
             return
+        self._record(ACTION_SKIP)
         self.hero_skip()
 
     def build_item_buttons(self):
@@ -790,6 +977,7 @@ class PygameBattle:
     def select_item(self, item_name):
         if self.state != "choose_item":
             return
+        self._record(ACTION_ITEM, item_name)
         self.hero_use_item(item_name)
         self.build_item_buttons()
 
@@ -833,19 +1021,7 @@ class PygameBattle:
             return
         if (end_x, end_y) == (0, 0) and to_char not in self.hero_positions and to_char != self.boss:
             return
-        role = getattr(from_char, "role", "")
-        if role == "Маг":
-            p_type = "orb"
-            size = 8
-        elif role == "Лучник":
-            p_type = "arrow"
-            size = 5
-        elif role == "Лекарь":
-            p_type = "heal"
-            size = 7
-        else:
-            p_type = "bolt"
-            size = 6
+        p_type, size = ROLE_PROJECTILES.get(getattr(from_char, "role", ""), ("bolt", 6))
 
         projectile = {
             "start": (start_x, start_y),
@@ -934,7 +1110,7 @@ class PygameBattle:
             self.add_log("⚠️ БОСС ВХОДИТ ВО ВТОРУЮ ФАЗУ! ⚠️")
             self.add_log("Босс становится сильнее и агрессивнее!")
             # Усиление босса
-            self.boss.damage = int(self.boss.damage * 1.3)
+            self.boss.damage = int(self.boss.base_damage * 1.3)
             # Экранный shake при смене фазы
             self.screen_shake = {"intensity": 5.0, "time": 0.4}
 
@@ -1477,7 +1653,19 @@ class PygameBattle:
             self.screen.blit(desc_surf, (rect.x + 10, rect.y + rect.height - desc_surf.get_height() - 8))
 
 
+# Роль героя -> метод умения и вид снаряда, собираются один раз из content.CLASSES
+ROLE_UI_SKILLS = {}
+for _definition in CLASSES.values():
+    if _definition.ui_skill is not None:
+        if _definition.ui_skill not in PygameBattle.UI_SKILLS:
+            raise ValueError(f"content: classes.{_definition.name}.ui_skill: нет умения {_definition.ui_skill!r}")
+        ROLE_UI_SKILLS[_definition.role] = PygameBattle.UI_SKILLS[_definition.ui_skill]
+ROLE_PROJECTILES = {_definition.role: _definition.projectile for _definition in CLASSES.values()}
+
+
 def run_game():
+    # NumPy нужен генератору боя только к первому ходу: грузим его в фоне, пока открывается окно
+    threading.Thread(target=preload_rng, daemon=True).start()
     pygame.init()
     pygame.display.set_caption("Пати против босса")
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
@@ -1487,23 +1675,25 @@ def run_game():
     small_font = pygame.font.SysFont("verdana", 18)
 
     clock = pygame.time.Clock()
-    battle = PygameBattle(screen, font, small_font)
+    # Сразу отправить результаты, отложенные в прошлых запусках без связи с БД
+    get_result_writer().start()
+    battle = PygameBattle(screen, font, small_font, recorder=ReplayRecorder(engine=ENGINE_PYGAME))
 
     running = True
-    while running:
-        dt = clock.tick(FPS) / 1000.0
+    try:
+        while running:
+            dt = clock.tick(FPS) / 1000.0
 
-        for event in pygame.event.get():
-            battle.handle_event(event)
+            for event in pygame.event.get():
+                battle.handle_event(event)
 
-        battle.update(dt)
-        battle.draw()
-        pygame.display.flip()
+            battle.update(dt)
+            battle.draw()
+            pygame.display.flip()
+    finally:
+        # Выход через sys.exit() в handle_event тоже проходит здесь
+        close_result_writer()
 
 
 if __name__ == "__main__":
     run_game()
-
-
-
-
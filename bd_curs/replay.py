@@ -0,0 +1,348 @@
+"""
+Реплеи боёв: запись, компактный двоичный формат и безголовое воспроизведение.
+
+Вся случайность боя идёт через BattleRNG с зерном, поэтому для точного
+повтора достаточно зерна и решений игрока: цели атак, лечения и умений
+бой выбирает сам из того же потока случайных чисел. Один ход героя —
+одно varint-число (действие в младших двух битах, код предмета выше),
+т.е. обычно 1 байт на ход.
+
+Формат файла .bdr — последовательность реплеев, каждый с префиксом длины:
+    varint длина, затем
+    MAGIC, varint версия, varint движок, varint зерно, varint число раундов,
+    varint число ходов, ходы (varint каждый), 8 байт хэша конечного состояния.
+
+Запуск:
+    python -m bd_curs.replay record --battles 1000 --seed 1 --out corpus.bdr
+    python -m bd_curs.replay verify corpus.bdr --workers 4
+"""
+
+import argparse
+import hashlib
+import os
+import time
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from battle import Battle, BattleLogger, ACTION_ATTACK, ACTION_ITEM, ACTION_SKILL, ACTION_SKIP
+    from items import HealthPotion, ManaPotion, DamagePotion, PoisonDart
+    from rng import BattleRNG
+    from events import EventBus
+    from sim import make_party, POLICIES
+except ImportError:
+    from .battle import Battle, BattleLogger, ACTION_ATTACK, ACTION_ITEM, ACTION_SKILL, ACTION_SKIP
+    from .items import HealthPotion, ManaPotion, DamagePotion, PoisonDart
+    from .rng import BattleRNG
+    from .events import EventBus
+    from .sim import make_party, POLICIES
+
+MAGIC = b"BDR"
+VERSION = 2  # 2: цели выбираются из roster.AliveSet — порядок бросков изменился
+
+# Какой движок записал реплей
+ENGINE_BATTLE = 0   # battle.Battle со стандартной пати (sim.make_party)
+ENGINE_PYGAME = 1   # PygameBattle
+
+# Действие хранится индексом в ACTIONS (2 бита), предмет — индексом в ITEM_NAMES + 1
+ACTIONS = (ACTION_ATTACK, ACTION_ITEM, ACTION_SKILL, ACTION_SKIP)
+_ACTION_CODES = {action: code for code, action in enumerate(ACTIONS)}
+ITEM_NAMES = tuple(cls.shared().name for cls in (HealthPotion, ManaPotion, DamagePotion, PoisonDart))
+_ITEM_CODES = {name: code for code, name in enumerate(ITEM_NAMES, 1)}
+
+HASH_SIZE = 8
+
+
+# ---------- VARINT ----------
+
+def write_varint(out, value):
+    """Дописать в bytearray out неотрицательное целое в формате LEB128."""
+    if value < 0:
+        raise ValueError(f"varint не может быть отрицательным: {value}")
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, pos):
+    """Прочитать varint из data начиная с pos. Возвращает (значение, новая позиция)."""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Реплей обрезан: varint не закончен")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+# ---------- ХОДЫ И СОСТОЯНИЕ ----------
+
+def encode_turn(choice, item_name=None):
+    try:
+        code = _ACTION_CODES[choice]
+    except KeyError:
+        raise ValueError(f"Неизвестное действие: {choice!r}") from None
+    if item_name is not None:
+        try:
+            code |= _ITEM_CODES[item_name] << 2
+        except KeyError:
+            raise ValueError(f"Неизвестный предмет: {item_name!r}") from None
+    return code
+
+
+def decode_turn(code):
+    item = code >> 2
+    if item > len(ITEM_NAMES):
+        raise ValueError(f"Неизвестный код предмета: {item}")
+    return ACTIONS[code & 3], ITEM_NAMES[item - 1] if item else None
+
+
+def state_hash(heroes, boss, rounds):
+    """Хэш конечного состояния: HP, MP, урон и эффекты всех участников и число раундов."""
+    parts = [str(rounds)]
+    for char in (*heroes, boss):
+        parts.append(f"{char.name}:{char.hp}:{getattr(char, 'mp', -1)}:{char.damage}")
+        parts.extend(f"{effect.name}({effect.duration})" for effect in char.effects)
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=HASH_SIZE).digest()
+
+
+def new_seed():
+    """Случайное 64-битное зерно для записываемого боя."""
+    return int.from_bytes(os.urandom(8), "little")
+
+
+# ---------- РЕПЛЕЙ ----------
+
+class Replay:
+    __slots__ = ("engine", "seed", "rounds", "turns", "hash")
+
+    def __init__(self, engine, seed, rounds, turns, state_hash):
+        self.engine = engine
+        self.seed = seed
+        self.rounds = rounds
+        self.turns = turns  # список закодированных ходов (encode_turn)
+        self.hash = state_hash
+
+    def actions(self):
+        """Ходы в виде (действие, имя_предмета)."""
+        return [decode_turn(code) for code in self.turns]
+
+    def to_bytes(self):
+        out = bytearray(MAGIC)
+        for value in (VERSION, self.engine, self.seed, self.rounds, len(self.turns)):
+            write_varint(out, value)
+        for code in self.turns:
+            write_varint(out, code)
+        out += self.hash
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data, pos=0, end=None):
+        if end is None:
+            end = len(data)
+        if data[pos:pos + len(MAGIC)] != MAGIC:
+            raise ValueError("Это не реплей боя (нет сигнатуры)")
+        pos += len(MAGIC)
+        version, pos = read_varint(data, pos)
+        if version != VERSION:
+            raise ValueError(f"Неподдерживаемая версия реплея: {version}")
+        engine, pos = read_varint(data, pos)
+        seed, pos = read_varint(data, pos)
+        rounds, pos = read_varint(data, pos)
+        count, pos = read_varint(data, pos)
+        turns = []
+        for _ in range(count):
+            code, pos = read_varint(data, pos)
+            turns.append(code)
+        if end - pos != HASH_SIZE:
+            raise ValueError("Реплей повреждён: неверная длина")
+        return cls(engine, seed, rounds, turns, bytes(data[pos:end]))
+
+
+def dump(replays, path):
+    """Записать реплеи в один файл .bdr."""
+    out = bytearray()
+    for replay in replays:
+        data = replay.to_bytes()
+        write_varint(out, len(data))
+        out += data
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def load(path):
+    """Прочитать все реплеи из файла .bdr."""
+    with open(path, "rb") as f:
+        data = f.read()
+    replays = []
+    pos = 0
+    while pos < len(data):
+        size, pos = read_varint(data, pos)
+        replays.append(Replay.from_bytes(data, pos, pos + size))
+        pos += size
+    return replays
+
+
+class ReplayRecorder:
+    """
+    Записывает решения игрока в одном бою. Бой должен использовать
+    BattleRNG(recorder.seed), иначе реплей не воспроизведётся.
+    """
+
+    __slots__ = ("engine", "seed", "turns")
+
+    def __init__(self, seed=None, engine=ENGINE_BATTLE):
+        self.engine = engine
+        self.seed = new_seed() if seed is None else seed
+        self.turns = []
+
+    def record(self, choice, item_name=None):
+        self.turns.append(encode_turn(choice, item_name))
+
+    def finish(self, heroes, boss, rounds):
+        """Реплей с хэшем текущего (конечного) состояния боя."""
+        return Replay(self.engine, self.seed, rounds, list(self.turns), state_hash(heroes, boss, rounds))
+
+
+class ReplayDesyncError(ValueError):
+    """Повтор разошёлся с записью (например, ходы закончились раньше боя)."""
+
+
+class ReplayPolicy:
+    """Политика для Battle, повторяющая записанные ходы."""
+
+    def __init__(self, replay):
+        self._turns = iter(replay.turns)
+
+    def choose(self, hero, battle):
+        try:
+            return decode_turn(next(self._turns))
+        except StopIteration:
+            raise ReplayDesyncError("Реплей рассинхронизирован: ходы закончились раньше боя") from None
+
+
+# ---------- ЗАПИСЬ И ВОСПРОИЗВЕДЕНИЕ ----------
+
+def _quiet_battle(heroes, boss, policy, seed, recorder=None):
+    return Battle(heroes, boss, policy=policy, logger=BattleLogger(filename=None, echo=False),
+                  rng=BattleRNG(seed), bus=EventBus(), recorder=recorder)
+
+
+def record_battle(policy, seed=None, max_rounds=200):
+    """Сыграть бой стандартной пати с политикой policy и вернуть его реплей."""
+    recorder = ReplayRecorder(seed)
+    heroes, boss = make_party()
+    battle = _quiet_battle(heroes, boss, policy, recorder.seed, recorder)
+    battle.play(max_rounds=max_rounds)
+    return recorder.finish(heroes, boss, battle.round)
+
+
+def _run_battle(replay):
+    heroes, boss = make_party()
+    battle = _quiet_battle(heroes, boss, ReplayPolicy(replay), replay.seed)
+    battle.play(max_rounds=replay.rounds)
+    return state_hash(heroes, boss, battle.round)
+
+
+def _run_pygame(replay):
+    # Нужен pygame; окно не открывается (dummy-драйвер SDL), кадры не рисуются
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import pygame
+    try:
+        from pygame_game import PygameBattle, WIDTH, HEIGHT
+    except ImportError:
+        from .pygame_game import PygameBattle, WIDTH, HEIGHT
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    font = pygame.font.SysFont("verdana", 24)
+    game = PygameBattle(screen, font, font, rng=BattleRNG(replay.seed), save_results=False)
+    for choice, item_name in replay.actions():
+        if choice == ACTION_ATTACK:
+            game.on_attack_clicked()
+        elif choice == ACTION_SKILL:
+            game.on_skill_clicked()
+        elif choice == ACTION_ITEM:
+            game.on_item_clicked()
+            game.select_item(item_name)
+        else:
+            game.on_skip_clicked()
+    return state_hash(game.heroes, game.boss, game.round)
+
+
+def run_replay(replay):
+    """Переиграть реплей и вернуть хэш получившегося конечного состояния."""
+    if replay.engine == ENGINE_BATTLE:
+        return _run_battle(replay)
+    if replay.engine == ENGINE_PYGAME:
+        return _run_pygame(replay)
+    raise ValueError(f"Неизвестный движок реплея: {replay.engine}")
+
+
+def verify(replay):
+    """Совпадает ли конечное состояние при повторе с записанным."""
+    try:
+        return run_replay(replay) == replay.hash
+    except ReplayDesyncError:
+        return False
+
+
+def _verify_chunk(replays):
+    return [verify(replay) for replay in replays]
+
+
+def verify_many(replays, workers=1, chunk_size=200):
+    """Проверить серию реплеев; возвращает список флагов совпадения в том же порядке."""
+    if workers <= 1:
+        return _verify_chunk(replays)
+    # multiprocessing нужен только пакетной проверке — не грузим его вместе с игрой
+    import multiprocessing
+
+    chunks = [replays[i:i + chunk_size] for i in range(0, len(replays), chunk_size)]
+    with multiprocessing.Pool(workers) as pool:
+        return [ok for part in pool.map(_verify_chunk, chunks) for ok in part]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Запись и проверка реплеев боёв")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="сыграть бои политикой и сохранить реплеи")
+    record.add_argument("--battles", type=int, default=1000)
+    record.add_argument("--policy", choices=sorted(POLICIES), default="potion")
+    record.add_argument("--seed", type=int, default=None, help="зерно серии (бой i получает seed + i)")
+    record.add_argument("--out", required=True)
+
+    check = commands.add_parser("verify", help="переиграть реплеи и сверить хэши состояний")
+    check.add_argument("paths", nargs="+")
+    check.add_argument("--workers", type=int, default=1)
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        policy = POLICIES[args.policy]()
+        base = new_seed() if args.seed is None else args.seed
+        replays = [record_battle(policy, seed=base + i) for i in range(args.battles)]
+        dump(replays, args.out)
+        turns = sum(len(replay.turns) for replay in replays)
+        size = os.path.getsize(args.out)
+        print(f"Записано реплеев: {len(replays)}, ходов: {turns}, файл: {size} байт "
+              f"({size / max(1, turns):.2f} байт на ход)")
+    else:
+        replays = [replay for path in args.paths for replay in load(path)]
+        started = time.perf_counter()
+        results = verify_many(replays, workers=args.workers)
+        elapsed = time.perf_counter() - started
+        failed = [i for i, ok in enumerate(results) if not ok]
+        print(f"Проверено реплеев: {len(replays)} за {elapsed:.2f} с ({len(replays) / elapsed:.0f} в секунду)")
+        if failed:
+            print(f"Расхождений: {len(failed)}, номера: {failed[:20]}")
+            raise SystemExit(1)
+        print("Все реплеи совпали")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,509 @@
+"""
+Результаты боёв для записи в БД.
+
+BattleRecord — неизменяемый снимок исхода боя: результат, имя босса, число
+раундов, участники (Participant: сторона, имя, роль, итоговое HP, нанесённый
+урон и лечение) и время окончания. Снимается на игровом потоке, так что
+дальнейшие изменения персонажей на запись не влияют. Урон и лечение за бой
+считает BattleTally — подписчик шины событий боя.
+
+ResultWriter — фоновая запись: submit() кладёт запись в очередь за O(1) и
+сразу возвращается, а поток-писатель забирает накопившиеся записи пачками до
+batch_size и передаёт их в save_batch (например, db.save_battle_results).
+Неудачная пачка повторяется с удваивающейся паузой до retries раз, после
+чего откладывается в spool (или, если его нет, передаётся в on_error).
+close() дожидается, пока очередь опустеет.
+
+ResultSpool — локальная очередь неотправленных результатов в файле SQLite:
+переживает перезапуск игры. Пока в ней что-то есть, писатель раз в
+flush_interval секунд (и сразу после каждой удачной записи) отправляет её
+пачками до batch_size. У каждой записи есть battle_id (UUID боя): если пачка
+дошла до БД, но ответ потерялся, повторная отправка не создаст дубликат.
+Пачку из spool, которую хранилище отвергло (не обрыв связи — OSError), писатель
+отправляет по одной записи: записи, отвергнутые, пока соседние сохраняются,
+уходят в карантин (таблица rejected того же файла) и в on_error, а не держат
+очередь за собой. Не сохранилась ни одна — хранилище недоступно, ждём.
+
+    writer = ResultWriter(db.save_battle_results, spool=ResultSpool(path))
+    writer.submit(make_record("victory", boss.name, 12, heroes))
+    ...
+    writer.close(timeout=5.0)
+
+EventRecorder — телеметрия боя по ходам: подписчик шины копирует каждое
+событие (урон, лечение, умение, эффект, крит, пропуск хода) в строку-кортеж
+в памяти боя — без обращений к БД по ходу боя. В конце боя finish() отдаёт
+накопленное одним BattleEvents, который пишется тем же ResultWriter
+(save_batch — db.save_battle_events) пачками многострочных INSERT.
+"""
+
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from collections import namedtuple
+from queue import Empty, SimpleQueue
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from effects import EFFECT_TYPES
+    from events import (
+        CriticalHit, DamageDealt, EffectApplied, Healed, RoundStarted, ShieldAbsorbed, SkillUsed, TurnSkipped,
+    )
+except ImportError:
+    from .effects import EFFECT_TYPES
+    from .events import (
+        CriticalHit, DamageDealt, EffectApplied, Healed, RoundStarted, ShieldAbsorbed, SkillUsed, TurnSkipped,
+    )
+
+SIDE_HERO = "hero"
+SIDE_BOSS = "boss"
+
+Participant = namedtuple("Participant", ("side", "name", "role", "hp", "damage", "healing"))
+# battle_id — ключ идемпотентности: одна и та же запись сохраняется в БД один раз
+BattleRecord = namedtuple("BattleRecord", (
+    "result", "boss_name", "round_count", "participants", "created_at", "battle_id",
+))
+
+# Столбцы строки телеметрии (порядок полей кортежа в EventRecorder.rows);
+# seq — номер события в бою, вместе с battle_id — ключ строки в battle_events
+EVENT_COLUMNS = ("seq", "round", "actor", "action", "target", "amount", "effect")
+BattleEvents = namedtuple("BattleEvents", ("battle_id", "rows"))
+
+# Класс эффекта -> ключ вида из content.json ("poison", "stun", ...)
+_EFFECT_KEYS = {cls: key for key, cls in EFFECT_TYPES.items()}
+
+# Метка конца очереди для потока-писателя
+_STOP = object()
+
+
+class BattleTally:
+    """
+    Нанесённый урон и лечение каждого участника за бой. Урон и лечение,
+    прошедшие через шину (DamageDealt/Healed с источником), учитываются
+    подпиской, остальное движок добавляет сам через add_damage/add_healing:
+
+        bus.subscribe(tally.on_event, BattleTally.KINDS)
+    """
+
+    __slots__ = ("damage", "healing")
+
+    KINDS = (DamageDealt, Healed)
+
+    def __init__(self):
+        self.damage = {}   # участник -> урон
+        self.healing = {}  # участник -> лечение
+
+    def add_damage(self, unit, amount):
+        # Boss.attack вместо урона может вернуть текст умения (урон тогда придёт отдельными событиями)
+        if unit is not None and amount and isinstance(amount, int):
+            self.damage[unit] = self.damage.get(unit, 0) + amount
+
+    def add_healing(self, unit, amount):
+        if unit is not None and amount:
+            self.healing[unit] = self.healing.get(unit, 0) + amount
+
+    def on_event(self, event):
+        # Тики яда и регенерации приходят без источника и никому не засчитываются
+        if isinstance(event, DamageDealt):
+            self.add_damage(event.source, event.amount)
+        elif isinstance(event, Healed):
+            self.add_healing(event.source, event.amount)
+
+
+def _name(unit):
+    return unit.name if unit is not None else None
+
+
+class EventRecorder:
+    """
+    Телеметрия одного боя (см. описание модуля). События без источника (тики
+    яда, регенерация, наложение эффекта) записываются с actor = None.
+    Действия, которые движок выполняет мимо шины, он добавляет сам через add():
+
+        bus.subscribe(recorder.on_event, EventRecorder.KINDS)
+        ...
+        writer.submit(recorder.finish(record.battle_id))
+    """
+
+    __slots__ = ("rows", "round")
+
+    KINDS = (RoundStarted, DamageDealt, Healed, SkillUsed, EffectApplied, ShieldAbsorbed, CriticalHit, TurnSkipped)
+
+    def __init__(self):
+        self.rows = []  # кортежи по EVENT_COLUMNS
+        self.round = 0  # движки без RoundStarted выставляют раунд сами
+
+    def add(self, actor, action, target=None, amount=None, effect=None):
+        # Boss.attack вместо урона может вернуть текст умения — такой «урон» не число
+        if not isinstance(amount, int):
+            amount = None
+        rows = self.rows
+        rows.append((len(rows), self.round, _name(actor), action, _name(target), amount, effect))
+
+    def on_event(self, event):
+        handler = _EVENT_HANDLERS.get(type(event))
+        if handler is not None:
+            handler(self, event)
+
+    def finish(self, battle_id):
+        """Накопленные события боя battle_id; буфер очищается для следующего боя."""
+        events = BattleEvents(battle_id, tuple(self.rows))
+        self.rows = []
+        self.round = 0
+        return events
+
+
+def _on_round(recorder, event):
+    recorder.round = event.round
+
+
+def _on_damage(recorder, event):
+    recorder.add(event.source, event.kind, event.target, event.amount)
+
+
+def _on_skill(recorder, event):
+    recorder.add(event.actor, event.skill, event.target, event.amount)
+
+
+def _on_effect(recorder, event):
+    effect = event.effect
+    recorder.add(None, "effect", event.target, None, _EFFECT_KEYS.get(type(effect), effect.name))
+
+
+def _on_shield(recorder, event):
+    recorder.add(None, "shield", event.target, event.amount)
+
+
+def _on_crit(recorder, event):
+    recorder.add(event.actor, "crit", None, event.amount)
+
+
+def _on_skip(recorder, event):
+    recorder.add(event.actor, event.reason)
+
+
+# Поиск обработчика по точному типу события — один словарь на событие
+_EVENT_HANDLERS = {
+    RoundStarted: _on_round,
+    DamageDealt: _on_damage,
+    Healed: _on_damage,
+    SkillUsed: _on_skill,
+    EffectApplied: _on_effect,
+    ShieldAbsorbed: _on_shield,
+    CriticalHit: _on_crit,
+    TurnSkipped: _on_skip,
+}
+
+
+def _participant(side, unit, tally):
+    damage = tally.damage.get(unit, 0) if tally is not None else 0
+    healing = tally.healing.get(unit, 0) if tally is not None else 0
+    return Participant(side, getattr(unit, "name", None), getattr(unit, "role", None),
+                       getattr(unit, "hp", None), damage, healing)
+
+
+def make_record(result, boss_name, round_count, heroes, bosses=(), tally=None):
+    """
+    BattleRecord из живых объектов героев и боссов (ожидаются атрибуты
+    .name, .role и .hp); урон и лечение берутся из tally (BattleTally).
+    """
+    participants = [_participant(SIDE_HERO, hero, tally) for hero in heroes]
+    participants += [_participant(SIDE_BOSS, boss, tally) for boss in bosses]
+    # Целые секунды: столько хранит TIMESTAMP в MySQL, а дробную часть он бы округлил
+    return BattleRecord(
+        result, boss_name, int(round_count), tuple(participants),
+        datetime.datetime.utcnow().replace(microsecond=0),
+        uuid.uuid4().hex,
+    )
+
+
+def _report(batch, error):
+    print(f"Не удалось сохранить результаты боёв ({len(batch)} шт.): {error}")
+
+
+def _spooled_participant(fields):
+    # Ранние записи spool хранили только пары (имя, HP) героев
+    if len(fields) == 2:
+        return Participant(SIDE_HERO, fields[0], None, fields[1], 0, 0)
+    return Participant(*fields)
+
+
+def encode_record(record):
+    """BattleRecord без battle_id — строкой JSON (так записи хранят spool и архивы retention)."""
+    return json.dumps([
+        record.result, record.boss_name, record.round_count, record.participants, record.created_at.isoformat(),
+    ], ensure_ascii=False)
+
+
+def decode_record(battle_id, data):
+    """Обратно к encode_record: BattleRecord с заданным battle_id."""
+    result, boss_name, round_count, participants, created_at = json.loads(data)
+    return BattleRecord(
+        result, boss_name, round_count, tuple(_spooled_participant(fields) for fields in participants),
+        datetime.datetime.fromisoformat(created_at), battle_id,
+    )
+
+
+class ResultSpool:
+    """Неотправленные результаты в файле SQLite, в порядке добавления (см. описание модуля)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Файлом пользуются и игровой поток (len), и поток-писатель — доступ под _lock
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("CREATE TABLE IF NOT EXISTS spool (battle_id TEXT PRIMARY KEY, record TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS rejected "
+                         "(battle_id TEXT PRIMARY KEY, record TEXT NOT NULL, error TEXT NOT NULL)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def append(self, records):
+        """Отложить записи; уже отложенные (тот же battle_id) не дублируются."""
+        rows = [(record.battle_id, encode_record(record)) for record in records]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO spool (battle_id, record) VALUES (?, ?)", rows)
+
+    def peek(self, limit):
+        """До limit самых старых записей (из файла они не удаляются — см. remove)."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT battle_id, record FROM spool ORDER BY rowid LIMIT ?", (limit,)).fetchall()
+        return [decode_record(battle_id, data) for battle_id, data in rows]
+
+    def remove(self, battle_ids):
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("DELETE FROM spool WHERE battle_id = ?", [(battle_id,) for battle_id in battle_ids])
+
+    def quarantine(self, rejected):
+        """Перенести записи [(запись, ошибка)], которые хранилище отвергло, из очереди в rejected."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO rejected (battle_id, record, error) VALUES (?, ?, ?)", [
+                    (record.battle_id, encode_record(record), str(error)) for record, error in rejected
+                ])
+                conn.executemany("DELETE FROM spool WHERE battle_id = ?",
+                                 [(record.battle_id,) for record, _ in rejected])
+
+    def rejected(self):
+        """Записи в карантине: [(запись, текст ошибки)] в порядке добавления."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT battle_id, record, error FROM rejected ORDER BY rowid").fetchall()
+        return [(decode_record(battle_id, data), error) for battle_id, data, error in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ResultWriter:
+    """Очередь записи результатов с потоком-писателем (см. описание модуля)."""
+
+    def __init__(self, save_batch, batch_size=50, retries=3, retry_delay=0.5, on_error=_report, spool=None,
+                 flush_interval=30.0):
+        self._save_batch = save_batch
+        self.batch_size = batch_size
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._on_error = on_error
+        self.spool = spool
+        self.flush_interval = flush_interval
+        self._spool_pending = False  # есть ли в spool неотправленные записи
+        self._spool_error = None  # последняя сообщённая ошибка отправки spool (не повторять её)
+        self._queue = SimpleQueue()
+        self._closing = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        # Счётчики меняет только поток-писатель (кроме submitted — его меняет submit)
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.spooled = 0
+        self.quarantined = 0
+        self.batches = 0
+
+    def submit(self, record):
+        """Поставить запись в очередь; не ждёт ни БД, ни потока-писателя."""
+        if self._closing.is_set():
+            raise RuntimeError("ResultWriter уже закрыт")
+        if self._thread is None:
+            self.start()
+        self.submitted += 1
+        self._queue.put(record)
+
+    def start(self):
+        """
+        Запустить поток-писатель заранее (иначе он стартует при первом submit),
+        например чтобы сразу отправить то, что осталось в spool с прошлого запуска.
+        """
+        with self._lock:
+            if self._thread is None:
+                # daemon: зависшая БД не должна держать процесс после close(timeout)
+                self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        if self.spool is not None:
+            try:
+                self._spool_pending = len(self.spool) > 0
+            except (sqlite3.Error, OSError) as e:
+                print(f"Не удалось открыть очередь результатов {self.spool.path}: {e}")
+                self.spool = None
+        if self._spool_pending:
+            self._flush_spool()
+        stop = False
+        while not stop:
+            try:
+                # Пока в spool что-то лежит, просыпаемся раз в flush_interval и пробуем снова
+                record = self._queue.get(timeout=self.flush_interval if self._spool_pending else None)
+            except Empty:
+                self._flush_spool()
+                continue
+            if record is _STOP:
+                break
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except Empty:
+                    break
+                if record is _STOP:
+                    stop = True
+                    break
+                batch.append(record)
+            # БД ответила — заодно отправляем отложенное
+            if self._write(batch) and self._spool_pending:
+                self._flush_spool()
+
+    def _write(self, batch):
+        """Записать пачку с повторами; False — не удалось (пачка отложена или потеряна)."""
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                self._save_batch(batch)
+            except Exception as e:
+                error = e
+                # При закрытии не ждём между попытками: остаток очереди важнее
+                if attempt == self.retries or self._closing.is_set():
+                    break
+                self._closing.wait(delay)
+                delay *= 2
+            else:
+                self.written += len(batch)
+                self.batches += 1
+                return True
+        if self.spool is not None:
+            try:
+                self.spool.append(batch)
+            except (sqlite3.Error, OSError) as e:
+                error = e
+            else:
+                self.spooled += len(batch)
+                self._spool_pending = True
+                return False
+        self.dropped += len(batch)
+        self._on_error(batch, error)
+        return False
+
+    def _flush_spool(self):
+        """Отправить spool пачками (см. описание модуля); хранилище недоступно — ждать следующей попытки."""
+        while not self._closing.is_set():
+            try:
+                batch = self.spool.peek(self.batch_size)
+                if not batch:
+                    self._spool_pending = False
+                    self._spool_error = None
+                    return
+                rejected = []
+                try:
+                    # Повтор уже дошедшей пачки безопасен: БД отбрасывает дубликаты по battle_id
+                    self._save_batch(batch)
+                    saved = batch
+                except OSError:
+                    # Нет связи: по одной записи отправлять бессмысленно
+                    raise
+                except Exception as e:
+                    saved, rejected = self._save_each(batch) if len(batch) > 1 else ([], [(batch[0], e)])
+                    if not saved:
+                        raise
+                self.spool.remove([record.battle_id for record in saved])
+                if rejected:
+                    self.spool.quarantine(rejected)
+            except Exception as e:
+                self._report_spool(e)
+                return
+            self.written += len(saved)
+            self.batches += 1 if saved is batch else len(saved)
+            self.quarantined += len(rejected)
+            for record, error in rejected:
+                self._on_error([record], error)
+            self._spool_error = None
+
+    def _save_each(self, batch):
+        """Записать пачку по одной записи; вернуть (сохранённые, [(отвергнутая, ошибка)])."""
+        saved = []
+        rejected = []
+        for record in batch:
+            if self._closing.is_set():
+                break
+            try:
+                self._save_batch([record])
+            except Exception as e:
+                rejected.append((record, e))
+            else:
+                saved.append(record)
+        return saved, rejected
+
+    def _report_spool(self, error):
+        # Раз в flush_interval ошибка повторяется — сообщаем только новую
+        if str(error) != self._spool_error:
+            self._spool_error = str(error)
+            print(f"Не удалось отправить отложенные результаты ({self.spool.path}): {error}")
+
+    @property
+    def pending(self):
+        """Сколько записей ждёт в очереди."""
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "submitted": self.submitted, "written": self.written, "dropped": self.dropped,
+            "spooled": self.spooled, "quarantined": self.quarantined, "batches": self.batches,
+            "pending": self.pending,
+        }
+
+    def close(self, timeout=5.0):
+        """
+        Дописать очередь и остановить поток. Возвращает False, если за timeout
+        секунд писатель не закончил (оставшиеся записи теряются вместе с процессом).
+        """
+        self._closing.set()
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return True
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        return not thread.is_alive()
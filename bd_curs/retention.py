@@ -0,0 +1,156 @@
+"""
+Срок хранения боёв: старые месяцы уходят в архив и удаляются из БД.
+
+Бои хранятся секциями по месяцам (см. db_backend): у MySQL — секции
+PARTITION BY RANGE, у SQLite — таблицы battles_pГГГГММ. Месяц старше
+keep_months удаляется целиком — DROP PARTITION / DROP TABLE за постоянное
+время, без построчного DELETE и раздувания журнала. Перед удалением месяц
+выгружается в сжатый архив:
+
+    battles-ГГГГ-ММ.jsonl.gz    строка на бой: battle_id, табуляция и запись
+                                в том же JSON, что у results.ResultSpool.
+
+Архив пишется во временный файл и переименовывается после fsync, так что
+месяц удаляется, только когда его архив целиком на диске. restore_archive
+возвращает архив в БД через save_battle_results(update_stats=False) (бой с
+уже сохранённым battle_id пропускается). Сводные таблицы не меняются ни при
+удалении, ни при возврате: статистика за удалённые месяцы остаётся в них
+всё время, поэтому rebuild_stats, пока часть месяцев в архиве, её потеряет.
+
+Запуск (например, раз в сутки из cron):
+    python -m bd_curs.retention expire --keep-months 12 --archive archive/
+    python -m bd_curs.retention expire --keep-months 3 --no-archive --backend sqlite --path battles.sqlite3
+    python -m bd_curs.retention restore archive/battles-2025-01.jsonl.gz
+    python -m bd_curs.retention list
+"""
+
+import argparse
+import datetime
+import gzip
+import os
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    import db
+    from db_backend import add_months, month_of
+    from results import decode_record, encode_record
+except ImportError:
+    from . import db
+    from .db_backend import add_months, month_of
+    from .results import decode_record, encode_record
+
+
+def archive_path(directory, month):
+    return os.path.join(directory, f"battles-{month}.jsonl.gz")
+
+
+def expired_months(months, keep_months, today=None):
+    """
+    Месяцы из months, которые не входят в последние keep_months (считая
+    текущий месяц today, UTC). Текущий месяц не истекает никогда.
+    """
+    if keep_months < 1:
+        raise ValueError(f"keep_months должно быть не меньше 1, а не {keep_months}")
+    today = today or datetime.datetime.utcnow()
+    first_kept = add_months(month_of(today), 1 - keep_months)
+    return [month for month in sorted(months) if month < first_kept]
+
+
+def archive_partition(backend, month, directory, chunk_size=1000):
+    """Выгрузить бои месяца month в archive_path(directory, month); вернуть (путь, число боёв)."""
+    os.makedirs(directory, exist_ok=True)
+    path = archive_path(directory, month)
+    count = 0
+    with open(path + ".tmp", "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8", newline="\n") as f:
+            for records in backend.stream_partition(month, chunk_size):
+                for record in records:
+                    f.write(f"{record.battle_id}\t{encode_record(record)}\n")
+                count += len(records)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(path + ".tmp", path)
+    return path, count
+
+
+def read_archive(path):
+    """Бои из архива (results.BattleRecord) по одному."""
+    with gzip.open(path, "rt", encoding="utf-8", newline="\n") as f:
+        for line in f:
+            battle_id, data = line.rstrip("\n").split("\t", 1)
+            yield decode_record(battle_id, data)
+
+
+def restore_archive(backend, path, batch_size=1000):
+    """
+    Вернуть бои из архива в хранилище пачками; возвращает, сколько добавлено.
+    Сводные таблицы не меняются: эти бои учтены в них с момента записи.
+    """
+    added = 0
+    batch = []
+    for record in read_archive(path):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            added += backend.save_battle_results(batch, update_stats=False)
+            batch = []
+    if batch:
+        added += backend.save_battle_results(batch, update_stats=False)
+    return added
+
+
+def apply_retention(backend, keep_months, archive_dir=None, today=None, dry_run=False):
+    """
+    Удалить из хранилища месяцы старше keep_months (см. expired_months),
+    предварительно выгрузив каждый в archive_dir (None — без архива).
+    Возвращает [(месяц, путь архива или None, число боёв в архиве)].
+    """
+    expired = expired_months(backend.partitions(), keep_months, today)
+    done = []
+    for month in expired:
+        if dry_run:
+            done.append((month, None, 0))
+            continue
+        path, count = archive_partition(backend, month, archive_dir) if archive_dir else (None, 0)
+        backend.drop_partition(month)
+        done.append((month, path, count))
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Срок хранения результатов боёв: архив и удаление старых месяцев")
+    parser.add_argument("--backend", choices=db.BACKENDS, default=None, help="хранилище (по умолчанию DB_BACKEND)")
+    parser.add_argument("--path", default=None, help="файл базы для --backend sqlite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    expire = commands.add_parser("expire", help="архивировать и удалить месяцы старше --keep-months")
+    expire.add_argument("--keep-months", type=int, required=True, help="сколько последних месяцев хранить")
+    target = expire.add_mutually_exclusive_group(required=True)
+    target.add_argument("--archive", metavar="DIR", help="каталог архивов")
+    target.add_argument("--no-archive", action="store_true", help="удалять без архива")
+    expire.add_argument("--dry-run", action="store_true", help="только показать, что будет удалено")
+    restore = commands.add_parser("restore", help="вернуть бои из архивов в БД (сводная статистика не меняется)")
+    restore.add_argument("archives", nargs="+", help="файлы battles-ГГГГ-ММ.jsonl.gz")
+    commands.add_parser("list", help="месяцы, за которые хранятся бои")
+    args = parser.parse_args(argv)
+
+    options = {"path": args.path} if args.path else {}
+    backend = db.open_backend(args.backend, **options)
+    try:
+        if args.command == "list":
+            for month in backend.partitions():
+                print(month)
+        elif args.command == "restore":
+            for path in args.archives:
+                print(f"{path}: возвращено боёв {restore_archive(backend, path)} (сводка уже их учитывает)")
+        else:
+            for month, path, count in apply_retention(backend, args.keep_months, args.archive,
+                                                      dry_run=args.dry_run):
+                if args.dry_run:
+                    print(f"{month}: будет удалён")
+                else:
+                    print(f"{month}: удалён" + (f", архив {path} ({count} боёв)" if path else ""))
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
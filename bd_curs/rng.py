@@ -0,0 +1,179 @@
+"""
+Генератор случайных чисел для боя.
+
+Вместо глобального модуля random каждый бой получает свой BattleRNG:
+    - у каждого боя независимый поток, заданный зерном (или номером боя
+      внутри серии через BattleRNG.for_battle) — результат не зависит от того,
+      в каком процессе-воркере и в каком порядке играются бои;
+    - числа вытягиваются из генератора NumPy блоками (до block_size штук за раз),
+      а отдельный вызов random()/randint() — это просто чтение из списка.
+
+NumPy не обязателен: без него используется random.Random с тем же зерном
+(потоки тоже воспроизводимы, но блоки заполняются медленнее). Импорт NumPy
+(~0.1 с) откладывается до первого броска: генератор создаётся лениво, так что
+import main и меню игры не ждут NumPy; pygame_game прогревает его в фоне (preload).
+"""
+
+import copy
+import random as _random
+from bisect import bisect
+
+np = None  # модуль numpy после первого _numpy(); None — ещё не загружен или не установлен
+_np_loaded = False
+
+BLOCK_SIZE = 4096
+FIRST_BLOCK = 256
+
+
+def _numpy():
+    """Загрузить NumPy при первом обращении; None, если он не установлен."""
+    global np, _np_loaded
+    if not _np_loaded:
+        try:
+            import numpy
+        except ImportError:  # NumPy не обязателен
+            numpy = None
+        np = numpy
+        _np_loaded = True
+    return np
+
+
+def preload():
+    """Заранее загрузить NumPy (например, в фоновом потоке, пока рисуется меню)."""
+    _numpy()
+
+
+def _seed_sequence(seed, index=None):
+    """SeedSequence для зерна seed (и, если задан, номера боя index)."""
+    if isinstance(seed, np.random.SeedSequence):
+        if index is None:
+            return seed
+        return np.random.SeedSequence(seed.entropy, spawn_key=tuple(seed.spawn_key) + (index,))
+    if index is None:
+        return np.random.SeedSequence(seed)
+    return np.random.SeedSequence(seed, spawn_key=(index,))
+
+
+class BattleRNG:
+    """Буферизованный источник случайности с API, похожим на модуль random."""
+
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        self.seed = seed
+        self.block_size = block_size
+        self._generator = None  # создаётся при первом _refill/getstate (_make_generator)
+        self._buffer = []
+        self._pos = 0
+        self._size = 0
+
+    @classmethod
+    def for_battle(cls, seed, index, block_size=BLOCK_SIZE):
+        """
+        Независимый поток для боя номер index в серии с общим зерном seed.
+        Одинаков в любом процессе, поэтому бои можно раздавать воркерам как угодно.
+        """
+        if seed is None:
+            return cls(None, block_size)
+        if _numpy() is not None:
+            return cls(_seed_sequence(seed, index), block_size)
+        return cls(f"{seed}:{index}", block_size)
+
+    def _make_generator(self):
+        if _numpy() is not None:
+            self._generator = np.random.default_rng(_seed_sequence(self.seed))
+        else:
+            self._generator = _random.Random(self.seed)
+        return self._generator
+
+    def _refill(self):
+        # Короткий бой тратит пару сотен бросков: начинаем с малого блока
+        # и удваиваем его до block_size, чтобы не тянуть лишнее
+        count = min(self.block_size, max(FIRST_BLOCK, 2 * self._size))
+        generator = self._generator or self._make_generator()
+        if np is not None:
+            self._buffer = generator.random(count).tolist()
+        else:
+            draw = generator.random
+            self._buffer = [draw() for _ in range(count)]
+        self._size = len(self._buffer)
+        self._pos = 0
+
+    def getstate(self):
+        """
+        Состояние потока для snapshot/restore. Буфер не копируется: _refill
+        всегда создаёт новый список, так что старый можно безопасно делить.
+        """
+        generator = self._generator or self._make_generator()
+        if np is not None:
+            generator = generator.bit_generator.state
+        else:
+            generator = generator.getstate()
+        return generator, self._buffer, self._pos, self._size
+
+    def setstate(self, state):
+        generator, self._buffer, self._pos, self._size = state
+        target = self._generator or self._make_generator()
+        if np is not None:
+            target.bit_generator.state = generator
+        else:
+            target.setstate(generator)
+
+    def clone(self):
+        """Независимая копия потока в текущей позиции (для fork)."""
+        clone = BattleRNG.__new__(BattleRNG)
+        clone.seed = self.seed
+        clone.block_size = self.block_size
+        if self._generator is None and self.seed is not None:
+            # Поток ещё не начат: копия с тем же зерном сама создаст такой же генератор
+            clone._generator = None
+        else:
+            generator = self._generator or self._make_generator()
+            if np is not None:
+                # copy.copy у numpy.Generator делит с оригиналом bit_generator, и
+                # пополнение буфера в одном бою сдвигало бы поток другого;
+                # jumped(0) — независимая копия с тем же состоянием, быстрее deepcopy
+                clone._generator = np.random.Generator(generator.bit_generator.jumped(0))
+            else:
+                clone._generator = copy.copy(generator)
+        clone._buffer = self._buffer
+        clone._pos = self._pos
+        clone._size = self._size
+        return clone
+
+    def random(self):
+        """Число из [0, 1)."""
+        pos = self._pos
+        if pos >= self._size:
+            self._refill()
+            pos = 0
+        self._pos = pos + 1
+        return self._buffer[pos]
+
+    def randint(self, a, b):
+        """Целое из [a, b] включительно, как random.randint."""
+        pos = self._pos
+        if pos >= self._size:
+            self._refill()
+            pos = 0
+        self._pos = pos + 1
+        return a + int(self._buffer[pos] * (b - a + 1))
+
+    def choice(self, seq):
+        """Случайный элемент непустой последовательности."""
+        if not seq:
+            raise IndexError("Нельзя выбрать из пустой последовательности")
+        return seq[int(self.random() * len(seq))]
+
+    def choices(self, population, weights=None, k=1):
+        """Выбор с возвращением и весами, как random.choices."""
+        if weights is None:
+            return [self.choice(population) for _ in range(k)]
+        cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return [population[bisect(cumulative, self.random() * total)] for _ in range(k)]
+
+
+# Поток по умолчанию для персонажей, созданных вне боя (тесты, меню и т.п.)
+DEFAULT_RNG = BattleRNG()
@@ -0,0 +1,95 @@
+"""
+Живые участники стороны боя (героев или боссов).
+
+AliveSet — массив плюс словарь «участник -> позиция в массиве»:
+
+    - случайная цель — O(1): один бросок rng.random(), как у BattleRNG.choice;
+    - смерть — O(1): на место погибшего переставляется последний элемент
+      (swap-remove), поэтому порядок после смертей не сохраняется;
+    - воскрешение — O(1): участник дописывается в конец;
+    - «есть ли живые» и число живых — O(1).
+
+Порядок массива определяет исход каждого броска выбора цели, поэтому
+снимок боя хранит его (snapshot.BattleSnapshot), а restore восстанавливает
+через reset() — иначе восстановленный бой разошёлся бы с исходным.
+
+О смерти набору сообщает сам персонаж: take_damage() убирает его из своего
+набора (слот team). Если HP обнулили в обход take_damage, мёртвый участник
+выбрасывается при первой встрече — при проверке «есть ли живые» и при
+выборе цели, — так что набор не ошибается, а лишь дочищается лениво.
+"""
+
+
+class AliveSet:
+    """Множество живых участников с выбором случайного за O(1) (см. описание модуля)."""
+
+    __slots__ = ("_units", "_index")
+
+    def __init__(self, units=()):
+        self._units = []
+        self._index = {}
+        for unit in units:
+            if unit.is_alive:
+                self.add(unit)
+
+    def __len__(self):
+        return len(self._units)
+
+    def __bool__(self):
+        # Последний элемент мог погибнуть без take_damage — дочищаем хвост
+        units = self._units
+        while units and not units[-1].is_alive:
+            self.discard(units[-1])
+        return bool(units)
+
+    def __contains__(self, unit):
+        return unit in self._index
+
+    def __iter__(self):
+        # Копия: во время обхода (удар по всем) участники могут погибнуть
+        return iter(self._units[:])
+
+    def add(self, unit):
+        """Добавить (воскресить) участника; повторное добавление ничего не меняет."""
+        if unit not in self._index:
+            self._index[unit] = len(self._units)
+            self._units.append(unit)
+
+    def reset(self, units):
+        """Заменить содержимое участниками units ровно в этом порядке (restore снимка)."""
+        self._units = []
+        self._index = {}
+        for unit in units:
+            self.add(unit)
+
+    def discard(self, unit):
+        """Убрать участника, если он есть."""
+        index = self._index.pop(unit, None)
+        if index is None:
+            return
+        last = self._units.pop()
+        if last is not unit:
+            self._units[index] = last
+            self._index[last] = index
+
+    def choice(self, rng, exclude=None):
+        """
+        Случайный живой участник (кроме exclude) или None, если выбрать некого.
+        Тратит один бросок rng.random() — столько же, сколько rng.choice(список).
+        """
+        units = self._units
+        while units:
+            count = len(units)
+            if exclude is not None and exclude in self._index:
+                if count == 1:
+                    return None
+                # Бросаем по count - 1 местам; выпал exclude — берём последний
+                unit = units[int(rng.random() * (count - 1))]
+                if unit is exclude:
+                    unit = units[-1]
+            else:
+                unit = units[int(rng.random() * count)]
+            if unit.is_alive:
+                return unit
+            self.discard(unit)
+        return None
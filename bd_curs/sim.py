@@ -0,0 +1,320 @@
+"""
+Безголовый пакетный симулятор боёв для балансировки.
+
+Проигрывает целые бои battle.Battle (Воин/Маг/Лучник/Лекарь против Босса)
+без input() и без вывода в консоль: ходы героев выбирает скриптовая политика.
+Бои раскладываются по пулу процессов, а результаты (исход, число раундов,
+HP выживших) пишутся напрямую в общие массивы в shared memory — воркеры
+не гоняют словари через pickle, а возвращают только число сыгранных боёв.
+
+Запуск:
+    python -m bd_curs.sim --battles 1000000 --workers 8 --policy skill
+    python -m bd_curs.sim --battles 1000000 --engine vector
+"""
+
+import argparse
+import os
+import time
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from battle import Battle, BattleLogger, ACTION_ATTACK, ACTION_ITEM, ACTION_SKILL
+    from characters import Warrior, Mage, Archer, Healer
+    from boss import Boss
+    from items import HealthPotion, ManaPotion, DamagePotion
+    from rng import BattleRNG
+    from events import EventBus
+except ImportError:
+    from .battle import Battle, BattleLogger, ACTION_ATTACK, ACTION_ITEM, ACTION_SKILL
+    from .characters import Warrior, Mage, Archer, Healer
+    from .boss import Boss
+    from .items import HealthPotion, ManaPotion, DamagePotion
+    from .rng import BattleRNG
+    from .events import EventBus
+
+HERO_CLASSES = (Warrior, Mage, Archer, Healer)
+HERO_COUNT = len(HERO_CLASSES)
+
+# Коды исхода боя в массиве outcomes
+OUTCOME_DEFEAT = 0
+OUTCOME_VICTORY = 1
+OUTCOME_TIMEOUT = 2
+
+
+# ---------- ПОЛИТИКИ ГЕРОЕВ ----------
+
+class AttackPolicy:
+    """Всегда обычная атака."""
+
+    def choose(self, hero, battle):
+        return ACTION_ATTACK, None
+
+
+class SkillPolicy:
+    """Маг и Лекарь используют умение, пока хватает маны, остальные атакуют."""
+
+    def choose(self, hero, battle):
+        if hero.role in ("Маг", "Лекарь") and getattr(hero, "mp", 0) >= 25:
+            return ACTION_SKILL, None
+        return ACTION_ATTACK, None
+
+
+class PotionPolicy:
+    """Пьёт зелье здоровья при низком HP, иначе делегирует базовой политике."""
+
+    def __init__(self, base=None, threshold=0.35):
+        self.base = base if base is not None else SkillPolicy()
+        self.threshold = threshold
+
+    def choose(self, hero, battle):
+        if hero.hp < hero.max_hp * self.threshold and hero.inventory.has_item("Зелье здоровья"):
+            return ACTION_ITEM, "Зелье здоровья"
+        return self.base.choose(hero, battle)
+
+
+POLICIES = {
+    "attack": AttackPolicy,
+    "skill": SkillPolicy,
+    "potion": PotionPolicy,
+}
+
+ENGINES = ("object", "vector")
+
+
+def make_party():
+    """Стандартная пати и босс с начальными предметами, как в battle/main."""
+    heroes = [Warrior("Волк"), Mage("Пудж"), Archer("Стив"), Healer("Целитель")]
+    for hero in heroes:
+        hero.inventory.add_item(HealthPotion.shared(), 2)
+        hero.inventory.add_item(ManaPotion.shared(), 1)
+        hero.inventory.add_item(DamagePotion.shared(), 1)
+
+    boss = Boss("Дракон")
+    boss.inventory.add_item(HealthPotion.shared(), 3)
+    return heroes, boss
+
+
+def make_raid(hero_count, boss_count):
+    """Рейд: hero_count героев (классы по кругу) против boss_count боссов, с предметами как в make_party."""
+    classes = (Warrior, Mage, Archer, Healer)
+    heroes = []
+    for i in range(hero_count):
+        hero = classes[i % len(classes)](f"Герой {i + 1}")
+        hero.inventory.add_item(HealthPotion.shared(), 2)
+        hero.inventory.add_item(ManaPotion.shared(), 1)
+        hero.inventory.add_item(DamagePotion.shared(), 1)
+        heroes.append(hero)
+
+    bosses = []
+    for i in range(boss_count):
+        boss = Boss(f"Дракон {i + 1}")
+        boss.inventory.add_item(HealthPotion.shared(), 3)
+        bosses.append(boss)
+    return heroes, bosses
+
+
+def play_battle(policy, max_rounds=200, rng=None):
+    """Сыграть один бой без вывода. Возвращает (исход, раунды, HP босса, HP героев)."""
+    heroes, boss = make_party()
+    # Шина без подписчиков: события не создаются, текст не форматируется
+    battle = Battle(heroes, boss, policy=policy, logger=BattleLogger(filename=None, echo=False), rng=rng,
+                    bus=EventBus())
+    stats = battle.play(max_rounds=max_rounds)
+
+    if stats["winner"] == "Герои":
+        outcome = OUTCOME_VICTORY
+    elif stats["winner"] == "Босс":
+        outcome = OUTCOME_DEFEAT
+    else:
+        outcome = OUTCOME_TIMEOUT
+    return outcome, stats["rounds"], boss.hp, [hero.hp for hero in heroes]
+
+
+# ---------- ОБЩАЯ ПАМЯТЬ И ВОРКЕРЫ ----------
+
+class SimulationResult:
+    """Результаты серии боёв в общих массивах (по одной ячейке на бой)."""
+
+    def __init__(self, battles):
+        # multiprocessing импортируется здесь: make_party/POLICIES нужны и игре, которой пул ни к чему
+        from multiprocessing.sharedctypes import RawArray
+
+        self.battles = battles
+        self.outcomes = RawArray("b", battles)
+        self.rounds = RawArray("i", battles)
+        self.boss_hp = RawArray("i", battles)
+        # HP героев в конце боя: battles * HERO_COUNT, построчно
+        self.hero_hp = RawArray("i", battles * HERO_COUNT)
+        self.elapsed = 0.0
+
+    def record(self, index, outcome, rounds, boss_hp, hps):
+        self.outcomes[index] = outcome
+        self.rounds[index] = rounds
+        self.boss_hp[index] = boss_hp
+        base = index * HERO_COUNT
+        self.hero_hp[base:base + HERO_COUNT] = hps
+
+    @property
+    def win_rate(self):
+        if not self.battles:
+            return 0.0
+        return sum(1 for o in self.outcomes if o == OUTCOME_VICTORY) / self.battles
+
+    @property
+    def mean_rounds(self):
+        if not self.battles:
+            return 0.0
+        return sum(self.rounds) / self.battles
+
+    @property
+    def mean_boss_hp(self):
+        if not self.battles:
+            return 0.0
+        return sum(self.boss_hp) / self.battles
+
+    @property
+    def battles_per_sec(self):
+        return self.battles / self.elapsed if self.elapsed > 0 else 0.0
+
+    def mean_survivor_hp(self):
+        """Среднее HP каждого класса в выигранных боях (погибшие считаются с 0)."""
+        totals = [0] * HERO_COUNT
+        wins = 0
+        hp = self.hero_hp
+        for i, outcome in enumerate(self.outcomes):
+            if outcome != OUTCOME_VICTORY:
+                continue
+            wins += 1
+            base = i * HERO_COUNT
+            for j in range(HERO_COUNT):
+                totals[j] += hp[base + j]
+        return [t / wins if wins else 0.0 for t in totals]
+
+
+# Состояние воркера: ссылки на общие массивы, полученные в initializer
+_worker = {}
+
+
+def _init_worker(result, engine, policy_name, max_rounds, seed):
+    _worker["result"] = result
+    _worker["engine"] = engine
+    _worker["policy_name"] = policy_name
+    _worker["policy"] = POLICIES[policy_name]()
+    _worker["max_rounds"] = max_rounds
+    _worker["seed"] = seed
+
+
+def _run_vector_chunk(start, stop):
+    """Сыграть диапазон боёв векторным движком и записать их прямо в общие массивы."""
+    import numpy as np
+    try:
+        from vector_engine import VectorBattle
+    except ImportError:
+        from .vector_engine import VectorBattle
+
+    result = _worker["result"]
+    seed = _worker["seed"]
+    engine = VectorBattle(
+        stop - start,
+        policy=_worker["policy_name"],
+        seed=None if seed is None else [seed, start],
+        max_rounds=_worker["max_rounds"],
+    )
+    outcomes = engine.run()
+    np.frombuffer(result.outcomes, dtype=np.int8)[start:stop] = outcomes
+    np.frombuffer(result.rounds, dtype=np.int32)[start:stop] = engine.rounds
+    np.frombuffer(result.boss_hp, dtype=np.int32)[start:stop] = engine.boss_hp
+    hero_hp = np.frombuffer(result.hero_hp, dtype=np.int32).reshape(-1, HERO_COUNT)
+    hero_hp[start:stop] = engine.hero_hp
+    return stop - start
+
+
+def _run_chunk(bounds):
+    start, stop = bounds
+    if _worker["engine"] == "vector":
+        return _run_vector_chunk(start, stop)
+    result = _worker["result"]
+    policy = _worker["policy"]
+    max_rounds = _worker["max_rounds"]
+    seed = _worker["seed"]
+    for index in range(start, stop):
+        # Поток боя зависит только от (seed, index), а не от воркера
+        rng = BattleRNG.for_battle(seed, index)
+        outcome, rounds, boss_hp, hps = play_battle(policy, max_rounds, rng)
+        result.record(index, outcome, rounds, boss_hp, hps)
+    return stop - start
+
+
+def run_simulation(battles, workers=1, policy="skill", max_rounds=200, seed=None, chunk_size=500,
+                   engine="object"):
+    """
+    Сыграть battles боёв на workers процессах.
+    При workers == 1 всё выполняется в текущем процессе.
+    engine: "object" — эталонный battle.Battle, "vector" — vector_engine (нужен NumPy).
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Неизвестная политика: {policy}")
+    if engine not in ENGINES:
+        raise ValueError(f"Неизвестный движок: {engine}")
+
+    result = SimulationResult(battles)
+    chunks = [(start, min(start + chunk_size, battles)) for start in range(0, battles, chunk_size)]
+
+    started = time.perf_counter()
+    if workers <= 1:
+        _init_worker(result, engine, policy, max_rounds, seed)
+        try:
+            for chunk in chunks:
+                _run_chunk(chunk)
+        finally:
+            _worker.clear()
+    else:
+        import multiprocessing
+
+        with multiprocessing.Pool(
+                workers,
+                initializer=_init_worker,
+                initargs=(result, engine, policy, max_rounds, seed),
+        ) as pool:
+            for _ in pool.imap_unordered(_run_chunk, chunks):
+                pass
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Безголовая симуляция боёв пати против босса")
+    parser.add_argument("--battles", type=int, default=10000, help="сколько боёв сыграть")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="skill", help="политика героев")
+    parser.add_argument("--engine", choices=ENGINES, default="object", help="движок боя")
+    parser.add_argument("--max-rounds", type=int, default=200, help="ограничение длины боя")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="боёв в одной задаче воркера (по умолчанию 500, для vector — 50000)")
+    args = parser.parse_args(argv)
+    if args.chunk_size is None:
+        args.chunk_size = 50000 if args.engine == "vector" else 500
+
+    result = run_simulation(
+        args.battles,
+        workers=args.workers,
+        policy=args.policy,
+        max_rounds=args.max_rounds,
+        seed=args.seed,
+        chunk_size=args.chunk_size,
+        engine=args.engine,
+    )
+
+    print(f"Боёв: {result.battles}, процессов: {args.workers}, политика: {args.policy}, движок: {args.engine}")
+    print(f"Время: {result.elapsed:.2f} с, скорость: {result.battles_per_sec:.0f} боёв/с")
+    print(f"Победы героев: {result.win_rate * 100:.2f}%")
+    print(f"Среднее число раундов: {result.mean_rounds:.2f}")
+    print(f"Среднее HP босса в конце: {result.mean_boss_hp:.1f}")
+    hp = result.mean_survivor_hp()
+    for cls, value in zip(HERO_CLASSES, hp):
+        print(f"  Среднее HP после победы ({cls.__name__}): {value:.1f}")
+
+
+if __name__ == "__main__":
+    main()
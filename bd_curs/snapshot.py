@@ -0,0 +1,165 @@
+"""
+Снимки состояния боя: snapshot / restore / fork.
+
+Снимок — неизменяемые кортежи из чисел и ссылок на неизменяемые объекты
+(классы эффектов, общие экземпляры предметов, буфер BattleRNG, который
+никогда не меняется на месте). Поэтому снять снимок — это пройти по
+изменяемым полям участников, без копирования графа объектов с обратными
+ссылками (hero.heroes, hero.boss, ...), как делает copy.deepcopy.
+
+Какие поля персонажа изменяемы, задаёт его класс в STATE_FIELDS;
+состояние эффекта — его собственные слоты (кроме служебных слотов Effect).
+"""
+
+from collections import namedtuple
+from operator import attrgetter
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from effects import Effect, EffectTable
+    from items import Inventory
+except ImportError:
+    from .effects import Effect, EffectTable
+    from .items import Inventory
+
+# round — номер раунда, rng — BattleRNG.getstate(), heroes и bosses — кортежи состояний
+# героев и боссов, timeline — Timeline.getstate() (очередь ходов), alive_heroes и
+# alive_bosses — индексы в heroes/bosses в порядке наборов живых (от него зависят
+# броски выбора цели)
+BattleSnapshot = namedtuple("BattleSnapshot", (
+    "round", "rng", "heroes", "bosses", "timeline", "alive_heroes", "alive_bosses",
+))
+
+# Незаполненный слот (например, mp у персонажа без маны)
+_UNSET = object()
+
+_effect_fields = {}
+_object_slots = {}
+_state_getters = {}
+
+
+def _slots(cls, stop=object):
+    """Все слоты класса по MRO (до класса stop, не включая его)."""
+    names = []
+    for klass in cls.__mro__:
+        if klass is stop:
+            break
+        slots = klass.__dict__.get("__slots__", ())
+        names.extend((slots,) if isinstance(slots, str) else slots)
+    return tuple(names)
+
+
+def _fields_of_effect(cls):
+    fields = _effect_fields.get(cls)
+    if fields is None:
+        fields = _effect_fields[cls] = _slots(cls, Effect)
+    return fields
+
+
+# ---------- ЭФФЕКТЫ И ИНВЕНТАРЬ ----------
+
+def effect_state(effect):
+    """(класс, оставшаяся длительность, значения собственных слотов)."""
+    return (type(effect), effect.duration, tuple(getattr(effect, name) for name in _fields_of_effect(type(effect))))
+
+
+def restore_effect(state):
+    """Новый эффект из состояния. on_apply не вызывается: его результат уже в полях персонажа."""
+    cls, duration, values = state
+    effect = cls.__new__(cls)
+    Effect.__init__(effect, duration)
+    for name, value in zip(_fields_of_effect(cls), values):
+        setattr(effect, name, value)
+    return effect
+
+
+def inventory_state(inventory):
+    return tuple((name, data["item"], data["quantity"]) for name, data in inventory.items.items())
+
+
+def restore_inventory(inventory, state):
+    inventory.items = {name: {"item": item, "quantity": quantity} for name, item, quantity in state}
+
+
+# ---------- ПЕРСОНАЖИ ----------
+
+def character_state(char):
+    """(значения STATE_FIELDS, эффекты, инвентарь или None)."""
+    getter = _state_getters.get(type(char))
+    if getter is None:
+        getter = _state_getters[type(char)] = attrgetter(*char.STATE_FIELDS)
+    try:
+        fields = getter(char)
+    except AttributeError:
+        # Какой-то слот не заполнен (персонаж без маны) — медленный путь
+        fields = tuple(getattr(char, name, _UNSET) for name in char.STATE_FIELDS)
+    effects = tuple(map(effect_state, char.effects)) if char.effects else ()
+    inventory = getattr(char, "inventory", None)
+    return fields, effects, inventory_state(inventory) if inventory is not None else None
+
+
+def restore_character(char, state):
+    """Вернуть персонажа в состояние state (на месте, ссылки на него остаются верными)."""
+    fields, effects, inventory = state
+    for name, value in zip(char.STATE_FIELDS, fields):
+        if value is not _UNSET:
+            setattr(char, name, value)
+    # Старые эффекты не снимаем через remove_effect: on_remove поменял бы модификаторы
+    if effects or char.effects:
+        table = EffectTable()
+        for effect_data in effects:
+            table.add(restore_effect(effect_data))
+        char.effects = table
+    if inventory is not None:
+        restore_inventory(char.inventory, inventory)
+    # Урон и ловкость в снимок не входят: они выводятся из базы и модификаторов
+    char.refresh_stats()
+
+
+def clone_character(char):
+    """Поверхностная копия персонажа со своими таблицей эффектов и инвентарём."""
+    cls = type(char)
+    slots = _object_slots.get(cls)
+    if slots is None:
+        slots = _object_slots[cls] = _slots(cls)
+    clone = cls.__new__(cls)
+    for name in slots:
+        value = getattr(char, name, _UNSET)
+        if value is not _UNSET:
+            setattr(clone, name, value)
+    clone.effects = EffectTable()
+    if getattr(char, "inventory", None) is not None:
+        clone.inventory = Inventory()
+    return clone
+
+
+# ---------- БОЙ ----------
+
+def _alive_order(alive, units):
+    # Набор хранит и ещё не дочищенных мёртвых: их место тоже влияет на броски
+    index = {unit: i for i, unit in enumerate(units)}
+    return tuple(index[unit] for unit in alive)
+
+
+def take_snapshot(battle):
+    return BattleSnapshot(
+        battle.round,
+        battle.rng.getstate(),
+        tuple(character_state(hero) for hero in battle.heroes),
+        tuple(character_state(boss) for boss in battle.bosses),
+        battle.timeline.getstate(battle.participants),
+        _alive_order(battle.alive_heroes, battle.heroes),
+        _alive_order(battle.alive_bosses, battle.bosses),
+    )
+
+
+def restore_snapshot(battle, snapshot):
+    battle.round = snapshot.round
+    battle.rng.setstate(snapshot.rng)
+    for hero, state in zip(battle.heroes, snapshot.heroes):
+        restore_character(hero, state)
+    for boss, state in zip(battle.bosses, snapshot.bosses):
+        restore_character(boss, state)
+    battle.timeline.setstate(snapshot.timeline, battle.participants)
+    battle.alive_heroes.reset(battle.heroes[i] for i in snapshot.alive_heroes)
+    battle.alive_bosses.reset(battle.bosses[i] for i in snapshot.alive_bosses)
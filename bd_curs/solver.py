@@ -0,0 +1,561 @@
+"""
+Расчёт исхода боя цепью Маркова: вероятность победы и распределение числа раундов.
+
+Вместо Монте-Карло солвер переносит вперёд распределение вероятностей по
+состояниям боя: HP и MP участников, число зелий, расписания яда и щитов
+босса, оглушения, кто ещё ходит в этом раунде. Каждый ход (и каждый герой
+под Сокрушающим ударом) — отдельный шаг: распределение раскладывается по
+исходам бросков, одинаковые состояния складываются. Результат
+детерминирован — без шума выборки.
+
+Правила те же, что у vector_engine.VectorBattle (и эталонного battle.Battle
+с политиками из sim.py): порядок ходов по ловкости, состав ходящих фиксируется
+в начале раунда, яды и щиты тикают в начале раунда.
+
+Полное совместное состояние растёт примерно на порядок за раунд (четыре HP
+героев на ресурсы босса), поэтому, чтобы считать за секунды:
+    - точные склейки: общий для героев график яда (Ядовитое дыхание бьёт всех
+      живых одинаково), маски хода и оглушения только для ещё не ходивших,
+      MP ниже цены любого действия и ресурсы мёртвых героев обнуляются;
+    - кэш распределений переходов (урон из равномерного диапазона по HP,
+      удар по боссу через щиты) — они одинаковы для множества состояний;
+    - агрегация HP и щитов по сетке с несмещённым округлением (масса
+      делится между соседними узлами пропорционально); при шаге 1 точно;
+    - прореживание до max_states состояний после каждого шага без потери
+      массы (см. MarkovSolver._thin); max_states=0 отключает его;
+    - отбрасывание состояний легче epsilon (масса возвращается в pruned).
+
+Погрешность настроек по умолчанию — порядка процента в среднем числе раундов
+и вероятности победы (тест сверяет с VectorBattle); вероятности меньше
+~1 / max_states разрешаются грубо.
+
+Запуск:
+    python -m bd_curs.solver --policy attack
+    python -m bd_curs.solver --policy potion --boss-hp 900 --max-states 5000
+"""
+
+import argparse
+import time
+from functools import lru_cache, partial
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from characters import Warrior, Mage, Archer, Healer
+    from boss import Boss
+except ImportError:
+    from .characters import Warrior, Mage, Archer, Healer
+    from .boss import Boss
+
+ROSTER = (Warrior, Mage, Archer, Healer)
+POLICIES = ("attack", "skill", "potion")
+BOSS = -1
+
+# Поля состояния (кортеж): HP/MP/зелья босса, яд на боссе по раундам, щиты
+# босса по срокам истечения, HP героев, общий график яда героев, MP героев,
+# зелья героев, маска ходящих в раунде, маска оглушённых, незаконченный
+# Сокрушающий удар (номер следующего героя + 1; 0 — нет)
+B_HP, B_MP, B_POTIONS, B_DOT, B_SHIELD, H_HP, H_DOT, H_MP, H_POTIONS, ACTING, STUNNED, STOMP = range(12)
+
+HORIZON = 3  # раундов вперёд в графиках яда и щитов
+BOSS_MIN_COST = 30  # Стена щитов — самое дешёвое умение босса
+
+# Сетка агрегации по умолчанию: HP героев, HP босса, остаток щита.
+# Шаг 1 — без агрегации, но число состояний растёт на порядки
+HP_STEP = 5
+BOSS_HP_STEP = 10
+SHIELD_STEP = 20
+# Сколько состояний оставлять после каждого шага (прореживание)
+MAX_STATES = 2000
+# На сколько полос по HP босса делятся слои прореживания
+STRATA = 20
+
+
+def _template():
+    heroes = [cls("") for cls in ROSTER]
+    return heroes, Boss("")
+
+
+def _replace(seq, index, value):
+    return seq[:index] + (value,) + seq[index + 1:]
+
+
+@lru_cache(maxsize=None)
+def _uniform(low, high):
+    """Равномерное распределение randint(low, high): кортеж (значение, вероятность)."""
+    p = 1.0 / (high - low + 1)
+    return tuple((value, p) for value in range(low, high + 1))
+
+
+@lru_cache(maxsize=None)
+def _snap(value, step, top):
+    """
+    Несмещённая агрегация HP по сетке step (узлы step, 2*step, ... и top —
+    максимум HP): HP делится между соседними узлами пропорционально
+    расстоянию. HP меньше step не агрегируется: иначе последний удар
+    округлялся бы вверх и персонаж не умирал бы.
+    """
+    if value <= 0:
+        return ((0, 1.0),)
+    if step == 1 or value >= top or value % step == 0 or value < step:
+        return ((min(value, top), 1.0),)
+    low = value - value % step
+    high = min(low + step, top)
+    high_share = (value - low) / (high - low)
+    return ((low, 1.0 - high_share), (high, high_share))
+
+
+@lru_cache(maxsize=None)
+def _damage_hp(hp, top, low, high, step):
+    """Распределение HP после урона randint(low, high) (с агрегацией)."""
+    out = {}
+    for damage, p in _uniform(low, high):
+        for value, q in _snap(max(0, hp - damage), step, top):
+            out[value] = out.get(value, 0.0) + p * q
+    return tuple(out.items())
+
+
+@lru_cache(maxsize=None)
+def _heal_hp(hp, max_hp, low, high, step):
+    out = {}
+    for amount, p in _uniform(low, high):
+        for value, q in _snap(min(max_hp, hp + amount), step, max_hp):
+            out[value] = out.get(value, 0.0) + p * q
+    return tuple(out.items())
+
+
+@lru_cache(maxsize=None)
+def _hit_boss(hp, top, shield, damage, step, shield_step):
+    """
+    Урон боссу через щиты (старые расходуются первыми): [(HP, щиты, вероятность)].
+    Частично пробитый щит (он всегда один) агрегируется по сетке shield_step.
+    """
+    remaining = list(shield)
+    partial = None
+    for k, amount in enumerate(shield):
+        absorbed = min(amount, damage)
+        damage -= absorbed
+        remaining[k] = amount - absorbed
+        if 0 < absorbed < amount:
+            partial = k
+    remaining = tuple(remaining)
+    shields = ((remaining, 1.0),)
+    if partial is not None and remaining[partial] % shield_step:
+        # В отличие от HP, остаток щита может агрегироваться и в 0
+        value = remaining[partial]
+        low = value - value % shield_step
+        high = min(low + shield_step, shield[partial])
+        high_share = (value - low) / (high - low)
+        shields = ((_replace(remaining, partial, low), 1.0 - high_share),
+                   (_replace(remaining, partial, high), high_share))
+    return tuple((value, rest, q * r)
+                 for value, q in _snap(max(0, hp - damage), step, top)
+                 for rest, r in shields)
+
+
+@lru_cache(maxsize=None)
+def _hit_boss_range(hp, top, shield, low, high, step, shield_step):
+    out = {}
+    for damage, p in _uniform(low, high):
+        for value, shields, q in _hit_boss(hp, top, shield, damage, step, shield_step):
+            key = (value, shields)
+            out[key] = out.get(key, 0.0) + p * q
+    return tuple((value, shields, p) for (value, shields), p in out.items())
+
+
+def _add_slots(schedule, amount, count):
+    """Добавить amount в первые count раундов графика яда."""
+    return tuple(v + amount if k < count else v for k, v in enumerate(schedule))
+
+
+class SolverResult:
+    def __init__(self, victory, defeat, timeout, rounds, pruned, states, elapsed):
+        self.victory = victory       # вероятность победы героев
+        self.defeat = defeat
+        self.timeout = timeout       # бой не закончился за max_rounds
+        self.rounds = rounds         # {число раундов: вероятность окончания боя}
+        self.pruned = pruned         # отброшенная масса (оценка погрешности)
+        self.states = states         # максимальное число состояний на шаге (до прореживания)
+        self.elapsed = elapsed
+
+    @property
+    def mean_rounds(self):
+        total = sum(self.rounds.values())
+        return sum(r * p for r, p in self.rounds.items()) / total if total else 0.0
+
+
+class MarkovSolver:
+    """Распределение исходов боя стандартной пати против босса при фиксированной политике."""
+
+    def __init__(self, policy="attack", hp_step=HP_STEP, boss_hp_step=BOSS_HP_STEP, shield_step=SHIELD_STEP,
+                 epsilon=1e-9, max_states=MAX_STATES, max_rounds=200, boss_hp=None, boss_damage=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика: {policy}")
+        self.policy = policy
+        self.hp_step = hp_step
+        self.boss_hp_step = boss_hp_step
+        self.shield_step = shield_step
+        self.epsilon = epsilon
+        self.max_states = max_states
+        self.max_rounds = max_rounds
+
+        heroes, boss = _template()
+        # Для подбора баланса HP и урон босса можно подменить
+        if boss_hp is not None:
+            boss.hp = boss.max_hp = boss_hp
+        if boss_damage is not None:
+            boss.damage = boss_damage
+        self.roles = tuple(type(hero) for hero in heroes)
+        self.hero_max_hp = tuple(hero.max_hp for hero in heroes)
+        self.hero_damage = tuple(hero.damage for hero in heroes)
+        self.boss_max_hp = boss.max_hp
+        self.boss_damage = boss.base_damage
+        self.hero_count = len(heroes)
+        self.initial = (
+            boss.hp, boss.mp, 3, (0,) * HORIZON, (0,) * HORIZON,
+            tuple(hero.hp for hero in heroes), (0,) * HORIZON,
+            # MP нужна только магу и лекарю — у остальных не тратится
+            tuple(getattr(hero, "mp", 0) if type(hero) in (Mage, Healer) else 0 for hero in heroes),
+            (2 if policy == "potion" else 0,) * len(heroes), 0, 0, 0,
+        )
+        # Самое дешёвое действие с маной: шар мага, лечение лекаря
+        self.min_cost = tuple({Mage: 15, Healer: 20}.get(role, 0) for role in self.roles)
+        agility = [hero.agility for hero in heroes] + [getattr(boss, "agility", 15)]
+        slots = list(range(len(heroes))) + [BOSS]
+        self.turn_order = [slots[i] for i in sorted(range(len(slots)), key=lambda i: -agility[i])]
+
+    # ---------- СОСТОЯНИЕ ----------
+
+    @staticmethod
+    def _running(state):
+        return state[B_HP] > 0 and any(state[H_HP])
+
+    def _outcome(self, state):
+        if state[B_HP] <= 0:
+            return "victory"
+        if not any(state[H_HP]):
+            return "defeat"
+        return None
+
+    def _canonical(self, state):
+        """
+        Склеить неразличимые между раундами состояния: маски хода сбрасываются,
+        у мёртвых героев MP и зелья больше не нужны, а MP ниже цены любого
+        действия (маны никто не восстанавливает) равна нулю.
+        """
+        hps = state[H_HP]
+        mps = tuple(mp if hp > 0 and mp >= self.min_cost[k] else 0 for k, (hp, mp) in enumerate(zip(hps, state[H_MP])))
+        potions = tuple(n if hp > 0 else 0 for hp, n in zip(hps, state[H_POTIONS]))
+        boss_mp = state[B_MP] if state[B_MP] >= BOSS_MIN_COST else 0
+        return (state[B_HP], boss_mp) + state[B_POTIONS:H_HP + 1] + (state[H_DOT], mps, potions, 0, 0, 0)
+
+    # ---------- ПЕРЕХОДЫ (state -> [(вероятность, state')]) ----------
+
+    def _update_effects(self, state):
+        state = list(state)
+        hps = state[H_HP]
+        dot = state[H_DOT][0]
+        if dot:
+            # Яд бьёт каждого живого героя; агрегация HP даёт ветвление
+            branches = [((), 1.0)]
+            for hp, top in zip(hps, self.hero_max_hp):
+                outcomes = _snap(max(0, hp - dot), self.hp_step, top) if hp > 0 else ((0, 1.0),)
+                branches = [(prefix + (value,), p * q) for prefix, p in branches for value, q in outcomes]
+        else:
+            branches = [(hps, 1.0)]
+        state[H_DOT] = state[H_DOT][1:] + (0,)
+        state[STUNNED] = 0
+
+        results = []
+        for new_hps, p in branches:
+            boss_state = list(state)
+            boss_state[H_HP] = new_hps
+            # Щит, доживший до конца срока, снимается раньше, чем тикает яд босса
+            shield = state[B_SHIELD][1:] + (0,)
+            boss_dot = state[B_DOT]
+            boss_state[B_DOT] = boss_dot[1:] + (0,)
+            for value, shields, q in _hit_boss(state[B_HP], self.boss_max_hp, shield, boss_dot[0],
+                                               self.boss_hp_step, self.shield_step):
+                final = list(boss_state)
+                final[B_HP] = value
+                final[B_SHIELD] = shields
+                final = tuple(final)
+                # Состав ходящих фиксируется после обновления эффектов
+                acting = 0
+                for j, hp in enumerate(final[H_HP]):
+                    if hp > 0:
+                        acting |= 1 << j
+                results.append((p * q, _replace(final, ACTING, acting)))
+        return results
+
+    def _attack_boss(self, state, p, j, results):
+        damage = self.hero_damage[j]
+        self._skill_hit_boss(state, p, damage - 5, damage + 5, results)
+
+    def _skill_hit_boss(self, state, p, low, high, results):
+        for value, shields, q in _hit_boss_range(state[B_HP], self.boss_max_hp, state[B_SHIELD], low, high,
+                                                 self.boss_hp_step, self.shield_step):
+            results.append((p * q, _replace(_replace(state, B_HP, value), B_SHIELD, shields)))
+
+    def _heal(self, state, p, target, low, high, results):
+        hps = state[H_HP]
+        for value, q in _heal_hp(hps[target], self.hero_max_hp[target], low, high, self.hp_step):
+            results.append((p * q, _replace(state, H_HP, _replace(hps, target, value))))
+
+    def _hero_turn(self, state, j):
+        bit = 1 << j
+        if not state[ACTING] & bit:
+            return [(1.0, state)]
+        stunned = state[STUNNED] & bit
+        # Сходивший герой больше не нужен в масках: состояния, различавшиеся
+        # только ими, дальше складываются
+        state = _replace(_replace(state, ACTING, state[ACTING] & ~bit), STUNNED, state[STUNNED] & ~bit)
+        if stunned:
+            return [(1.0, state)]
+        role = self.roles[j]
+        mp = state[H_MP][j]
+        hps = state[H_HP]
+        results = []
+
+        if self.policy == "potion" and hps[j] < self.hero_max_hp[j] * 0.35 and state[H_POTIONS][j] > 0:
+            state = _replace(state, H_POTIONS, _replace(state[H_POTIONS], j, state[H_POTIONS][j] - 1))
+            if hps[j] > 0:
+                self._heal(state, 1.0, j, 50, 50, results)
+                return results
+            return [(1.0, state)]
+
+        if self.policy in ("skill", "potion") and role in (Mage, Healer) and mp >= 25:
+            if role is Mage:
+                # Магия яда: PoisonEffect(2, 10) + randint(25, 35)
+                state = _replace(state, H_MP, _replace(state[H_MP], j, mp - 20))
+                state = _replace(state, B_DOT, _add_slots(state[B_DOT], 10, 1))
+                self._skill_hit_boss(state, 1.0, 25, 35, results)
+            else:
+                # heal_ally: случайный живой союзник, кроме самого лекаря
+                state = _replace(state, H_MP, _replace(state[H_MP], j, mp - 25))
+                allies = [k for k, hp in enumerate(hps) if hp > 0 and k != j]
+                if not allies:
+                    return [(1.0, state)]
+                for target in allies:
+                    self._heal(state, 1.0 / len(allies), target, 30, 45, results)
+            return results
+
+        if role is Mage and mp >= 15:
+            ball = _replace(state, H_MP, _replace(state[H_MP], j, mp - 15))
+            ball = _replace(ball, B_DOT, _add_slots(ball[B_DOT], 8, 2))
+            self._skill_hit_boss(ball, 0.6, 20, 30, results)
+            self._attack_boss(state, 0.4, j, results)
+            return results
+        if role is Healer and mp >= 20:
+            heal = _replace(state, H_MP, _replace(state[H_MP], j, mp - 20))
+            alive = [k for k, hp in enumerate(hps) if hp > 0]
+            for target in alive:
+                self._heal(heal, 0.7 / len(alive), target, 25, 40, results)
+            self._attack_boss(state, 0.3, j, results)
+            return results
+
+        self._attack_boss(state, 1.0, j, results)
+        return results
+
+    def _boss_skill(self, state, p, results):
+        """Boss.use_skill: три умения равновероятно."""
+        third = p / 3.0
+        # Ядовитое дыхание: всем живым героям яд 15 на три раунда
+        if state[B_MP] >= 40:
+            breath = _replace(state, B_MP, state[B_MP] - 40)
+            results.append((third, _replace(breath, H_DOT, _add_slots(breath[H_DOT], 15, 3))))
+        else:
+            results.append((third, state))
+        # Щит на 60 урона, исчезает через три раунда
+        if state[B_MP] >= 30:
+            wall = _replace(state, B_MP, state[B_MP] - 30)
+            shield = wall[B_SHIELD]
+            results.append((third, _replace(wall, B_SHIELD, shield[:-1] + (shield[-1] + 60,))))
+        else:
+            results.append((third, state))
+        # Сокрушающий удар разыгрывается по героям отдельными шагами
+        results.append((third, _replace(state, STOMP, 1)))
+
+    def _boss_turn(self, state):
+        if state[B_HP] <= 0:
+            return [(1.0, state)]
+        results = []
+        has_items = state[B_POTIONS] > 0
+        total = 1.0 if has_items else 0.8
+        alive = [k for k, hp in enumerate(state[H_HP]) if hp > 0]
+
+        # Атака: 30% — умение, иначе удар по случайному живому герою
+        attack = 0.5 / total
+        for target in alive:
+            for value, q in _damage_hp(state[H_HP][target], self.hero_max_hp[target],
+                                       self.boss_damage - 5, self.boss_damage + 5, self.hp_step):
+                hit = _replace(state, H_HP, _replace(state[H_HP], target, value))
+                results.append((attack * 0.7 / len(alive) * q, hit))
+        self._boss_skill(state, attack * 0.3, results)
+        self._boss_skill(state, 0.3 / total, results)
+        if has_items:
+            healed = _replace(state, B_POTIONS, state[B_POTIONS] - 1)
+            for value, q in _heal_hp(state[B_HP], self.boss_max_hp, 50, 50, self.boss_hp_step):
+                results.append((0.2 * q, _replace(healed, B_HP, value)))
+        return results
+
+    def _stomp_step(self, state):
+        """Один герой под Сокрушающим ударом: урон randint(35, 50) и оглушение с шансом 40%."""
+        j = state[STOMP] - 1
+        if j < 0:
+            return [(1.0, state)]
+        nxt = _replace(state, STOMP, j + 2 if j + 1 < self.hero_count else 0)
+        hp = state[H_HP][j]
+        if hp <= 0:
+            return [(1.0, nxt)]
+        results = []
+        # Оглушение важно, только если герой ещё ходит в этом раунде
+        stun = nxt[ACTING] & (1 << j)
+        for value, q in _damage_hp(hp, self.hero_max_hp[j], 35, 50, self.hp_step):
+            hit = _replace(nxt, H_HP, _replace(nxt[H_HP], j, value))
+            if stun:
+                results.append((0.6 * q, hit))
+                results.append((0.4 * q, _replace(hit, STUNNED, nxt[STUNNED] | stun)))
+            else:
+                results.append((q, hit))
+        return results
+
+    # ---------- РАСПРЕДЕЛЕНИЕ ----------
+
+    def _step(self, dist, transition, only_running=True):
+        out = {}
+        for state, p in dist.items():
+            if only_running and not self._running(state):
+                out[state] = out.get(state, 0.0) + p
+                continue
+            for q, new_state in transition(state):
+                out[new_state] = out.get(new_state, 0.0) + p * q
+        return out
+
+    def _prune(self, dist):
+        """Отбросить состояния легче epsilon; вернуть отброшенную массу."""
+        if not self.epsilon:
+            return dist, 0.0
+        total = sum(dist.values())
+        dist = {state: p for state, p in dist.items() if p >= self.epsilon}
+        return dist, total - sum(dist.values())
+
+    def _stratum(self, state):
+        """Слой для прореживания: полоса HP босса (1/STRATA от максимума) и кто из героев жив."""
+        return state[B_HP] * STRATA // self.boss_max_hp, tuple(map(bool, state[H_HP]))
+
+    def _thin(self, dist):
+        """
+        Ограничить число состояний примерно max_states без потери массы.
+
+        Состояния тяжелее порога t = масса / max_states остаются как есть.
+        Лёгкие делятся на слои (полоса HP босса и живые герои), внутри слоя идут в
+        порядке ключей, и из каждого отрезка накопленной массы длины t
+        остаётся одно состояние (систематическая выборка с фиксированным
+        сдвигом — результат детерминирован). Масса каждого слоя сохраняется
+        точно, поэтому редкие исходы (почти убитый босс) не теряются.
+        """
+        if not self.max_states or len(dist) <= self.max_states:
+            return dist
+        threshold = sum(dist.values()) / self.max_states
+        kept = {}
+        strata = {}
+        for state, p in dist.items():
+            if p >= threshold:
+                kept[state] = p
+            else:
+                strata.setdefault(self._stratum(state), []).append(state)
+
+        for states in strata.values():
+            states.sort()
+            picked = []
+            mark = threshold / 2
+            acc = 0.0
+            for state in states:
+                acc += dist[state]
+                while acc >= mark:
+                    picked.append(state)
+                    mark += threshold
+            if not picked:
+                picked.append(max(states, key=dist.__getitem__))
+            # Масса слоя делится поровну между оставшимися состояниями
+            share = acc / len(picked)
+            for state in picked:
+                kept[state] = kept.get(state, 0.0) + share
+        return kept
+
+    def solve(self):
+        started = time.perf_counter()
+        dist = {self.initial: 1.0}
+        victory = defeat = pruned = 0.0
+        rounds = {}
+        max_states = 1
+
+        # Шаги одного раунда: эффекты, ходы по порядку, Сокрушающий удар по героям
+        steps = [self._update_effects]
+        for slot in self.turn_order:
+            if slot == BOSS:
+                steps.append(self._boss_turn)
+                steps.extend([self._stomp_step] * self.hero_count)
+            else:
+                steps.append(partial(self._hero_turn, j=slot))
+
+        for round_number in range(1, self.max_rounds + 1):
+            if not dist:
+                break
+            for transition in steps:
+                dist = self._step(dist, transition)
+                max_states = max(max_states, len(dist))
+                dist, lost = self._prune(self._thin(dist))
+                pruned += lost
+
+            # Закончившиеся бои выводим из распределения
+            running = {}
+            for state, p in dist.items():
+                outcome = self._outcome(state)
+                if outcome is None:
+                    state = self._canonical(state)
+                    running[state] = running.get(state, 0.0) + p
+                    continue
+                rounds[round_number] = rounds.get(round_number, 0.0) + p
+                if outcome == "victory":
+                    victory += p
+                else:
+                    defeat += p
+            dist = running
+
+        timeout = sum(dist.values())
+        return SolverResult(victory, defeat, timeout, rounds, pruned, max_states, time.perf_counter() - started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Вероятность победы пати над боссом (цепь Маркова)")
+    parser.add_argument("--policy", choices=POLICIES, default="attack")
+    parser.add_argument("--hp-step", type=int, default=HP_STEP, help="шаг агрегации HP героев (1 — без агрегации)")
+    parser.add_argument("--boss-hp-step", type=int, default=BOSS_HP_STEP, help="шаг агрегации HP босса")
+    parser.add_argument("--shield-step", type=int, default=SHIELD_STEP, help="шаг агрегации остатка щита")
+    parser.add_argument("--max-states", type=int, default=MAX_STATES, help="предел состояний на шаге (0 — без прореживания)")
+    parser.add_argument("--epsilon", type=float, default=1e-9, help="порог отбрасывания маловероятных состояний")
+    parser.add_argument("--max-rounds", type=int, default=200)
+    parser.add_argument("--boss-hp", type=int, default=None, help="подменить HP босса")
+    parser.add_argument("--boss-damage", type=int, default=None, help="подменить урон босса")
+    args = parser.parse_args(argv)
+
+    solver = MarkovSolver(args.policy, hp_step=args.hp_step, boss_hp_step=args.boss_hp_step,
+                          shield_step=args.shield_step, epsilon=args.epsilon, max_states=args.max_states,
+                          max_rounds=args.max_rounds, boss_hp=args.boss_hp, boss_damage=args.boss_damage)
+    result = solver.solve()
+    print(f"Политика: {args.policy}, шаг HP: {args.hp_step}/{args.boss_hp_step}, "
+          f"состояний: {args.max_states}, epsilon: {args.epsilon}")
+    print(f"Время: {result.elapsed:.2f} с, максимум состояний до прореживания: {result.states}")
+    print(f"Победа героев: {result.victory:.6f}")
+    print(f"Поражение:     {result.defeat:.6f}")
+    print(f"Не закончен:   {result.timeout:.6f}")
+    print(f"Отброшено:     {result.pruned:.2e}")
+    print(f"Среднее число раундов: {result.mean_rounds:.3f}")
+    for rounds, p in sorted(result.rounds.items()):
+        if p >= 1e-4:
+            print(f"  {rounds:3d} раундов: {p:.4f}")
+
+
+if __name__ == "__main__":
+    main()
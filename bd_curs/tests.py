@@ -1,14 +1,50 @@
+import asyncio
 import unittest
 import sys
 import os
+import datetime
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from core import Character
+from core import Character, BoundedStat
 from characters import Warrior, Mage, Healer, Archer
 from boss import Boss
-from effects import PoisonEffect, ShieldEffect, StrengthBuffEffect
+from effects import PoisonEffect, ShieldEffect, StrengthBuffEffect, StunEffect, SpeedEffect
 from items import HealthPotion, ManaPotion, DamagePotion, Inventory
-from battle import Battle
+from battle import Battle, BattleLogger, SUMMARY
+from sim import AttackPolicy, PotionPolicy, run_simulation, OUTCOME_TIMEOUT
+import replay
+import sim
+from rng import BattleRNG
+from events import EventBus, DamageDealt, EffectApplied, EffectExpired, RoundStarted
+from solver import MarkovSolver
+from initiative import Timeline, TICKS
+from roster import AliveSet
+import content
+from items import Item, PoisonDart
+from characters import make_hero
+from results import BattleEvents, BattleTally, EventRecorder, ResultSpool, ResultWriter, make_record
+from db_sqlite import SQLiteBackend
+from db_backend import TTLCache, add_months, month_of
+import retention
+import ingest
+
+try:
+    import numpy
+    import export
+    from vector_engine import VectorBattle
+except ImportError:  # векторный движок и выгрузка требуют NumPy
+    numpy = None
+
+try:
+    import db_mysql
+except ImportError:  # пул соединений и предохранитель MySQL требуют PyMySQL
+    db_mysql = None
 
 
 class TestCharacter(unittest.TestCase):
@@ -125,6 +161,74 @@ class TestEffects(unittest.TestCase):
         buff.on_remove(self.character)
         self.assertEqual(self.character.damage, initial_damage)
 
+    def test_derived_stats_follow_effects(self):
+        boss = Boss("Босс")
+        buff = StrengthBuffEffect(duration=2, damage_bonus=10)
+        boss.add_effect(buff)
+        self.assertEqual(boss.damage, boss.base_damage + 10)
+        self.assertEqual(boss.calculate_damage(), boss.damage)
+        # Новая база учитывается вместе с действующим модификатором
+        boss.damage = 100
+        self.assertEqual(boss.damage, 110)
+        boss.remove_effect(buff)
+        self.assertEqual(boss.damage, 100)
+
+        self.character.add_effect(SpeedEffect(duration=2, agility_bonus=-15))
+        self.assertEqual(self.character.agility, -5)
+        self.assertEqual(self.character.base_agility, 10)
+
+
+class TestEffectTable(unittest.TestCase):
+
+    def setUp(self):
+        self.character = Character("Тест", 100, 20)
+
+    def test_expiry_by_buckets(self):
+        poison = PoisonEffect(duration=3, damage_per_turn=5)
+        self.character.add_effect(poison)
+        self.character.update_effects()
+        self.assertEqual(poison.duration, 2)
+        self.character.update_effects()
+        self.character.update_effects()
+        self.assertNotIn(poison, self.character.effects)
+        # Два срабатывания яда, третье обновление снимает эффект
+        self.assertEqual(self.character.hp, 90)
+
+    def test_stun_flag(self):
+        stun = StunEffect(duration=1)
+        self.character.add_effect(stun)
+        self.assertTrue(self.character.effects.stunned)
+        self.character.update_effects()
+        self.assertFalse(self.character.effects.stunned)
+
+    def test_absorbers_index(self):
+        self.character.add_effect(PoisonEffect(duration=3, damage_per_turn=5))
+        shield = ShieldEffect(duration=2, shield_amount=20)
+        self.character.add_effect(shield)
+        self.assertEqual(list(self.character.effects.absorbers), [shield])
+        self.character.take_damage(30)
+        self.assertEqual(self.character.hp, 90)
+
+    def test_empty_table_allocates_on_first_add(self):
+        other = Character("Другой", 100, 20)
+        # Без эффектов таблицы разделяют один пустой словарь только для чтения
+        self.assertIs(self.character.effects._order, other.effects._order)
+        self.character.update_effects()
+        self.assertFalse(self.character.effects.has(PoisonEffect))
+        self.character.add_effect(PoisonEffect(duration=1, damage_per_turn=5))
+        self.assertEqual(len(other.effects), 0)
+        self.character.update_effects()
+        self.assertEqual(len(self.character.effects), 0)
+
+    def test_pooled_effects_are_reused(self):
+        poison = PoisonEffect.acquire(duration=1, damage_per_turn=5)
+        self.character.add_effect(poison)
+        self.character.update_effects()
+        self.assertNotIn(poison, self.character.effects)
+        again = PoisonEffect.acquire(duration=4, damage_per_turn=7)
+        self.assertIs(again, poison)
+        self.assertEqual((again.duration, again.damage_per_turn), (4, 7))
+
 
 class TestItems(unittest.TestCase):
 
@@ -210,6 +314,1115 @@ class TestBattle(unittest.TestCase):
         self.assertEqual(winner, "Герои")
 
 
+class TestBattleLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "battle_log.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, path=None):
+        with open(path or self.path, encoding="utf-8") as f:
+            return f.read().splitlines()
+
+    def test_rounds_are_not_truncated(self):
+        logger = BattleLogger(self.path, echo=False)
+        battle = Battle([Warrior("Воин")], Boss("Босс"), policy=AttackPolicy(), logger=logger, rng=BattleRNG(2))
+        battle.play(max_rounds=3)
+        logger.close()
+        lines = self.read()
+        self.assertEqual(lines[0], "=== ЛОГ БОЯ ===")
+        self.assertEqual(sum(line.startswith("РАУНД") for line in lines), battle.round)
+
+    def test_summary_level_skips_details(self):
+        logger = BattleLogger(self.path, echo=False, level=SUMMARY)
+        Battle([Warrior("Воин")], Boss("Босс"), policy=AttackPolicy(), logger=logger, rng=BattleRNG(2)).play(2)
+        logger.close()
+        text = "\n".join(self.read())
+        self.assertIn("РАУНД 2", text)
+        self.assertNotIn("атакует", text)
+
+    def test_rotation_limits_file_size(self):
+        logger = BattleLogger(self.path, echo=False, max_bytes=2000, backup_count=2, buffer_lines=10)
+        for i in range(500):
+            logger.log(f"строка {i:04d}")
+        logger.close()
+        self.assertTrue(os.path.exists(self.path + ".2"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+        self.assertEqual(self.read()[-1], "строка 0499")
+        for path in (self.path, self.path + ".1"):
+            self.assertLess(os.path.getsize(path), 2000 + 10 * 32)
+
+
+class TestCompactObjects(unittest.TestCase):
+
+    def test_objects_have_no_dict(self):
+        for obj in (Warrior("Воин"), Boss("Босс"), PoisonEffect(), HealthPotion(), Inventory()):
+            self.assertFalse(hasattr(obj, "__dict__"), type(obj).__name__)
+
+    def test_optional_slots_behave_like_missing_attributes(self):
+        character = Character("Тест", 100, 20)
+        self.assertFalse(hasattr(character, "mp"))
+        character.mp = 10
+        self.assertEqual(character.mp, 10)
+
+    def test_bounded_stat_with_slots(self):
+        class Stats:
+            __slots__ = ("_hp",)
+            hp = BoundedStat(0, 100)
+
+        stats = Stats()
+        self.assertEqual(stats.hp, 0)
+        stats.hp = 150
+        self.assertEqual(stats.hp, 100)
+        stats.hp = -5
+        self.assertEqual(stats.hp, 0)
+
+    def test_shared_items(self):
+        self.assertIs(HealthPotion.shared(), HealthPotion.shared())
+        self.assertIsNot(HealthPotion.shared(), ManaPotion.shared())
+
+
+class TestHeadlessSimulation(unittest.TestCase):
+
+    def test_battle_plays_with_policy(self):
+        battle = Battle([Warrior("Воин"), Mage("Маг")], Boss("Босс"), policy=AttackPolicy())
+        battle.logger.echo = False
+        battle.logger.filename = None
+        stats = battle.play(max_rounds=300)
+        self.assertIsNotNone(stats["winner"])
+        self.assertTrue(battle.is_battle_over())
+
+    def test_run_simulation_fills_shared_arrays(self):
+        result = run_simulation(20, workers=1, policy="skill", seed=1, chunk_size=7)
+        self.assertEqual(len(result.outcomes), 20)
+        self.assertTrue(all(r > 0 for r in result.rounds))
+        self.assertNotIn(OUTCOME_TIMEOUT, list(result.outcomes))
+        self.assertGreaterEqual(result.win_rate, 0.0)
+        self.assertLessEqual(result.win_rate, 1.0)
+
+
+class TestBattleRNG(unittest.TestCase):
+
+    def test_same_seed_same_stream(self):
+        a = BattleRNG(42, block_size=16)
+        b = BattleRNG(42, block_size=16)
+        self.assertEqual([a.randint(1, 6) for _ in range(100)], [b.randint(1, 6) for _ in range(100)])
+
+    def test_randint_bounds(self):
+        rng = BattleRNG(1)
+        values = {rng.randint(35, 50) for _ in range(5000)}
+        self.assertEqual(values, set(range(35, 51)))
+
+    def test_battle_streams_are_independent(self):
+        first = BattleRNG.for_battle(7, 0)
+        second = BattleRNG.for_battle(7, 1)
+        self.assertNotEqual([first.random() for _ in range(5)], [second.random() for _ in range(5)])
+        self.assertEqual(BattleRNG.for_battle(7, 1).random(), BattleRNG.for_battle(7, 1).random())
+
+    def test_clone_before_first_draw(self):
+        # Генератор создаётся лениво: копия ещё не начатого потока повторяет оригинал
+        for seed in (5, None):
+            rng = BattleRNG(seed)
+            copy = rng.clone()
+            self.assertEqual([rng.random() for _ in range(300)], [copy.random() for _ in range(300)])
+
+    def test_seeded_simulation_is_reproducible(self):
+        first = run_simulation(30, workers=1, policy="potion", seed=3, chunk_size=30)
+        second = run_simulation(30, workers=1, policy="potion", seed=3, chunk_size=4)
+        self.assertEqual(list(first.rounds), list(second.rounds))
+        self.assertEqual(list(first.hero_hp), list(second.hero_hp))
+
+
+class TestEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = EventBus()
+        self.events = []
+        self.target = Character("Цель", 100, 10)
+        self.target.bus = self.bus
+
+    def test_effects_publish_events(self):
+        self.bus.subscribe(self.events.append)
+        self.target.add_effect(PoisonEffect(duration=1, damage_per_turn=5))
+        self.target.update_effects()
+        kinds = [type(event) for event in self.events]
+        self.assertEqual(kinds, [EffectApplied, EffectExpired])
+        self.assertEqual(self.events[0].format().splitlines()[0], "Цель отравлен! Будет получать 5 урона за ход.")
+
+    def test_subscription_filter(self):
+        self.bus.subscribe(self.events.append, DamageDealt)
+        self.target.add_effect(PoisonEffect(duration=2, damage_per_turn=5))
+        self.target.update_effects()
+        self.assertEqual([(e.kind, e.amount) for e in self.events], [("poison", 5)])
+
+    def test_no_events_without_subscribers(self):
+        self.assertFalse(self.bus.active)
+        self.bus.subscribe(self.events.append)
+        self.bus.unsubscribe(self.events.append)
+        self.assertFalse(self.bus.active)
+
+    def test_battle_publishes_rounds(self):
+        heroes = [Warrior("Воин")]
+        self.bus.subscribe(self.events.append, RoundStarted)
+        battle = Battle(heroes, Boss("Босс"), policy=AttackPolicy(), rng=BattleRNG(1), bus=self.bus)
+        battle.play(max_rounds=3)
+        self.assertEqual([event.round for event in self.events], [1, 2, 3][:battle.round])
+
+
+class TestBattleSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        heroes, boss = sim.make_party()
+        self.battle = Battle(heroes, boss, policy=PotionPolicy(), logger=BattleLogger(None, echo=False),
+                             rng=BattleRNG(4), bus=EventBus())
+        for _ in range(3):
+            self.battle.start_round()
+
+    def final_state(self, battle):
+        battle.play()
+        return replay.state_hash(battle.heroes, battle.boss, battle.round)
+
+    def test_restore_replays_the_same_future(self):
+        state = self.battle.snapshot()
+        first = self.final_state(self.battle)
+        self.battle.restore(state)
+        self.assertEqual(self.final_state(self.battle), first)
+
+    def test_fork_is_independent(self):
+        fork = self.battle.fork()
+        self.assertIsNot(fork.heroes[0], self.battle.heroes[0])
+        self.assertIs(fork.heroes[0].boss, fork.boss)
+        fork_result = self.final_state(fork)
+        self.assertEqual(self.battle.round, 3)
+        self.assertEqual(self.final_state(self.battle), fork_result)
+
+    def test_fork_before_first_round(self):
+        heroes, boss = sim.make_party()
+        battle = Battle(heroes, boss, policy=PotionPolicy(), logger=BattleLogger(None, echo=False),
+                        rng=BattleRNG(5), bus=EventBus())
+        fork = battle.fork()
+        # Буфер случайности ещё пуст: оба боя пополняют его из своих генераторов
+        self.assertEqual(self.final_state(fork), self.final_state(battle))
+
+    def replay_rounds(self, battle):
+        rounds = []
+        while not battle.is_battle_over() and battle.round < 200:
+            battle.start_round()
+            rounds.append(replay.state_hash(battle.heroes, battle.boss, battle.round))
+        return rounds
+
+    def test_restore_after_death_keeps_target_order(self):
+        # После смерти набор живых переставлен (swap-remove): порядок целей
+        # должен вернуться из снимка, а не собраться заново по списку героев
+        for seed in range(6):
+            heroes, bosses = sim.make_raid(5, 2)
+            battle = Battle(heroes, bosses, policy=PotionPolicy(), logger=BattleLogger(None, echo=False),
+                            rng=BattleRNG(seed), bus=EventBus())
+            while not battle.is_battle_over() and len(battle.alive_heroes) == len(heroes):
+                battle.start_round()
+            state = battle.snapshot()
+            fork = battle.fork()
+            first = self.replay_rounds(battle)
+            battle.restore(state)
+            self.assertEqual(self.replay_rounds(battle), first)
+            self.assertEqual(self.replay_rounds(fork), first)
+
+    def test_restore_keeps_buff_damage(self):
+        warrior = self.battle.heroes[0]
+        warrior.add_effect(StrengthBuffEffect(duration=2, damage_bonus=10))
+        state = self.battle.snapshot()
+        warrior.update_effects()
+        warrior.update_effects()
+        self.assertEqual(warrior.damage, 30)
+        self.battle.restore(state)
+        self.assertEqual(warrior.damage, 40)
+        self.assertEqual(warrior.damage_mod, 10)
+
+
+class TestTimeline(unittest.TestCase):
+
+    def make_units(self, *agilities):
+        units = []
+        for i, agility in enumerate(agilities):
+            unit = Warrior(f"U{i}")
+            unit.agility = agility
+            units.append(unit)
+        return units
+
+    def test_round_order_by_agility(self):
+        units = self.make_units(12, 25, 12, 30)
+        timeline = Timeline()
+        for unit in units:
+            timeline.add(unit, delay=0)
+        expected = [units[3], units[1], units[0], units[2]]
+        self.assertEqual(timeline.pop_until(TICKS), expected)
+        units[1].hp = 0
+        timeline.remove(units[3])
+        self.assertEqual(timeline.pop_until(2 * TICKS), [units[0], units[2]])
+
+    def test_atb_fast_units_act_more_often(self):
+        fast, slow = self.make_units(30, 15)
+        timeline = Timeline(round_based=False)
+        timeline.add(fast, delay=0)
+        timeline.add(slow, delay=0)
+        turns = timeline.pop_until(4 * TICKS)
+        self.assertEqual(turns.count(fast), 8)
+        self.assertEqual(turns.count(slow), 4)
+
+    def test_speed_effect_reschedules(self):
+        fast, slow = self.make_units(15, 15)
+        timeline = Timeline(round_based=False)
+        for unit in (fast, slow):
+            unit.timeline = timeline
+            timeline.add(unit)
+        fast.add_effect(SpeedEffect(duration=2, agility_bonus=15))
+        self.assertEqual(fast.agility, 30)
+        self.assertEqual(timeline.pop(), fast)
+        self.assertEqual(timeline.now, TICKS / 2)
+
+    def test_atb_battle_snapshot(self):
+        heroes, boss = sim.make_party()
+        battle = Battle(heroes, boss, policy=PotionPolicy(), logger=BattleLogger(None, echo=False),
+                        rng=BattleRNG(4), bus=EventBus(), timeline=Timeline(round_based=False))
+        battle.start_round()
+        fork = battle.fork()
+        battle.play()
+        fork.play()
+        self.assertEqual(replay.state_hash(fork.heroes, fork.boss, fork.round),
+                         replay.state_hash(battle.heroes, battle.boss, battle.round))
+
+
+class TestRaid(unittest.TestCase):
+
+    def test_alive_set_death_and_revive(self):
+        units = [Warrior(f"U{i}") for i in range(5)]
+        alive = AliveSet(units)
+        for unit in units:
+            unit.team = alive
+        units[1].take_damage(1000)
+        self.assertEqual(len(alive), 4)
+        self.assertNotIn(units[1], alive)
+        # HP обнулено в обход take_damage — набор дочищается при выборе
+        units[3].hp = 0
+        rng = BattleRNG(2)
+        picks = {alive.choice(rng, exclude=units[0]) for _ in range(200)}
+        self.assertEqual(picks, {units[2], units[4]})
+        units[1].hp = 50
+        alive.add(units[1])
+        self.assertIn(units[1], alive)
+        for unit in units:
+            unit.hp = 0
+        self.assertFalse(alive)
+        self.assertIsNone(alive.choice(rng))
+
+    def test_raid_battle(self):
+        heroes, bosses = sim.make_raid(60, 3)
+        battle = Battle(heroes, bosses, policy=PotionPolicy(), logger=BattleLogger(None, echo=False),
+                        rng=BattleRNG(5), bus=EventBus())
+        fork = battle.fork()
+        stats = battle.play()
+        self.assertIsNotNone(stats["winner"])
+        self.assertEqual(stats["heroes_alive"], sum(1 for hero in heroes if hero.is_alive))
+        self.assertEqual(stats["boss_hp"], sum(boss.hp for boss in bosses))
+        # Урон получил не только первый босс
+        self.assertTrue(all(boss.hp < boss.max_hp for boss in bosses))
+        self.assertEqual(fork.play(), stats)
+
+
+class TestContent(unittest.TestCase):
+
+    def definitions(self):
+        return {
+            "classes": {"Paladin": {"role": "Паладин", "hp": 120, "damage": 25, "mp": 40, "skill": "smite"}},
+            "skills": {"smite": {"kind": "strike", "mp_cost": 15, "amount": [10, 20],
+                                 "effect": {"type": "stun", "duration": 1}}},
+            "items": {"elixir": {"kind": "heal", "name": "Эликсир", "amount": 80,
+                                 "text": "{user} пьёт {item}: +{amount} HP"}},
+        }
+
+    def test_compile_tables(self):
+        tables = content.compile_content(self.definitions())
+        skill = tables.skills_by_role["Паладин"]
+        self.assertEqual((skill.min_mp, skill.low, skill.high), (15, 10, 20))
+        self.assertIsInstance(skill.effect(), StunEffect)
+        self.assertEqual(content.CLASSES["Mage"].mp, 100)
+        self.assertIs(content.SKILLS_BY_ROLE["Лекарь"], content.SKILLS["heal_ally"])
+
+    def test_validation_errors(self):
+        broken = self.definitions()
+        broken["classes"]["Paladin"]["hp"] = "много"
+        with self.assertRaisesRegex(ValueError, r"classes\.Paladin\.hp"):
+            content.compile_content(broken)
+        broken = self.definitions()
+        broken["skills"]["smite"]["effect"]["power"] = 3
+        with self.assertRaisesRegex(ValueError, r"skills\.smite\.effect"):
+            content.compile_content(broken)
+        broken = self.definitions()
+        broken["classes"]["Paladin"]["skill"] = "fireball"
+        with self.assertRaisesRegex(ValueError, "fireball"):
+            content.compile_content(broken)
+
+    def test_items_and_heroes_from_definitions(self):
+        dart = Item.get("poison_dart")
+        self.assertIs(dart, PoisonDart.shared())
+        hero = make_hero("Healer", "Лекарь")
+        self.assertIsInstance(hero, Healer)
+        self.assertEqual((hero.hp, hero.mp, hero.agility), (90, 80, 14))
+        hero.boss = Boss("Босс")
+        self.assertIn("отравлен", dart.use(hero))
+        self.assertTrue(hero.boss.effects.has(PoisonEffect))
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_varint_roundtrip(self):
+        out = bytearray()
+        values = [0, 1, 127, 128, 300, 2 ** 64 - 1]
+        for value in values:
+            replay.write_varint(out, value)
+        pos = 0
+        for value in values:
+            decoded, pos = replay.read_varint(out, pos)
+            self.assertEqual(decoded, value)
+        self.assertEqual(pos, len(out))
+
+    def test_recorded_battle_replays_exactly(self):
+        recorded = [replay.record_battle(PotionPolicy(), seed=seed) for seed in range(20)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.bdr")
+            replay.dump(recorded, path)
+            loaded = replay.load(path)
+        self.assertEqual([r.turns for r in loaded], [r.turns for r in recorded])
+        self.assertTrue(all(replay.verify_many(loaded)))
+        # Ход кодируется одним байтом, заголовок и хэш — пара десятков байт
+        for r in recorded:
+            self.assertLessEqual(len(r.to_bytes()), len(r.turns) + 40)
+
+    def test_tampered_replay_is_detected(self):
+        recorded = replay.record_battle(PotionPolicy(), seed=5)
+        recorded.seed += 1
+        self.assertFalse(replay.verify(recorded))
+
+
+@unittest.skipIf(numpy is None, "NumPy не установлен")
+class TestVectorEngine(unittest.TestCase):
+    """Дифференциальный тест: векторный движок против эталонного battle.Battle."""
+
+    def assertSameMean(self, reference, vector, sigmas=4.0):
+        se = (statistics.pvariance(reference) / len(reference) + float(vector.var()) / len(vector)) ** 0.5
+        self.assertLess(abs(statistics.fmean(reference) - float(vector.mean())), sigmas * se + 1e-9)
+
+    def test_matches_reference_engine(self):
+        for policy, battles in (("attack", 500), ("potion", 1500)):
+            reference = run_simulation(battles, workers=1, policy=policy, seed=7)
+            engine = VectorBattle(20000, policy=policy, seed=7)
+            engine.run()
+            self.assertSameMean(list(reference.rounds), engine.rounds)
+            self.assertSameMean(list(reference.boss_hp), engine.boss_hp)
+
+    def test_all_battles_finish(self):
+        engine = VectorBattle(1000, policy="skill", seed=1)
+        outcomes = engine.run()
+        self.assertFalse((outcomes == OUTCOME_TIMEOUT).any())
+        self.assertTrue(((engine.boss_hp == 0) | ((engine.hero_hp == 0).all(axis=1))).all())
+
+
+
+class TestMarkovSolver(unittest.TestCase):
+    def test_probability_mass_is_conserved(self):
+        result = MarkovSolver("potion", max_rounds=4).solve()
+        total = result.victory + result.defeat + result.timeout + result.pruned
+        self.assertAlmostEqual(total, 1.0, places=9)
+        self.assertGreater(result.timeout, 0.9)
+
+    @unittest.skipIf(numpy is None, "NumPy не установлен")
+    def test_matches_vector_engine(self):
+        # Ослабленный босс, чтобы вероятность победы была заметной
+        engine = VectorBattle(20000, policy="skill", seed=5)
+        engine.boss_hp[:] = 600
+        engine.boss_max_hp = 600
+        outcomes = engine.run()
+        result = MarkovSolver("skill", boss_hp=600).solve()
+        self.assertAlmostEqual(result.victory, float((outcomes == sim.OUTCOME_VICTORY).mean()), delta=0.03)
+        self.assertAlmostEqual(result.mean_rounds, float(engine.rounds.mean()), delta=0.3)
+
+
+class TestResultWriter(unittest.TestCase):
+    def test_records_are_written_in_order(self):
+        saved = []
+        writer = ResultWriter(saved.append, batch_size=4)
+        heroes = [Warrior("Волк"), Mage("Пудж")]
+        for i in range(10):
+            writer.submit(make_record("victory", "Дракон", i, heroes))
+        self.assertTrue(writer.close())
+        self.assertEqual([r.round_count for batch in saved for r in batch], list(range(10)))
+        self.assertTrue(all(len(batch) <= 4 for batch in saved))
+        self.assertEqual([(p.name, p.role, p.hp) for p in saved[0][0].participants],
+                         [("Волк", "Воин", 150), ("Пудж", "Маг", 80)])
+        self.assertEqual(writer.stats()["written"], 10)
+
+    def test_failed_batch_is_retried_then_reported(self):
+        calls = []
+        failed = []
+        done = threading.Event()
+
+        def flaky(batch):
+            calls.append(len(batch))
+            if len(calls) < 3:
+                raise OSError("нет связи")
+            done.set()
+
+        writer = ResultWriter(flaky, retries=2, retry_delay=0.001, on_error=lambda b, e: failed.append(b))
+        writer.submit(make_record("defeat", "Дракон", 3, []))
+        # close() не ждёт между повторами, поэтому сначала даём писателю доретраить
+        self.assertTrue(done.wait(5))
+        self.assertTrue(writer.close())
+        self.assertEqual((len(calls), writer.written, failed), (3, 1, []))
+
+        def down(batch):
+            raise OSError("нет связи")
+
+        writer = ResultWriter(down, retries=1, retry_delay=0.001, on_error=lambda b, e: failed.append(b))
+        writer.submit(make_record("defeat", "Дракон", 3, []))
+        self.assertTrue(writer.close())
+        self.assertEqual((writer.dropped, len(failed)), (1, 1))
+        with self.assertRaises(RuntimeError):
+            writer.submit(make_record("defeat", "Дракон", 4, []))
+
+    def test_spooled_results_are_flushed_once_db_is_back(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "spool", "results.sqlite3")
+            saved = {}
+            db_up = threading.Event()
+
+            def save(batch):
+                if not db_up.is_set():
+                    raise OSError("нет связи")
+                for record in batch:
+                    saved[record.battle_id] = record
+
+            writer = ResultWriter(save, retries=0, spool=ResultSpool(path), flush_interval=0.01)
+            records = [make_record("victory", "Дракон", i, [Warrior("Волк")]) for i in range(3)]
+            for record in records:
+                writer.submit(record)
+            while writer.spooled < 3:
+                time.sleep(0.01)
+            # Отложенное переживает перезапуск: новый spool на том же файле видит записи
+            reopened = ResultSpool(path)
+            self.assertEqual(reopened.peek(10), records)
+            reopened.close()
+
+            db_up.set()
+            while len(writer.spool):
+                time.sleep(0.01)
+            self.assertTrue(writer.close())
+            writer.spool.close()
+            self.assertEqual(sorted(saved), sorted(record.battle_id for record in records))
+            self.assertEqual((writer.written, writer.dropped), (3, 0))
+
+    def test_rejected_record_is_quarantined(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            spool = ResultSpool(os.path.join(tmp, "results.sqlite3"))
+            records = [make_record("victory", "Дракон", i, [Warrior("Волк")]) for i in range(4)]
+            poison = records[0]._replace(boss_name="Ловушка")
+            spool.append([poison] + records[1:])
+            saved = []
+            failed = []
+            db_up = threading.Event()
+
+            def save(batch):
+                if not db_up.is_set():
+                    raise RuntimeError("БД недоступна")
+                if any(record.boss_name == "Ловушка" for record in batch):
+                    raise ValueError("нарушено ограничение")
+                saved.extend(batch)
+
+            writer = ResultWriter(save, spool=spool, flush_interval=0.01,
+                                  on_error=lambda batch, error: failed.append((batch, error)))
+            writer.start()
+            # Хранилище недоступно целиком — ничего не уходит в карантин
+            time.sleep(0.05)
+            self.assertEqual((len(spool), writer.quarantined, failed), (4, 0, []))
+
+            db_up.set()
+            while len(spool):
+                time.sleep(0.01)
+            self.assertTrue(writer.close())
+            self.assertEqual(saved, records[1:])
+            self.assertEqual([(batch, str(error)) for batch, error in failed], [([poison], "нарушено ограничение")])
+            self.assertEqual(spool.rejected(), [(poison, "нарушено ограничение")])
+            self.assertEqual((writer.written, writer.quarantined), (3, 1))
+            spool.close()
+
+    def test_tally_records_whole_party(self):
+        heroes, bosses = sim.make_raid(6, 1)
+        bus = EventBus()
+        tally = BattleTally()
+        bus.subscribe(tally.on_event, BattleTally.KINDS)
+        battle = Battle(heroes, bosses, policy=AttackPolicy(), logger=BattleLogger(filename=None, echo=False),
+                        rng=BattleRNG(2), bus=bus)
+        stats = battle.play()
+        record = make_record("victory", bosses[0].name, stats["rounds"], heroes, bosses, tally)
+        # Партия не обрезается до четырёх героев, босс — отдельный участник
+        self.assertEqual([p.side for p in record.participants], ["hero"] * 6 + ["boss"])
+        self.assertGreater(sum(p.damage for p in record.participants[:6]), 0)
+        self.assertGreater(record.participants[-1].damage, 0)
+
+
+class TestTTLCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.cache = TTLCache(ttl=10.0, clock=lambda: self.now)
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_value_expires_after_ttl(self):
+        self.assertEqual(self.cache.get("boss", self.compute), 1)
+        self.now = 9.9
+        self.assertEqual(self.cache.get("boss", self.compute), 1)
+        self.now = 10.0
+        self.assertEqual(self.cache.get("boss", self.compute), 2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_clear_during_compute_is_not_stored(self):
+        def stale():
+            # Пока идёт запрос, записали новые бои и сбросили кэш
+            self.cache.clear()
+            return "устаревшее"
+
+        self.assertEqual(self.cache.get("boss", stale), "устаревшее")
+        self.assertEqual(self.cache.get("boss", self.compute), 1)
+        self.assertEqual(self.cache.get("boss", self.compute), 1)
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SQLiteBackend(os.path.join(self.tmp.name, "battles.sqlite3"))
+        warriors = [Warrior("Волк"), Warrior("Ёж"), Mage("Пудж")]
+        self.records = [
+            make_record("victory", "Дракон", 12, warriors[:1] + warriors[2:]),
+            make_record("victory", "Дракон", 7, warriors),
+            make_record("defeat", "Дракон", 20, warriors),
+            make_record("victory", "Лич", 9, [Healer("Целитель")]),
+        ]
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_batch_is_saved_once(self):
+        self.assertEqual(self.backend.save_battle_results(self.records), 4)
+        # Повторная отправка той же пачки (ответ БД потерялся) ничего не добавляет
+        self.assertEqual(self.backend.save_battle_results(self.records[1:]), 0)
+        stats = {row["boss_name"]: row for row in self.backend.boss_stats()}
+        self.assertEqual((stats["Дракон"]["battles"], stats["Дракон"]["victories"]), (3, 2))
+        self.assertEqual(stats["Дракон"]["avg_rounds"], 13)
+        parties = {row["party"]: row["battles"] for row in self.backend.party_stats()}
+        self.assertEqual(parties, {"Воин+Маг": 1, "Воин×2+Маг": 2, "Лекарь": 1})
+
+    def test_queries(self):
+        self.backend.save_battle_results(self.records)
+        fastest = self.backend.fastest_victories(limit=2)
+        self.assertEqual([row["round_count"] for row in fastest], [7, 9])
+        self.assertEqual([row["round_count"] for row in self.backend.fastest_victories(boss_name="Дракон")], [7, 12])
+        self.assertEqual(self.backend.class_win_rates("Дракон"), {"Воин": (5, 3), "Маг": (3, 2)})
+        self.assertEqual(sum(row["battles"] for row in self.backend.daily_stats(1)), 4)
+
+    def summary_tables(self):
+        conn = self.backend._connection()
+        return (
+            [tuple(row) for row in conn.execute("SELECT * FROM stats_boss_daily ORDER BY boss_name, day")],
+            [tuple(row) for row in conn.execute("SELECT * FROM stats_party ORDER BY party")],
+        )
+
+    def test_rebuild_matches_incremental_stats(self):
+        # Бои на границе дней и месяцев, несколько пачек и повтор пачки
+        times = [datetime.datetime(2026, 8, 31, 23, 59), datetime.datetime(2026, 9, 1, 0, 1),
+                 datetime.datetime(2026, 9, 1, 12), datetime.datetime(2026, 9, 30, 8)]
+        records = [record._replace(created_at=at, battle_id=uuid.uuid4().hex)
+                   for record, at in zip(self.records * 2, times * 2)]
+        self.backend.save_battle_results(records[:3])
+        self.backend.save_battle_results(records[2:6])
+        self.backend.save_battle_results(records[6:])
+        daily, parties = self.summary_tables()
+        self.assertEqual(sum(row[2] for row in daily), 8)
+        self.assertEqual([row[:2] for row in daily],
+                         [("Дракон", "2026-08-31"), ("Дракон", "2026-09-01"), ("Лич", "2026-09-30")])
+        self.backend.rebuild_stats()
+        self.assertEqual(self.summary_tables(), (daily, parties))
+
+    def test_battle_events(self):
+        heroes, boss = sim.make_party()
+        bus = EventBus()
+        recorder = EventRecorder()
+        bus.subscribe(recorder.on_event, EventRecorder.KINDS)
+        battle = Battle(heroes, [boss], policy=PotionPolicy(), logger=BattleLogger(filename=None, echo=False),
+                        rng=BattleRNG(5), bus=bus)
+        stats = battle.play()
+        result = "victory" if stats["winner"] == "heroes" else "defeat"
+        record = make_record(result, boss.name, stats["rounds"], heroes, (boss,))
+        events = recorder.finish(record.battle_id)
+        self.assertEqual(recorder.rows, [])
+        self.assertEqual([row[0] for row in events.rows], list(range(len(events.rows))))
+        self.assertEqual(events.rows[-1][1], stats["rounds"])
+
+        self.backend.save_battle_results([record])
+        self.assertEqual(self.backend.save_battle_events([events]), len(events.rows))
+        self.assertEqual(self.backend.save_battle_events([events]), 0)
+        # «Какое действие нанесло больше урона в боях с таким исходом»
+        attacks = [row[5] or 0 for row in events.rows if row[3] == "attack"]
+        self.assertEqual(self.backend.event_totals(result)["attack"], (len(attacks), sum(attacks)))
+        self.assertEqual(self.backend.event_totals("victory" if result == "defeat" else "defeat"), {})
+
+    def test_write_clears_stats_cache(self):
+        self.backend.save_battle_results(self.records[:1])
+        self.assertEqual(self.backend.boss_stats()[0]["battles"], 1)
+        self.backend.save_battle_results(self.records[1:2])
+        self.assertEqual(self.backend.boss_stats()[0]["battles"], 2)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.pings = 0
+        self.closed = False
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+
+    def close(self):
+        self.closed = True
+
+
+@unittest.skipIf(db_mysql is None, "PyMySQL не установлен")
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = db_mysql.CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=lambda: self.now)
+
+    def trip(self):
+        for _ in range(self.breaker.failure_threshold):
+            self.breaker.record_failure()
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.breaker.record_failure()
+        self.assertEqual((self.breaker.state, self.breaker.trips), ("open", 1))
+        self.assertFalse(self.breaker.allow())
+
+        def refused():
+            raise db_mysql.pymysql.err.OperationalError(2003, "Can't connect to MySQL server")
+
+        pool = db_mysql.ConnectionPool(refused, breaker=db_mysql.CircuitBreaker(clock=lambda: self.now))
+        for _ in range(3):
+            with self.assertRaises(db_mysql.pymysql.err.OperationalError):
+                with pool.connection():
+                    pass
+        with self.assertRaises(db_mysql.DatabaseUnavailable):
+            with pool.connection():
+                pass
+        stats = pool.stats()
+        self.assertEqual((stats["failures"], stats["rejected"], stats["breaker"]), (3, 1, "open"))
+
+    def test_single_half_open_probe(self):
+        self.trip()
+        self.now = 10.0
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, "half_open")
+        # Пока проба не вернулась, остальные запросы отклоняются
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+
+        self.trip()
+        self.now = 20.0
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertEqual((self.breaker.state, self.breaker.trips), ("open", 3))
+        self.assertFalse(self.breaker.allow())
+        self.now = 30.0
+        self.assertTrue(self.breaker.allow())
+
+    def test_query_errors_do_not_trip(self):
+        pool = db_mysql.ConnectionPool(FakeConnection, breaker=self.breaker)
+        for code in (1213, 1205, 1213, 1205):
+            with self.assertRaises(db_mysql.pymysql.err.OperationalError):
+                with pool.connection():
+                    raise db_mysql.pymysql.err.OperationalError(code, "lock")
+        self.assertEqual((self.breaker.state, pool.stats()["failures"]), ("closed", 0))
+
+
+@unittest.skipIf(db_mysql is None, "PyMySQL не установлен")
+class TestConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.0
+        self.pool = db_mysql.ConnectionPool(FakeConnection, size=2, ping_interval=30.0, acquire_timeout=0.05,
+                                            clock=lambda: self.now)
+
+    def use(self):
+        with self.pool.connection() as conn:
+            return conn
+
+    def test_connections_are_reused(self):
+        first = self.use()
+        self.assertIs(self.use(), first)
+        self.assertIs(self.use(), first)
+        stats = self.pool.stats()
+        self.assertEqual((stats["created"], stats["reused"], stats["in_use"], stats["idle"]), (1, 2, 0, 1))
+
+    def test_ping_after_interval(self):
+        conn = self.use()
+        self.now = 29.0
+        self.use()
+        self.assertEqual(conn.pings, 0)
+        # Отсчёт идёт от последнего возврата в пул
+        self.now = 59.0
+        self.use()
+        self.assertEqual((conn.pings, self.pool.stats()["pings"]), (1, 1))
+
+    def test_connection_discarded_on_error(self):
+        with self.assertRaises(ValueError):
+            with self.pool.connection() as conn:
+                raise ValueError("ошибка в запросе")
+        self.assertTrue(conn.closed)
+        self.assertIsNot(self.use(), conn)
+        stats = self.pool.stats()
+        self.assertEqual((stats["created"], stats["discarded"], stats["in_use"], stats["idle"]), (2, 1, 0, 1))
+        self.assertEqual(stats["breaker"], "closed")
+
+    def test_size_limit_and_acquire_timeout(self):
+        with self.pool.connection() as first, self.pool.connection() as second:
+            self.assertIsNot(first, second)
+            self.assertEqual(self.pool.stats()["in_use"], 2)
+            with self.assertRaises(db_mysql.DatabaseUnavailable):
+                with self.pool.connection():
+                    pass
+        stats = self.pool.stats()
+        self.assertEqual((stats["created"], stats["timeouts"], stats["in_use"], stats["idle"]), (2, 1, 0, 2))
+
+
+class FakeMySQL:
+    """
+    Соединение PyMySQL, которое понимает только запросы MySQLBackend._save.
+    created_at хранится, как в столбце TIMESTAMP: округлённым до секунды.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.rows = []
+        self._saved = None
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def begin(self):
+        self._saved = {name: dict(table) for name, table in self.tables.items()}
+
+    def commit(self):
+        self._saved = None
+
+    def rollback(self):
+        self.tables.update(self._saved)
+
+    def close(self):
+        pass
+
+    def execute(self, sql, params=()):
+        # battle_id IN (...) AND created_at BETWEEN %s AND %s
+        ids, (low, high) = params[:-2], params[-2:]
+        battles = self.tables["battles"]
+        self.rows = [{"id": battles[battle_id][0], "battle_id": battle_id} for battle_id in ids
+                     if battle_id in battles and low <= battles[battle_id][1] <= high]
+
+    def executemany(self, sql, rows):
+        if "INTO battles " in sql:
+            for battle_id, _, _, _, created_at in rows:
+                stored = (created_at + datetime.timedelta(microseconds=500000)).replace(microsecond=0)
+                self.tables["battles"].setdefault(battle_id, (len(self.tables["battles"]) + 1, stored))
+        elif "INTO battle_participants" in sql:
+            for row in rows:
+                self.tables["participants"][row[:2]] = row
+        else:
+            table = self.tables["stats_boss_daily" if "stats_boss_daily" in sql else "stats_party"]
+            for row in rows:
+                key = row[:2] if "stats_boss_daily" in sql else row[:1]
+                table[key] = table.get(key, 0) + row[len(key)]
+
+    def fetchall(self):
+        return self.rows
+
+
+@unittest.skipIf(db_mysql is None, "PyMySQL не установлен")
+class TestMySQLSave(unittest.TestCase):
+
+    def setUp(self):
+        self.tables = {"battles": {}, "participants": {}, "stats_boss_daily": {}, "stats_party": {}}
+        pool = db_mysql.ConnectionPool(lambda: FakeMySQL(self.tables), size=1)
+        self.backend = db_mysql.MySQLBackend(pool=pool)
+        # Схема и секции «уже готовы»: бои текущего месяца пишутся без ALTER TABLE
+        self.backend._schema_ready = True
+        self.backend._partitioned_until = "9999-12"
+
+    def test_single_record_is_saved_once(self):
+        record = make_record("victory", "Дракон", 5, [Warrior("Волк"), Mage("Пудж")])
+        self.assertEqual(self.backend.save_battle_results([record]), 1)
+        self.assertEqual(len(self.tables["participants"]), 2)
+        # Повтор (ответ потерялся) находит уже сохранённый бой и не трогает сводку
+        self.assertEqual(self.backend.save_battle_results([record]), 0)
+        self.assertEqual(sum(self.tables["stats_boss_daily"].values()), 1)
+
+    def test_microseconds_are_dropped_before_insert(self):
+        # Запись из старого spool: без отбрасывания MySQL округлил бы её в следующую секунду
+        created_at = datetime.datetime.utcnow().replace(microsecond=700000)
+        record = make_record("defeat", "Лич", 9, [Healer("Целитель")])._replace(created_at=created_at)
+        self.assertEqual(self.backend.save_battle_results([record]), 1)
+        self.assertEqual(self.tables["battles"][record.battle_id][1], created_at.replace(microsecond=0))
+        self.assertEqual(self.backend.save_battle_results([record]), 0)
+        self.assertEqual(self.tables["stats_party"], {("Лекарь",): 1})
+
+
+class SchemaCursor:
+    """Курсор, который записывает SQL и отвечает на запросы к information_schema по заданным секциям."""
+
+    def __init__(self, partitions, legacy_first):
+        self.partitions = partitions
+        self.legacy_first = legacy_first
+        self.statements = []
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        sql = " ".join(sql.split())
+        self.statements.append(sql)
+        if "information_schema.COLUMNS" in sql:
+            self.rows = [{"name": name} for name in ("id", "result", "boss_name", "round_count", "created_at")]
+        elif "information_schema.PARTITIONS" in sql:
+            self.rows = [{"name": db_mysql._partition_name(month)} for month in self.partitions] + [{"name": "pmax"}]
+        elif "MIN(created_at)" in sql:
+            self.rows = [{"first": self.legacy_first}]
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0]
+
+
+@unittest.skipIf(db_mysql is None, "PyMySQL не установлен")
+class TestMySQLSchema(unittest.TestCase):
+
+    def test_legacy_months_get_partitions_before_migration(self):
+        current = month_of(datetime.datetime.utcnow())
+        first = add_months(current, -3)
+        cur = SchemaCursor([add_months(current, i) for i in range(4)],
+                           datetime.datetime.strptime(first + "-05", "%Y-%m-%d"))
+        db_mysql._migrate_legacy(cur)
+        reorganize = [sql for sql in cur.statements if "REORGANIZE" in sql]
+        self.assertEqual(len(reorganize), 2)
+        names = [db_mysql._partition_name(add_months(current, i)) for i in (-3, -2, -1, 0)]
+        for sql in reorganize:
+            self.assertIn(f"REORGANIZE PARTITION {names[-1]} INTO", sql)
+            self.assertEqual([name for name in names if f"PARTITION {name} VALUES" in sql], names)
+        # Секции готовы до того, как старые бои переносятся в battles
+        insert = next(i for i, sql in enumerate(cur.statements) if sql.startswith("INSERT IGNORE INTO battles"))
+        self.assertLess(cur.statements.index(reorganize[-1]), insert)
+
+
+class TestRetention(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SQLiteBackend(os.path.join(self.tmp.name, "battles.sqlite3"))
+        # По два боя в месяц с августа 2026 по январь 2027
+        self.records = [
+            make_record("victory" if day % 2 else "defeat", "Дракон", day, [Warrior("Волк"), Mage("Пудж")])
+            ._replace(created_at=datetime.datetime(2026 + (month > 12), (month - 1) % 12 + 1, day, 12))
+            for month in range(8, 14) for day in (3, 4)
+        ]
+        self.backend.save_battle_results(self.records)
+
+    def tearDown(self):
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_queries_read_only_their_months(self):
+        self.assertEqual(self.backend.partitions(), ["2026-08", "2026-09", "2026-10", "2026-11", "2026-12", "2027-01"])
+        autumn = {"since": datetime.datetime(2026, 9, 1), "until": datetime.datetime(2026, 11, 1)}
+        self.assertEqual(self.backend.battle_span(**autumn)[0], 4)
+        fastest = self.backend.fastest_victories(**autumn)
+        self.assertEqual([row["created_at"].month for row in fastest], [9, 10])
+        self.assertEqual(self.backend.class_win_rates(**autumn), {"Воин": (4, 2), "Маг": (4, 2)})
+        self.assertEqual(self.backend.class_win_rates()["Воин"], (12, 6))
+
+    def test_expire_archives_and_restores(self):
+        archive = os.path.join(self.tmp.name, "archive")
+        done = retention.apply_retention(self.backend, keep_months=3, archive_dir=archive,
+                                         today=datetime.datetime(2027, 1, 20))
+        self.assertEqual([(month, count) for month, _, count in done], [("2026-08", 2), ("2026-09", 2), ("2026-10", 2)])
+        self.assertEqual(self.backend.partitions(), ["2026-11", "2026-12", "2027-01"])
+        self.assertEqual(self.backend.battle_span(), (6, 12))
+        # Сводная статистика за удалённые месяцы остаётся
+        self.assertEqual(self.backend.boss_stats()[0]["battles"], 12)
+
+        path = done[0][1]
+        self.assertEqual(list(retention.read_archive(path)), self.records[:2])
+        self.assertEqual(retention.restore_archive(self.backend, path), 2)
+        self.assertEqual(retention.restore_archive(self.backend, path), 0)
+        self.assertEqual(self.backend.partitions()[0], "2026-08")
+        # Возвращённые бои уже учтены в сводке — второй раз не считаются
+        self.assertEqual(self.backend.boss_stats()[0]["battles"], 12)
+        self.assertEqual(sum(row["battles"] for row in self.backend.party_stats()), 12)
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = SQLiteBackend(os.path.join(self.tmp.name, "battles.sqlite3"))
+        # Приёмник работает в своём цикле событий, клиенты — в обычных потоках, как в игре
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = ingest.IngestServer(self.backend, max_delay=0.05)
+        asyncio.run_coroutine_threadsafe(self.server.start("127.0.0.1:0"), self.loop).result(5)
+        self.address = ingest.format_address(self.server.address)
+
+    def tearDown(self):
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        self.backend.close()
+        self.tmp.cleanup()
+
+    def test_clients_are_coalesced_into_batches(self):
+        def play(n):
+            client = ingest.IngestClient(self.address)
+            for i in range(n):
+                record = make_record("victory", "Дракон", i + 1, [Warrior("Волк")])
+                client.send_results([record])
+                # Повтор (подтверждение потерялось) не создаёт дубликат
+                client.send_results([record])
+            client.close()
+
+        clients = [threading.Thread(target=play, args=(5,)) for _ in range(8)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join(10)
+        self.assertEqual(self.backend.battle_span()[0], 40)
+        stats = self.server.stats()
+        self.assertEqual((stats["received"], stats["written"]), (80, 80))
+        self.assertLess(stats["batches"], 80)
+
+    def test_rejected_record_raises(self):
+        client = ingest.IngestClient(self.address)
+        record = make_record("draw", "Дракон", 3, [Warrior("Волк")])
+        with self.assertRaises(ingest.IngestError):
+            client.send_results([record])
+        events = EventRecorder()
+        events.add(Warrior("Волк"), "attack", Warrior("Ёж"), 7)
+        client.send_events([events.finish(record.battle_id)])
+        client.close()
+        self.assertEqual(self.backend.event_totals(), {"attack": (1, 7)})
+
+    def test_malformed_participants_and_events_are_rejected(self):
+        client = ingest.IngestClient(self.address)
+        good = make_record("victory", "Дракон", 3, [Warrior("Волк")])
+        bad = make_record("victory", "Дракон", 3, [Warrior("Ёж")])
+        bad = bad._replace(participants=(bad.participants[0]._replace(side="villain"),))
+        with self.assertRaises(ingest.IngestError):
+            client.send_results([good, bad])
+        events = EventRecorder()
+        events.add(Warrior("Волк"), "attack", Warrior("Ёж"), 7)
+        broken = BattleEvents(bad.battle_id, [("1", 1, "Волк", "attack", "Ёж", 7, None)])
+        with self.assertRaises(ingest.IngestError):
+            client.send_events([events.finish(good.battle_id), broken])
+        client.close()
+        self.assertEqual(self.backend.battle_span()[0], 1)
+        self.assertEqual(self.backend.event_totals(), {"attack": (1, 7)})
+
+    def test_failed_batch_is_retried_item_by_item(self):
+        backend = self.backend
+
+        class TrapBackend:
+            # Сервер БД отвергает всю пачку, если в ней есть бой с «Ловушкой»
+            def save_battle_results(self, records):
+                if any(record.boss_name == "Ловушка" for record in records):
+                    raise ValueError("ловушка")
+                return backend.save_battle_results(records)
+
+            save_battle_events = backend.save_battle_events
+
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result(5)
+        self.server = ingest.IngestServer(TrapBackend(), max_delay=0.05)
+        asyncio.run_coroutine_threadsafe(self.server.start("127.0.0.1:0"), self.loop).result(5)
+        client = ingest.IngestClient(ingest.format_address(self.server.address))
+        records = [make_record("victory", boss, 3, [Warrior("Волк")]) for boss in ("Дракон", "Ловушка", "Лич")]
+        with self.assertRaises(ingest.IngestError) as caught:
+            client.send_results(records)
+        client.close()
+        self.assertIn("Приёмник не сохранил 1 из 3", str(caught.exception))
+        self.assertEqual(self.backend.battle_span()[0], 2)
+        stats = self.server.stats()
+        self.assertEqual((stats["written"], stats["failed"]), (2, 1))
+
+
+@unittest.skipIf(numpy is None, "выгрузка требует NumPy")
+class TestExport(unittest.TestCase):
+    def test_columns_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = SQLiteBackend(os.path.join(tmp, "battles.sqlite3"))
+            # По бою в секунду: created_at хранится с точностью до секунды
+            start = datetime.datetime.utcnow().replace(microsecond=0) - datetime.timedelta(seconds=25)
+            records = [make_record("victory" if i % 3 else "defeat", "Дракон" if i % 2 else "Лич", i + 1,
+                                   [Warrior("Волк")])._replace(created_at=start + datetime.timedelta(seconds=i))
+                       for i in range(25)]
+            backend.save_battle_results(records)
+            # Кусками по 10: последний кусок неполный, словарь категорий растёт по ходу
+            manifest = export.export_battles(backend, os.path.join(tmp, "out"), chunk_size=10)
+            self.assertEqual((manifest["rows"], manifest["expected_rows"]), (25, 25))
+
+            table = export.load(os.path.join(tmp, "out"))
+            self.assertIsInstance(table["round_count"], numpy.memmap)
+            self.assertEqual(table["round_count"].tolist(), list(range(1, 26)))
+            self.assertEqual(list(table.decoded("result")), [record.result for record in records])
+            self.assertEqual(list(table.decoded("boss_name")), [record.boss_name for record in records])
+            self.assertEqual(table["battle_id"][3].decode(), records[3].battle_id)
+            self.assertEqual(table["created_at"][0], numpy.datetime64(records[0].created_at, "us"))
+
+            since = records[20].created_at
+            later = export.export_battles(backend, os.path.join(tmp, "later"), since=since)
+            self.assertEqual(export.load(os.path.join(tmp, "later"))["id"].tolist(), list(range(21, 26)))
+            self.assertEqual(later["since"], since.isoformat())
+            backend.close()
+
+
+class TestStartup(unittest.TestCase):
+    def test_main_import_is_lazy(self):
+        # NumPy, БД и multiprocessing не нужны, пока не начался бой или сохранение
+        code = "import sys, main; print(' '.join(sys.modules))"
+        proc = subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True)
+        loaded = set(proc.stdout.split())
+        for module in ("numpy", "db", "db_config", "pymysql", "multiprocessing", "inspect"):
+            self.assertNotIn(module, loaded)
+
+
 if __name__ == '__main__':
     # Запуск тестов с подробным выводом
     unittest.main(verbosity=2)
\ No newline at end of file
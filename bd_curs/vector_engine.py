@@ -0,0 +1,278 @@
+"""
+Векторный движок боя на NumPy: тысячи боёв в «локстепе».
+
+Состояние N боёв хранится как структура массивов (по столбцу на
+характеристику): HP, MP, урон и ловкость героев, HP/MP босса, остаток щитов
+босса по срокам истечения, таймеры яда (урон на ближайшие раунды), флаги
+оглушения и число зелий. Один вызов step() продвигает все незавершённые
+бои на один раунд сразу, без объектов Character и без random на каждый удар.
+
+Правила повторяют эталонный battle.Battle с политиками из sim.py:
+    - в начале раунда тикают яды живых героев и босса, щиты босса истекают;
+    - порядок ходов — по ловкости (стабильная сортировка, босс последний
+      среди равных), состав ходящих фиксируется в начале раунда;
+    - Mage.attack (ядовитый шар), Healer.attack (лечение союзника),
+      Boss.poison_breath / shield_wall / stomp_attack, зелья босса;
+    - умения из Battle.perform_action (магия яда мага, heal_ally лекаря).
+Совпадение с эталоном проверяется дифференциальным тестом в tests.py.
+"""
+
+import numpy as np
+
+# Импорты, которые работают и при запуске напрямую, и как пакет bd_curs
+try:
+    from characters import Warrior, Mage, Archer, Healer
+    from boss import Boss
+except ImportError:
+    from .characters import Warrior, Mage, Archer, Healer
+    from .boss import Boss
+
+ROSTER = (Warrior, Mage, Archer, Healer)
+POLICIES = ("attack", "skill", "potion")
+
+# Коды исхода — те же, что в sim.py
+OUTCOME_DEFEAT = 0
+OUTCOME_VICTORY = 1
+OUTCOME_TIMEOUT = 2
+
+BOSS = -1  # маркер босса в порядке ходов
+
+# Сколько раундов вперёд хранить расписание яда и щитов
+DOT_HORIZON = 3
+SHIELD_HORIZON = 3
+
+
+def _template_stats():
+    """Базовые характеристики берём из самих классов, чтобы не расходиться с ними."""
+    heroes = [cls("") for cls in ROSTER]
+    boss = Boss("")
+    return heroes, boss
+
+
+class VectorBattle:
+    """N независимых боёв стандартной пати против босса, продвигаемых вместе."""
+
+    def __init__(self, n, policy="attack", seed=None, max_rounds=200):
+        if policy not in POLICIES:
+            raise ValueError(f"Неизвестная политика: {policy}")
+        self.n = n
+        self.policy = policy
+        self.max_rounds = max_rounds
+        self.rng = np.random.default_rng(seed)
+
+        heroes, boss = _template_stats()
+        h = len(heroes)
+        self.hero_count = h
+        self.roles = [type(hero) for hero in heroes]
+
+        # Столбцы героев: (N, H)
+        self.hero_hp = np.tile(np.array([x.hp for x in heroes], dtype=np.int32), (n, 1))
+        self.hero_max_hp = np.array([x.max_hp for x in heroes], dtype=np.int32)
+        self.hero_mp = np.tile(np.array([getattr(x, "mp", 0) for x in heroes], dtype=np.int32), (n, 1))
+        self.hero_damage = np.tile(np.array([x.damage for x in heroes], dtype=np.int32), (n, 1))
+        self.hero_agility = np.tile(np.array([x.agility for x in heroes], dtype=np.int32), (n, 1))
+        self.hero_potions = np.full((n, h), 2, dtype=np.int8)
+        self.hero_stunned = np.zeros((n, h), dtype=bool)
+        # hero_dot[:, j, k] — урон ядом, который герой j получит через k+1 раундов
+        self.hero_dot = np.zeros((n, h, DOT_HORIZON), dtype=np.int32)
+
+        # Столбцы босса: (N,)
+        self.boss_hp = np.full(n, boss.hp, dtype=np.int32)
+        self.boss_max_hp = boss.max_hp
+        self.boss_mp = np.full(n, boss.mp, dtype=np.int32)
+        self.boss_damage = boss.base_damage
+        self.boss_agility = getattr(boss, "agility", 15)
+        self.boss_potions = np.full(n, 3, dtype=np.int8)
+        self.boss_dot = np.zeros((n, DOT_HORIZON), dtype=np.int32)
+        # boss_shield[:, k] — остаток щита, который исчезнет через k+1 раундов
+        self.boss_shield = np.zeros((n, SHIELD_HORIZON), dtype=np.int32)
+
+        self.rounds = np.zeros(n, dtype=np.int32)
+        self.round = 0
+
+        # Порядок ходов: как initiative.Timeline в режиме раундов — по убыванию ловкости,
+        # босс добавляется в конец списка участников
+        agility = [int(a) for a in self.hero_agility[0]] + [self.boss_agility]
+        slots = list(range(h)) + [BOSS]
+        self.turn_order = [slots[i] for i in sorted(range(h + 1), key=lambda i: -agility[i])]
+
+    # ---------- СЛУЧАЙНОСТЬ ----------
+
+    def _randint(self, low, high):
+        """Аналог random.randint(low, high) для всех N боёв сразу."""
+        return self.rng.integers(low, high + 1, size=self.n, dtype=np.int32)
+
+    def _pick(self, mask):
+        """Равновероятный выбор одного столбца среди True в каждой строке mask."""
+        keys = self.rng.random(mask.shape)
+        keys[~mask] = -1.0
+        return keys.argmax(axis=1)
+
+    # ---------- ПРИМИТИВЫ ----------
+
+    def _running(self):
+        return (self.boss_hp > 0) & (self.hero_hp > 0).any(axis=1)
+
+    def _hit_boss(self, mask, damage):
+        """Урон боссу с поглощением щитами (старые щиты расходуются первыми)."""
+        damage = np.where(mask, damage, 0)
+        for k in range(SHIELD_HORIZON):
+            absorbed = np.minimum(self.boss_shield[:, k], damage)
+            self.boss_shield[:, k] -= absorbed
+            damage -= absorbed
+        np.maximum(self.boss_hp - damage, 0, out=self.boss_hp)
+
+    def _hit_hero(self, mask, j, damage):
+        hp = self.hero_hp[:, j]
+        self.hero_hp[:, j] = np.where(mask, np.maximum(hp - damage, 0), hp)
+
+    def _heal_hero(self, mask, target, amount):
+        rows = np.nonzero(mask)[0]
+        cols = target[rows]
+        healed = self.hero_hp[rows, cols] + amount[rows]
+        self.hero_hp[rows, cols] = np.minimum(healed, self.hero_max_hp[cols])
+
+    @staticmethod
+    def _shift(columns):
+        columns[..., :-1] = columns[..., 1:]
+        columns[..., -1] = 0
+
+    # ---------- РАУНД ----------
+
+    def _update_effects(self, live):
+        """Начало раунда: update_effects у живых героев, затем у босса."""
+        alive = live[:, None] & (self.hero_hp > 0)
+        self.hero_hp -= np.where(alive, self.hero_dot[:, :, 0], 0)
+        np.maximum(self.hero_hp, 0, out=self.hero_hp)
+        self._shift(self.hero_dot)
+        # Оглушение длится один ход и снимается при обновлении эффектов
+        self.hero_stunned[:] = False
+
+        boss_live = live & (self.boss_hp > 0)
+        # Щит, доживший до конца срока, снимается раньше, чем тикают яды:
+        # все яды, активные в этот момент, наложены позже щита
+        self._shift(self.boss_shield)
+        self._hit_boss(boss_live, self.boss_dot[:, 0])
+        self._shift(self.boss_dot)
+
+    def _hero_turn(self, j, acting):
+        go = self._running() & acting[:, j] & ~self.hero_stunned[:, j]
+        if not go.any():
+            return
+        role = self.roles[j]
+        mp = self.hero_mp[:, j]
+
+        if self.policy == "potion":
+            drink = go & (self.hero_hp[:, j] < self.hero_max_hp[j] * 0.35) & (self.hero_potions[:, j] > 0)
+            self.hero_potions[:, j] -= drink
+            heal = drink & (self.hero_hp[:, j] > 0)
+            self.hero_hp[:, j] = np.where(heal, np.minimum(self.hero_hp[:, j] + 50, self.hero_max_hp[j]),
+                                          self.hero_hp[:, j])
+            go &= ~drink
+
+        if self.policy in ("skill", "potion") and role in (Mage, Healer):
+            skill = go & (mp >= 25)
+            if role is Mage:
+                # Магия яда: PoisonEffect(2, 10) + randint(25, 35)
+                self.boss_dot[:, 0] += np.where(skill, 10, 0)
+                mp -= np.where(skill, 20, 0)
+                self._hit_boss(skill, self._randint(25, 35))
+            else:
+                # heal_ally: случайный живой союзник, кроме самого лекаря
+                mp -= np.where(skill, 25, 0)
+                allies = self.hero_hp > 0
+                allies[:, j] = False
+                heal = skill & allies.any(axis=1)
+                self._heal_hero(heal, self._pick(allies), self._randint(30, 45))
+            go &= ~skill
+
+        if role is Mage:
+            ball = go & (mp >= 15) & (self.rng.random(self.n) < 0.6)
+            mp -= np.where(ball, 15, 0)
+            self.boss_dot[:, :2] += np.where(ball, 8, 0)[:, None]
+            self._hit_boss(ball, self._randint(20, 30))
+            go &= ~ball
+        elif role is Healer:
+            heal = go & (mp >= 20) & (self.rng.random(self.n) < 0.7)
+            mp -= np.where(heal, 20, 0)
+            self._heal_hero(heal, self._pick(self.hero_hp > 0), self._randint(25, 40))
+            go &= ~heal
+
+        damage = self.hero_damage[:, j]
+        self._hit_boss(go, damage - 5 + self.rng.integers(0, 11, size=self.n, dtype=np.int32))
+
+    def _boss_use_skill(self, go):
+        skill = self.rng.integers(0, 3, size=self.n)
+
+        breath = go & (skill == 0) & (self.boss_mp >= 40)
+        self.boss_mp -= np.where(breath, 40, 0)
+        targets = breath[:, None] & (self.hero_hp > 0)
+        self.hero_dot[:, :, :3] += np.where(targets, 15, 0)[:, :, None]
+
+        wall = go & (skill == 1) & (self.boss_mp >= 30)
+        self.boss_mp -= np.where(wall, 30, 0)
+        self.boss_shield[:, SHIELD_HORIZON - 1] += np.where(wall, 60, 0)
+
+        stomp = go & (skill == 2)
+        for j in range(self.hero_count):
+            hit = stomp & (self.hero_hp[:, j] > 0)
+            self._hit_hero(hit, j, self._randint(35, 50))
+            self.hero_stunned[:, j] |= hit & (self.rng.random(self.n) < 0.4)
+
+    def _boss_turn(self, boss_acting):
+        go = self._running() & boss_acting
+        if not go.any():
+            return
+        has_items = self.boss_potions > 0
+        roll = self.rng.random(self.n)
+        # random.choices с весами attack 0.5 / skill 0.3 / item 0.2
+        attack_edge = np.where(has_items, 0.5, 0.5 / 0.8)
+        attack = go & (roll < attack_edge)
+        skill = go & ~attack & ((roll < 0.8) | ~has_items)
+        item = go & ~attack & ~skill
+
+        # Атака: цель — случайный живой герой; Boss.attack в 30% случаев — навык
+        target = self._pick(self.hero_hp > 0)
+        special = attack & (self.rng.random(self.n) < 0.3)
+        melee = attack & ~special
+        damage = self._randint(self.boss_damage - 5, self.boss_damage + 5)
+        for j in range(self.hero_count):
+            self._hit_hero(melee & (target == j), j, damage)
+
+        self._boss_use_skill(skill | special)
+
+        self.boss_potions -= item
+        self.boss_hp = np.where(item, np.minimum(self.boss_hp + 50, self.boss_max_hp), self.boss_hp)
+
+    def step(self):
+        """Сыграть один раунд во всех ещё идущих боях. Возвращает число таких боёв."""
+        live = self._running()
+        count = int(live.sum())
+        if not count:
+            return 0
+        self.round += 1
+        self.rounds += live
+
+        self._update_effects(live)
+
+        # Состав ходящих фиксируется в начале раунда, как в Battle
+        acting = live[:, None] & (self.hero_hp > 0)
+        boss_acting = live & (self.boss_hp > 0)
+        for slot in self.turn_order:
+            if slot == BOSS:
+                self._boss_turn(boss_acting)
+            else:
+                self._hero_turn(slot, acting)
+        return count
+
+    def run(self):
+        """Доиграть все бои (или до max_rounds) и вернуть массив исходов."""
+        while self.round < self.max_rounds and self.step():
+            pass
+        return self.outcomes()
+
+    def outcomes(self):
+        result = np.full(self.n, OUTCOME_TIMEOUT, dtype=np.int8)
+        result[~(self.hero_hp > 0).any(axis=1)] = OUTCOME_DEFEAT
+        result[self.boss_hp <= 0] = OUTCOME_VICTORY
+        return result